@@ -43,7 +43,45 @@ INSTALLED_APPS = [
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/'
 
+# Load the recommender in a background thread when a server process starts (see RecommendationsConfig.ready).
+RECOMMENDER_WARM_UP = True
+
+# Recommendation result cache: an in-process LRU tier, plus an optional shared tier on one of the
+# CACHES aliases (e.g. 'default' once a Redis/Memcached backend is configured).
+RECOMMENDATION_CACHE = {
+    'MAX_ENTRIES': 10000,
+    'TTL': 3600,
+    'BACKEND': None,
+}
+
+# Threads of the pool the async API views run their CPU-bound work on (NumPy releases the GIL in
+# large array operations, so a few threads score in parallel).
+RECOMMENDATION_EXECUTOR_WORKERS = 4
+
+# App users whose SVD factors, folded in from their ratings, each worker process keeps in memory;
+# the least recently used are folded in again on their next request.
+SVD_FOLDED_USERS_MAX_ENTRIES = 10000
+
+# Hybrid "Recommended for You" blend (see HybridRecommender): the default weights of the normalized
+# SVD prediction and content similarity, the candidates taken from each side, and the lowest rating
+# (1-10) of a movie the content side starts from. Requests can override the weights.
+HYBRID_RECOMMENDER = {
+    'CF_WEIGHT': 0.5,
+    'CONTENT_WEIGHT': 0.5,
+    'CANDIDATES': 200,
+    'LIKED_RATING': 7,
+}
+
+# Per-request stage timing (see recommendations.timing): when enabled, responses carry a Server-Timing
+# header with the duration of each stage (fuzzy_match, similarity, lookup, rating_query, cards, render...)
+# and /metrics/ serves their histograms, with these bucket bounds in seconds, to Prometheus.
+STAGE_TIMING = {
+    'ENABLED': False,
+    'BUCKETS': (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+}
+
 MIDDLEWARE = [
+    "recommendations.timing.ServerTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -0,0 +1,234 @@
+import json
+import os
+import numpy as np
+import scipy.sparse as sp
+from .artifacts import save_array
+
+
+def normalize_rows(features):
+    """Returns the rows of a sparse matrix scaled to unit L2 norm (all-zero rows are left as they are)."""
+    features = sp.csr_matrix(features, dtype=np.float32)
+    norms = np.sqrt(np.asarray(features.multiply(features).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sp.csr_matrix(sp.diags(1.0 / norms).astype(np.float32) @ features)
+
+
+def _normalize_dense(vectors):
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class ANNIndex:
+    """
+    An approximate nearest-neighbor index over the sparse content feature vectors (an IVF index).
+
+    The unit-normalized feature vectors (TF-IDF + one-hot language + scaled numeric features) are
+    compressed with a sparse random projection and grouped into clusters by spherical k-means. A
+    query only looks at the movies of the `n_probe` clusters closest to the seed movie, and ranks
+    them by their exact cosine similarity on the original sparse vectors. More probes give better
+    recall for more work; probing every cluster gives the exact answer.
+
+    Attributes:
+        features (scipy.sparse.csr_matrix): The unit-normalized N x D feature vectors.
+        projection (scipy.sparse.csr_matrix): The sparse D x M random projection.
+        centroids (numpy array): The C x M unit-normalized cluster centroids, in projected space.
+        list_offsets (numpy array): The start of each cluster's movies in `list_positions` (C + 1 entries).
+        list_positions (numpy array): The row positions of the movies of every cluster, cluster by cluster.
+        n_probe (int): The default number of clusters searched per query.
+    """
+
+    def __init__(self, features, projection, centroids, list_offsets, list_positions, n_probe=8):
+        self.features = features
+        self.projection = projection
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_positions = list_positions
+        self.n_probe = n_probe
+
+    def __len__(self):
+        return self.features.shape[0]
+
+    @property
+    def n_lists(self):
+        """The number of clusters."""
+        return self.centroids.shape[0]
+
+    @classmethod
+    def build(cls, features, n_lists=None, dimensions=256, n_probe=8, iterations=10, sample_size=100000,
+              block_size=8192, seed=0):
+        """
+        Builds the index from a sparse feature matrix.
+
+        Parameters:
+            features (scipy sparse matrix): The N x D content feature vectors, by catalog row.
+            n_lists (int): The number of clusters, about sqrt(N) by default, at most the sample size.
+            dimensions (int): The number of random projection dimensions used for clustering.
+            n_probe (int): The default number of clusters searched per query.
+            iterations (int): The number of k-means iterations.
+            sample_size (int): The number of movies the centroids are trained on.
+            block_size (int): The number of rows projected and assigned at a time.
+            seed (int): The random seed.
+
+        Returns:
+            ANNIndex: The built index.
+        """
+        rng = np.random.default_rng(seed)
+        features = normalize_rows(features)
+        n, d = features.shape
+        sample_size = max(min(sample_size, n), 1)
+        # Every cluster starts from a different sampled movie.
+        n_lists = min(n_lists or max(int(np.sqrt(n)), 1), sample_size)
+
+        # Very sparse random projection (Li et al.): about sqrt(D) non-zeros of +-1 per output dimension.
+        nnz = max(int(np.sqrt(d) * dimensions), dimensions)
+        projection = sp.csr_matrix(
+            (rng.choice(np.array([-1.0, 1.0], dtype=np.float32), size=nnz),
+             (rng.integers(0, d, size=nnz), rng.integers(0, dimensions, size=nnz))),
+            shape=(d, dimensions),
+        )
+
+        def project(rows):
+            return _normalize_dense(np.asarray((features[rows] @ projection).todense(), dtype=np.float32))
+
+        sample = np.sort(rng.choice(n, size=sample_size, replace=False))
+        projected_sample = project(sample)
+        centroids = projected_sample[rng.choice(len(sample), size=n_lists, replace=False)]
+        for _ in range(iterations):
+            assignments = np.argmax(projected_sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, projected_sample)
+            empty = ~sums.any(axis=1)
+            # Clusters that lost all their movies restart from random movies.
+            sums[empty] = projected_sample[rng.choice(len(sample), size=int(empty.sum()), replace=False)]
+            centroids = _normalize_dense(sums)
+
+        assignments = np.empty(n, dtype=np.int32)
+        for start in range(0, n, block_size):
+            rows = np.arange(start, min(start + block_size, n))
+            assignments[rows] = np.argmax(project(rows) @ centroids.T, axis=1)
+        list_offsets, list_positions = _inverted_lists(assignments, n_lists)
+
+        return cls(features, projection, centroids, list_offsets, list_positions, n_probe)
+
+    def extend(self, features):
+        """
+        Returns the index with new movies appended, each added to the list of its closest cluster.
+
+        The clusters are not retrained; after many additions, rebuilding the index restores balanced lists.
+
+        Parameters:
+            features (scipy sparse matrix): The M x D content feature vectors of the new movies, which
+                get the row positions following the indexed movies.
+
+        Returns:
+            ANNIndex: The extended index, held in memory (see `save`).
+        """
+        features = normalize_rows(features)
+        projected = _normalize_dense(np.asarray((features @ self.projection).todense(), dtype=np.float32))
+        assignments = np.empty(len(self), dtype=np.int32)
+        assignments[self.list_positions] = np.repeat(np.arange(self.n_lists), np.diff(self.list_offsets))
+        assignments = np.concatenate([assignments, np.argmax(projected @ self.centroids.T, axis=1)])
+        list_offsets, list_positions = _inverted_lists(assignments, self.n_lists)
+
+        return ANNIndex(
+            sp.vstack([self.features, features], format='csr'),
+            self.projection,
+            self.centroids,
+            list_offsets,
+            list_positions,
+            self.n_probe,
+        )
+
+    def query(self, index_of_the_movie, k, n_probe=None):
+        """
+        Returns the approximate k most similar movies of the movie at the given row position.
+
+        Parameters:
+            index_of_the_movie (int): Row position of the seed movie.
+            k (int): The number of neighbors to return.
+            n_probe (int): The number of clusters to search, `n_probe` of the index by default.
+
+        Returns:
+            tuple of (numpy array, numpy array): Row positions of the neighbors and their cosine
+            similarity, from most to least similar. The movie itself is not included.
+        """
+        n_probe = min(n_probe or self.n_probe, self.n_lists)
+        vector = self.features[index_of_the_movie]
+        projected = _normalize_dense(np.asarray((vector @ self.projection).todense(), dtype=np.float32).ravel())
+
+        closeness = self.centroids @ projected
+        probes = np.argpartition(-closeness, n_probe - 1)[:n_probe]
+        candidates = np.concatenate([
+            self.list_positions[self.list_offsets[probe]:self.list_offsets[probe + 1]] for probe in probes
+        ]).astype(np.intp)
+        candidates = candidates[candidates != index_of_the_movie]
+
+        scores = np.asarray((self.features[candidates] @ vector.T).todense(), dtype=np.float32).ravel()
+        k = min(max(k, 0), len(candidates))
+        if k == 0:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+        best = np.argpartition(-scores, k - 1)[:k]
+        # Highest score first, lower position first on ties.
+        best = best[np.lexsort((candidates[best], -scores[best]))]
+        return candidates[best], scores[best]
+
+    def save(self, directory):
+        """Writes the index as raw .npy files plus a meta.json, each file atomically, so it can be memory-mapped."""
+        os.makedirs(directory, exist_ok=True)
+        for name, matrix in [('features', self.features), ('projection', self.projection)]:
+            save_array(os.path.join(directory, f'{name}_data.npy'), matrix.data)
+            save_array(os.path.join(directory, f'{name}_indices.npy'), matrix.indices)
+            save_array(os.path.join(directory, f'{name}_indptr.npy'), matrix.indptr)
+        save_array(os.path.join(directory, 'centroids.npy'), self.centroids)
+        save_array(os.path.join(directory, 'list_offsets.npy'), self.list_offsets)
+        save_array(os.path.join(directory, 'list_positions.npy'), self.list_positions)
+        meta_path = os.path.join(directory, 'meta.json')
+        with open(meta_path + '.tmp', 'w') as f:
+            json.dump({
+                'n_probe': self.n_probe,
+                'features_shape': list(self.features.shape),
+                'projection_shape': list(self.projection.shape),
+            }, f)
+        os.replace(meta_path + '.tmp', meta_path)
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        """
+        Loads an index written by `save`. The feature vectors and inverted lists are memory-mapped.
+
+        Parameters:
+            directory (str): The directory holding the index.
+            mmap_mode (str): The numpy memory-map mode (None loads the arrays into memory).
+
+        Returns:
+            ANNIndex: The loaded index.
+        """
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+
+        def load_array(name):
+            return np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode)
+
+        def load_matrix(name):
+            return sp.csr_matrix(
+                (load_array(f'{name}_data'), load_array(f'{name}_indices'), load_array(f'{name}_indptr')),
+                shape=tuple(meta[f'{name}_shape']), copy=False,
+            )
+
+        return cls(
+            load_matrix('features'),
+            load_matrix('projection'),
+            np.load(os.path.join(directory, 'centroids.npy')),
+            load_array('list_offsets'),
+            load_array('list_positions'),
+            meta.get('n_probe', 8),
+        )
+
+
+def _inverted_lists(assignments, n_lists):
+    """Returns the list offsets and the positions of the movies of every cluster, cluster by cluster."""
+    list_positions = np.argsort(assignments, kind='stable').astype(np.int32)
+    list_offsets = np.zeros(n_lists + 1, dtype=np.int64)
+    np.cumsum(np.bincount(assignments, minlength=n_lists), out=list_offsets[1:])
+    return list_offsets, list_positions
@@ -1,6 +1,26 @@
+import os
+import sys
+
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class RecommendationsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "recommendations"
+
+    def ready(self):
+        """
+        Connects the signal handlers, and starts loading the recommender in a background thread
+        when a server starts, so the first requests do not pay the load time. Other management
+        commands (migrate, test, ...) skip it and only load the recommender if they actually use it.
+        """
+        from . import signals  # noqa: F401
+
+        if not getattr(settings, 'RECOMMENDER_WARM_UP', True):
+            return
+        if os.path.basename(sys.argv[0]) == 'manage.py' and sys.argv[1:2] != ['runserver']:
+            return
+
+        from .provider import recommender_provider
+        recommender_provider.warm_up()
@@ -0,0 +1,62 @@
+import hashlib
+import os
+import pickle
+import numpy as np
+
+
+def load_similarity(similarity_path, mmap_mode='r'):
+    """
+    Loads the cosine similarity matrix from either a raw .npy file or the notebook's pickle.
+
+    A .npy file is memory-mapped, so every worker process opening it shares the same pages
+    of the OS page cache instead of holding a private copy, and opening it is near-instant.
+
+    Parameters:
+        similarity_path (str): Path to a .npy file or to the pickled matrix.
+        mmap_mode (str): The numpy memory-map mode for .npy files (None loads it into memory).
+
+    Returns:
+        numpy array: The N x N similarity matrix (a read-only memmap for .npy files).
+    """
+    if similarity_path.endswith('.npy'):
+        return np.load(similarity_path, mmap_mode=mmap_mode)
+    with open(similarity_path, 'rb') as f:
+        return pickle.load(f)
+
+
+def save_array(path, array):
+    """
+    Writes an array as a raw .npy file, atomically, so running workers never map a half-written file.
+
+    Parameters:
+        path (str): Destination .npy path.
+        array (numpy array): The array to write.
+    """
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.save(f, np.ascontiguousarray(array))
+    os.replace(tmp_path, path)
+
+
+def artifact_version(*paths):
+    """
+    Returns a short fingerprint of the given artifact files (or directories), built from their
+    names, sizes and modification times. Any rebuilt artifact gives a new version.
+
+    Parameters:
+        paths (str): Artifact file or directory paths; None entries are ignored.
+
+    Returns:
+        str: A 12-character hex version string.
+    """
+    digest = hashlib.sha1()
+    for path in paths:
+        if path is None:
+            continue
+        files = [path]
+        if os.path.isdir(path):
+            files = sorted(os.path.join(path, name) for name in os.listdir(path))
+        for file_path in files:
+            stat = os.stat(file_path)
+            digest.update(f"{os.path.abspath(file_path)}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()[:12]
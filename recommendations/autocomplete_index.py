@@ -0,0 +1,85 @@
+import bisect
+import numpy as np
+from .movie import release_year
+from .title_index import normalize_title
+
+
+class AutocompleteIndex:
+    """
+    An in-memory autocomplete index over movie titles, ranked by popularity.
+
+    Every word-boundary suffix of every normalized title is kept in one sorted array, so
+    a query that is a prefix of any word in a title (e.g. "dark kni" for "The Dark Knight")
+    is answered with a binary search. Matches are ranked by `popularity`, and the suggestion
+    entries (label, imdb_id, poster URL) are built once when the index is created.
+
+    Attributes:
+        entries (list of dict): The JSON-ready suggestion of every movie, by row position.
+    """
+
+    # Queries up to this length match a large part of the catalog, so their results are precomputed.
+    CACHED_PREFIX_LENGTH = 2
+
+    def __init__(self, catalog, limit=10):
+        self.limit = limit
+        n = len(catalog)
+
+        titles = catalog.column('title')
+        self.entries = []
+        for position in range(n):
+            title = str(titles[position]).strip()
+            year = release_year(catalog.value('release_date', position, default=None))
+            self.entries.append({
+                'label': f"{title} ({year})" if year else title,
+                'value': catalog.value('imdb_id', position),
+                'poster_url': catalog.poster_url(position),
+            })
+
+        # Row positions ordered from most to least popular; suffixes store ranks in this order.
+        if 'popularity' in catalog:
+            popularity = np.nan_to_num(catalog.column('popularity'))
+            self._by_rank = np.lexsort((np.arange(n), -popularity))
+        else:
+            self._by_rank = np.arange(n)
+        rank_of = np.empty(n, dtype=np.int32)
+        rank_of[self._by_rank] = np.arange(n, dtype=np.int32)
+
+        suffixes = []
+        for position, title in enumerate(titles):
+            words = normalize_title(title).split()
+            for i in range(len(words)):
+                suffixes.append((" ".join(words[i:]), rank_of[position]))
+        suffixes.sort()
+        self._suffixes = [suffix for suffix, _ in suffixes]
+        self._suffix_ranks = np.array([rank for _, rank in suffixes], dtype=np.int32)
+
+        self._cached = {}
+        for suffix in set(s[:length] for s in self._suffixes for length in range(1, self.CACHED_PREFIX_LENGTH + 1)):
+            self._cached[suffix] = self._top_ranks(suffix)
+
+    def _top_ranks(self, prefix):
+        start = bisect.bisect_left(self._suffixes, prefix)
+        stop = bisect.bisect_left(self._suffixes, prefix + "\U0010ffff", lo=start)
+        # np.unique sorts the ranks, so the most popular matches come first.
+        return np.unique(self._suffix_ranks[start:stop])[:self.limit]
+
+    def suggest(self, query):
+        """
+        Returns the most popular movies having a title word that starts with the query.
+
+        Parameters:
+            query (str): The text typed in the search box.
+
+        Returns:
+            list of dict: Up to `limit` suggestions, each with 'label', 'value' (imdb_id) and 'poster_url'.
+        """
+        prefix = normalize_title(query)
+        if not prefix:
+            return []
+
+        ranks = self._cached.get(prefix)
+        if ranks is None:
+            if len(prefix) <= self.CACHED_PREFIX_LENGTH:
+                return []
+            ranks = self._top_ranks(prefix)
+        return [self.entries[position] for position in self._by_rank[ranks]]
@@ -0,0 +1,218 @@
+import gc
+import itertools
+import platform
+import time
+import tracemalloc
+import numpy as np
+
+
+class BenchmarkCase:
+    """
+    A timed hot path, called once per input in turn.
+
+    Attributes:
+        name (str): The name the results are reported and compared under.
+        func (callable): The code to time, called with one input.
+        inputs (list): The inputs, cycled through over the iterations.
+    """
+
+    def __init__(self, name, func, inputs):
+        self.name = name
+        self.func = func
+        self.inputs = inputs
+
+    def run(self, iterations=200, warmup=20, allocation_samples=20):
+        """
+        Times the case and measures its memory allocations.
+
+        The timed calls run without allocation tracing, which would slow them down; a separate,
+        shorter pass measures the peak memory allocated by a call with tracemalloc.
+
+        Parameters:
+            iterations (int): The number of timed calls.
+            warmup (int): The number of untimed calls made first.
+            allocation_samples (int): The number of calls traced for allocations.
+
+        Returns:
+            dict: The p50, p95, p99 and mean duration of a call in milliseconds, the number of
+            iterations, and the mean and largest peak allocation of a call in KiB.
+        """
+        inputs = itertools.cycle(self.inputs)
+        for _ in range(warmup):
+            self.func(next(inputs))
+
+        durations = np.empty(iterations)
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for i in range(iterations):
+                value = next(inputs)
+                started = time.perf_counter_ns()
+                self.func(value)
+                durations[i] = time.perf_counter_ns() - started
+        finally:
+            if gc_enabled:
+                gc.enable()
+        durations /= 1e6
+
+        peaks = np.empty(allocation_samples)
+        tracemalloc.start()
+        try:
+            for i in range(allocation_samples):
+                value = next(inputs)
+                tracemalloc.reset_peak()
+                baseline, _ = tracemalloc.get_traced_memory()
+                self.func(value)
+                peaks[i] = tracemalloc.get_traced_memory()[1] - baseline
+        finally:
+            tracemalloc.stop()
+
+        p50, p95, p99 = np.percentile(durations, [50, 95, 99])
+        return {
+            'p50_ms': round(float(p50), 4),
+            'p95_ms': round(float(p95), 4),
+            'p99_ms': round(float(p99), 4),
+            'mean_ms': round(float(durations.mean()), 4),
+            'iterations': iterations,
+            'alloc_peak_mean_kib': round(float(peaks.mean()) / 1024, 2),
+            'alloc_peak_max_kib': round(float(peaks.max()) / 1024, 2),
+        }
+
+
+def _misspell(title):
+    """Drops a letter from the middle of a title, like a typo."""
+    middle = len(title) // 2
+    return title[:middle] + title[middle + 1:] if len(title) > 3 else title
+
+
+def default_cases(cosine_recommender, sample_size=20):
+    """
+    Builds the benchmark cases over realistic inputs taken from the loaded catalog.
+
+    Parameters:
+        cosine_recommender (CosineRecommender): The loaded recommender.
+        sample_size (int): The number of popular and of rare movies inputs are taken from.
+
+    Returns:
+        list of BenchmarkCase: The cases.
+    """
+    # Imported here, so `python -m recommendations.benchmarks` can set up Django first.
+    from django.contrib.auth.models import AnonymousUser
+    from django.test import RequestFactory
+    from .movie_display import MovieDisplay
+    from .views import autocomplete_view, index_view
+
+    catalog = cosine_recommender.catalog
+    titles = catalog.column('title')
+    imdb_ids = catalog.column('imdb_id')
+    if 'popularity' in catalog:
+        by_popularity = catalog.top_positions('popularity', len(catalog))
+    else:
+        by_popularity = np.arange(len(catalog))
+    popular = by_popularity[:sample_size].tolist()
+    rare = by_popularity[-sample_size:].tolist()
+
+    popular_titles = [str(titles[position]) for position in popular]
+    fuzzy_titles = list(itertools.chain.from_iterable(
+        (title, title.lower(), _misspell(title), title.split()[0]) for title in popular_titles
+    ))
+    short_terms = sorted({title[:2].lower() for title in popular_titles})
+    long_terms = [title.lower()[:-1] for title in popular_titles if len(title) > 8] or popular_titles
+
+    factory = RequestFactory()
+
+    def get(path, params=None):
+        request = factory.get(path, params)
+        request.user = AnonymousUser()
+        return request
+
+    def movies(count):
+        return [catalog.movie(position) for position in by_popularity[:count].tolist()]
+
+    return [
+        BenchmarkCase('get_recommendations[fuzzy_title]',
+                      lambda title: cosine_recommender.get_recommendations(title, 10), fuzzy_titles),
+        BenchmarkCase('get_recommendations_by_id[popular]',
+                      lambda movie_id: cosine_recommender.get_recommendations_by_id(movie_id, 10),
+                      [imdb_ids[position] for position in popular]),
+        BenchmarkCase('get_recommendations_by_id[rare]',
+                      lambda movie_id: cosine_recommender.get_recommendations_by_id(movie_id, 10),
+                      [imdb_ids[position] for position in rare]),
+        BenchmarkCase('autocomplete_view[short_term]',
+                      lambda term: autocomplete_view(get('/autocomplete/', {'term': term})), short_terms),
+        BenchmarkCase('autocomplete_view[long_term]',
+                      lambda term: autocomplete_view(get('/autocomplete/', {'term': term})), long_terms),
+        BenchmarkCase('index_view', lambda _: index_view(get('/')), [None]),
+        BenchmarkCase('MovieDisplay.render_html[10]', lambda page: MovieDisplay(page).render_html(), [movies(10)]),
+        BenchmarkCase('MovieDisplay.render_html[50]', lambda page: MovieDisplay(page).render_html(), [movies(50)]),
+    ]
+
+
+def run_benchmarks(cases, iterations=200, warmup=20, only=None):
+    """
+    Runs benchmark cases.
+
+    Parameters:
+        cases (list of BenchmarkCase): The cases.
+        iterations (int): The number of timed calls per case.
+        warmup (int): The number of untimed calls made first.
+        only (list of str): Substrings of the names of the cases to run; all cases when None.
+
+    Returns:
+        dict: The results by case name (see BenchmarkCase.run).
+    """
+    return {
+        case.name: case.run(iterations, warmup)
+        for case in cases
+        if not only or any(part in case.name for part in only)
+    }
+
+
+def report_metadata(cosine_recommender):
+    """Describes the environment the benchmarks ran in, saved next to the results."""
+    from django.utils import timezone
+
+    return {
+        'created_at': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'catalog_size': len(cosine_recommender.catalog),
+        'model_version': cosine_recommender.model_version,
+    }
+
+
+def compare(results, baseline, metric='p50_ms', threshold=0.25):
+    """
+    Compares results against a baseline run.
+
+    Parameters:
+        results (dict): The results by case name.
+        baseline (dict): The baseline results by case name.
+        metric (str): The compared statistic, e.g. 'p50_ms' or 'p95_ms'.
+        threshold (float): The allowed relative slowdown, e.g. 0.25 for 25%.
+
+    Returns:
+        list of tuple of (str, float, float): The name, baseline and current value of every case
+        slower than the baseline by more than the threshold. Cases missing from either run are skipped.
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before, after = baseline[name][metric], result[metric]
+        if after > before * (1 + threshold):
+            regressions.append((name, before, after))
+    return regressions
+
+
+if __name__ == '__main__':
+    import os
+    import sys
+    import django
+    from django.core.management import call_command
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'MovieProject.settings')
+    django.setup()
+    call_command('run_benchmarks', *sys.argv[1:])
@@ -1,6 +1,14 @@
-import difflib
-import pickle
+import numpy as np
 import pandas as pd
+from .ann_index import ANNIndex
+from .artifacts import artifact_version, load_similarity
+from .autocomplete_index import AutocompleteIndex
+from .movie_catalog import MovieCatalog
+from .movie import Recommendation
+from .movie_display import MovieDisplay
+from .neighbor_index import NeighborIndex
+from .title_index import TitleIndex
+from .timing import stage
 
 
 class CosineRecommender:
@@ -8,101 +16,356 @@ class CosineRecommender:
     A recommendation system that suggests similar movies based on cosine similarity.
 
     Attributes:
-        movies_tmdb (DataFrame): A DataFrame containing movie metadata, including IMDb IDs and titles.
+        catalog (MovieCatalog): A compact columnar catalog of the movie metadata, including IMDb IDs and titles.
         similarity (numpy array): A precomputed cosine similarity matrix for movie recommendations.
+            Memory-mapped when loaded from a .npy file, None when the recommender answers from a neighbor index.
+        neighbors (NeighborIndex): A precomputed top-K neighbor index, used instead of the dense
+            similarity matrix when provided.
+        ann (ANNIndex): An approximate nearest-neighbor index over the content feature vectors, used
+            instead of a precomputed similarity for catalogs too large for one.
+        title_index (TitleIndex): A trigram index over the titles, used for fuzzy title matching.
+        autocomplete_index (AutocompleteIndex): A popularity-ranked prefix index for search box suggestions.
+        model_version (str): A fingerprint of the loaded artifacts, used to key cached results.
+        popular_positions (numpy array): The row positions of the most popular movies, most popular first.
+        popular_cards (list of str): The pre-rendered HTML card of each movie in `popular_positions`.
     """
 
-    def __init__(self, movies_pkl_path, similarity_path):
+    # The number of most popular movies the home page samples from.
+    POPULAR_MOVIES_COUNT = 100
 
-        self.movies_tmdb = pd.read_pickle(movies_pkl_path)
+    def __init__(self, movies_pkl_path, similarity_path=None, neighbors_path=None, ann_path=None, ann_probes=None):
 
-        self.movies_tmdb['imdb_id'] = self.movies_tmdb['imdb_id'].astype(str).str.strip()
+        if similarity_path is None and neighbors_path is None and ann_path is None:
+            raise ValueError("A similarity matrix, a neighbor index or an ANN index path is required.")
 
-        with open(similarity_path, 'rb') as f:
-            self.similarity = pickle.load(f)
+        # Only the compact catalog stays resident; the full DataFrame is released after loading.
+        self.catalog = MovieCatalog.from_dataframe(pd.read_pickle(movies_pkl_path))
 
-    def get_recommendations(self, movie_name, number_of_recommendations=12):
+        self.model_version = artifact_version(movies_pkl_path, similarity_path, neighbors_path, ann_path)
+
+        self.similarity = None
+        self.neighbors = None
+        self.ann = None
+        if neighbors_path is not None:
+            self.neighbors = NeighborIndex.load(neighbors_path)
+        elif ann_path is not None:
+            self.ann = ANNIndex.load(ann_path)
+            if ann_probes:
+                self.ann.n_probe = ann_probes
+        else:
+            self.similarity = load_similarity(similarity_path)
+
+        # Positional views of the columns used on every request, so results can be
+        # resolved by row position instead of scanning the DataFrame.
+        self._titles = self.catalog.column('title')
+        self._imdb_ids = self.catalog.column('imdb_id')
+
+        # Hash indexes for constant-time lookups, built once at load time.
+        self._position_by_id = {}
+        self._positions_by_title = {}
+        for position, (movie_id, title) in enumerate(zip(self._imdb_ids, self._titles)):
+            self._position_by_id.setdefault(movie_id, position)
+            self._positions_by_title.setdefault(title, []).append(position)
 
+        self.title_index = TitleIndex(self._titles)
+        self.autocomplete_index = AutocompleteIndex(self.catalog)
+
+        # The home page only samples from these, so its cards are rendered once per model load.
+        if 'popularity' in self.catalog:
+            self.popular_positions = self.catalog.top_positions('popularity', self.POPULAR_MOVIES_COUNT)
+        else:
+            self.popular_positions = np.arange(min(len(self.catalog), self.POPULAR_MOVIES_COUNT))
+        self.popular_cards = [
+            MovieDisplay.render_card(self.catalog.movie(position)) for position in self.popular_positions
+        ]
+
+    def get_position(self, movie_id):
         """
-        Recommend top similar movies based on the provided movie name using cosine similarity.
+        Look up the row position of a movie by its IMDb ID in constant time.
+
+        Parameters:
+            movie_id (str): The IMDb ID of the movie (surrounding whitespace is ignored).
+
+        Returns:
+            int or None: The row position of the movie, or None if the ID is unknown.
+        """
+        return self._position_by_id.get(str(movie_id).strip())
+
+    def get_positions(self, movie_ids):
+        """
+        Look up the row positions of many movies by their IMDb IDs in one batch.
+
+        Parameters:
+            movie_ids (iterable of str): The IMDb IDs of the movies (surrounding whitespace is ignored).
+
+        Returns:
+            list of (int or None): The row position of each movie, None for unknown IDs.
+        """
+        position_by_id = self._position_by_id
+        return [position_by_id.get(str(movie_id).strip()) for movie_id in movie_ids]
+
+    def get_positions_by_title(self, title):
+        """
+        Look up the row positions of all movies with exactly the given title in constant time.
+
+        Parameters:
+            title (str): The movie title.
+
+        Returns:
+            list of int: The row positions of the movies with that title, empty if there are none.
+        """
+        return self._positions_by_title.get(title, [])
+
+    def find_movie(self, movie_name):
+        """
+        Find the movie whose title best matches the provided (possibly misspelled) name.
+
+        Parameters:
+            movie_name (str): The title typed by the user.
+
+        Returns:
+            tuple of (str, int) or None: The matched title and its row position, or None if no title is close enough.
+        """
+        with stage('fuzzy_match'):
+            return self.title_index.match(movie_name)
+
+    def get_top_similar(self, index_of_the_movie, number_of_recommendations=12):
+        """
+        Select the most similar movies for the movie at the given row position.
+
+        Only the best candidates are selected from the similarity row (partial
+        selection instead of a full sort). The movie itself, and any other movie
+        sharing its title, is excluded from the results. When a neighbor index is loaded,
+        the answer comes from the movie's stored neighbors in O(K), so at most K
+        recommendations are available. When an ANN index is loaded, the answer is approximate
+        (see ANNIndex.query).
+
+        Parameters:
+            index_of_the_movie (int): Row position of the seed movie.
+            number_of_recommendations (int): The number of recommendations to return.
+
+        Returns:
+            tuple of (numpy array, numpy array): Row positions of the recommended movies
+            and their similarity scores, ordered from most to least similar.
+        """
+        if self.neighbors is not None or self.ann is not None:
+            if self.neighbors is not None:
+                positions, scores = self.neighbors.neighbors(index_of_the_movie)
+            else:
+                excluded = self._positions_by_title[self._titles[index_of_the_movie]]
+                positions, scores = self.ann.query(index_of_the_movie, number_of_recommendations + len(excluded))
+            keep = self._titles[positions] != self._titles[index_of_the_movie]
+            count = max(number_of_recommendations, 0)
+            return positions[keep][:count], scores[keep][:count]
+
+        scores = np.asarray(self.similarity[index_of_the_movie])
+        excluded = self._positions_by_title[self._titles[index_of_the_movie]]
+
+        k = min(number_of_recommendations + len(excluded), len(scores))
+        if number_of_recommendations <= 0 or k == 0:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=scores.dtype)
+
+        # Keep every score tied with the k-th best one, so the order below matches a
+        # stable full sort (highest score first, lower position first on ties).
+        kth_score = np.partition(scores, len(scores) - k)[len(scores) - k]
+        candidates = np.flatnonzero(scores >= kth_score)
+        candidates = candidates[np.lexsort((candidates, -scores[candidates]))]
+        candidates = candidates[~np.isin(candidates, excluded)][:number_of_recommendations]
+
+        return candidates, scores[candidates]
+
+    def recommend_by_index(self, index_of_the_movie, number_of_recommendations=12):
+        """
+        Recommend top similar movies for the movie at the given row position, as structured results.
+
+        Parameters:
+            index_of_the_movie (int): Row position of the movie to find recommendations for.
+            number_of_recommendations (int): The number of recommendations to return.
+
+        Returns:
+            list of Recommendation: The recommended movies with their row position, IMDb ID, title
+            and similarity score, ordered from most to least similar.
+        """
+        with stage('similarity'):
+            positions, scores = self.get_top_similar(index_of_the_movie, number_of_recommendations)
+        with stage('lookup'):
+            return [
+                Recommendation(position, self._imdb_ids[position], self._titles[position], score)
+                for position, score in zip(positions.tolist(), scores.tolist())
+            ]
+
+    def recommend_by_id(self, movie_id, number_of_recommendations=12):
+        """
+        Recommend top similar movies for the movie with the given IMDb ID, as structured results.
+
+        Parameters:
+            movie_id (str): The unique movie ID (imdb_id) to find recommendations for.
+            number_of_recommendations (int): The number of recommendations to return.
+
+        Returns:
+            list of Recommendation: The recommended movies, empty if the ID is unknown.
+        """
+        index_of_the_movie = self.get_position(movie_id)
+        if index_of_the_movie is None:
+            print("Movie ID not found:", movie_id)
+            return []
+        return self.recommend_by_index(index_of_the_movie, number_of_recommendations)
+
+    def recommend(self, movie_name, number_of_recommendations=12):
+        """
+        Recommend top similar movies for the title best matching the provided name, as structured results.
 
         Parameters:
             movie_name (str): The title of the movie to find similar recommendations for.
             number_of_recommendations (int): The number of recommendations to return.
 
         Returns:
-            recommendations (list of str): A list of recommended movie titles.
+            list of Recommendation: The recommended movies, empty if no title is close enough.
         """
+        match = self.find_movie(movie_name)
+        if match is None:
+            return []
+        _, index_of_the_movie = match
+        return self.recommend_by_index(index_of_the_movie, number_of_recommendations)
 
-        list_of_all_titles = self.movies_tmdb['title'].tolist()
+    def recommend_for_seeds(self, liked, disliked=(), number_of_recommendations=12, disliked_weight=1.0):
+        """
+        Recommend movies similar to a set of liked movies and unlike a set of disliked ones.
 
-        find_close_match = difflib.get_close_matches(movie_name, list_of_all_titles)
-        if not find_close_match:
+        A movie's score is its mean similarity to the liked movies minus `disliked_weight` times its
+        mean similarity to the disliked ones: the seeds' similarity rows (or stored neighbor lists)
+        are gathered and combined with these weights in one operation. With a neighbor or ANN index
+        only the neighbors of the liked movies are candidates, and a seed contributes nothing to the
+        movies outside its neighbors. The seeds, and any movie sharing a seed's title, are excluded.
+
+        Parameters:
+            liked (iterable of int): Row positions of the liked movies.
+            disliked (iterable of int): Row positions of the disliked movies.
+            number_of_recommendations (int): The number of recommendations to return.
+            disliked_weight (float): How strongly similarity to the disliked movies counts against a movie.
+
+        Returns:
+            list of Recommendation: The recommended movies with their combined score, best first;
+            empty without liked movies.
+        """
+        liked = list(dict.fromkeys(liked))
+        disliked = [position for position in dict.fromkeys(disliked) if position not in liked]
+        if not liked or number_of_recommendations <= 0:
             return []
+        seeds = np.array(liked + disliked, dtype=np.intp)
+        weights = np.concatenate([
+            np.full(len(liked), 1.0 / len(liked)),
+            np.full(len(disliked), -disliked_weight / max(len(disliked), 1)),
+        ])
+        excluded = np.unique(np.concatenate([self._positions_by_title[self._titles[seed]] for seed in seeds]))
 
-        close_match = find_close_match[0]
+        if self.similarity is not None:
+            scores = weights @ np.asarray(self.similarity[seeds], dtype=np.float64)
+            candidates = np.arange(len(scores))
+        else:
+            if self.neighbors is not None:
+                positions = np.asarray(self.neighbors.positions[seeds], dtype=np.intp).ravel()
+                contributions = (weights[:, None] * np.asarray(self.neighbors.scores[seeds], dtype=np.float64)).ravel()
+                liked_entries = len(liked) * self.neighbors.k
+            else:
+                lists = [self.ann.query(seed, number_of_recommendations + len(excluded)) for seed in seeds]
+                positions = np.concatenate([neighbors for neighbors, _ in lists])
+                contributions = np.concatenate([
+                    weight * neighbor_scores.astype(np.float64) for weight, (_, neighbor_scores) in zip(weights, lists)
+                ])
+                liked_entries = sum(len(neighbors) for neighbors, _ in lists[:len(liked)])
+            # Sum the weighted contributions of every seed to each candidate.
+            candidates, inverse = np.unique(positions, return_inverse=True)
+            scores = np.bincount(inverse, weights=contributions, minlength=len(candidates))
+            liked_neighbors = np.zeros(len(candidates), dtype=bool)
+            liked_neighbors[inverse[:liked_entries]] = True
+            candidates, scores = candidates[liked_neighbors], scores[liked_neighbors]
 
-        index_of_the_movie = self.movies_tmdb[self.movies_tmdb.title == close_match].index.values[0]
-        title_of_the_movie = self.movies_tmdb[self.movies_tmdb.title == close_match]['title'].values[0]
+        keep = ~np.isin(candidates, excluded)
+        candidates, scores = candidates[keep], scores[keep]
+        k = min(number_of_recommendations, len(candidates))
+        if k == 0:
+            return []
+        # Highest score first, lower position first on ties, as in get_top_similar.
+        kth_score = np.partition(scores, len(scores) - k)[len(scores) - k]
+        best = np.flatnonzero(scores >= kth_score)
+        best = best[np.lexsort((candidates[best], -scores[best]))][:k]
+        return [
+            Recommendation(position, self._imdb_ids[position], self._titles[position], score)
+            for position, score in zip(candidates[best].tolist(), scores[best].tolist())
+        ]
 
-        similarity_score = list(enumerate(self.similarity[index_of_the_movie]))
+    def similarity_between(self, seeds, candidates):
+        """
+        Look up the similarities between seed movies and candidate movies.
 
-        sorted_similar_movies = sorted(similarity_score, key=lambda x: x[1], reverse=True)
+        With a neighbor index only the stored neighbors are known, and every other similarity is 0;
+        with an ANN index the exact cosine similarities are computed from the feature vectors.
 
-        recommendations = []
-        i = 1
-        for movie in sorted_similar_movies:
+        Parameters:
+            seeds (numpy array): Row positions of the S seed movies.
+            candidates (numpy array): Row positions of the C candidate movies.
 
-            index = movie[0]
+        Returns:
+            numpy array: An S x C float64 array of similarities.
+        """
+        seeds = np.asarray(seeds, dtype=np.intp)
+        candidates = np.asarray(candidates, dtype=np.intp)
+        if self.similarity is not None:
+            # Only the S x C block is read from the (possibly memory-mapped) matrix, and only it is cast.
+            return np.asarray(self.similarity[np.ix_(seeds, candidates)], dtype=np.float64)
+        if self.ann is not None:
+            features = self.ann.features
+            return np.asarray((features[seeds] @ features[candidates].T).todense(), dtype=np.float64)
 
-            title_from_index = self.movies_tmdb[self.movies_tmdb.index == index]['title'].values[0]
-            if title_from_index != title_of_the_movie:
-                if i <= number_of_recommendations:
-                    recommendations.append(title_from_index)
-                    i += 1
-            if i > number_of_recommendations:
-                break
+        similarities = np.zeros((len(seeds), len(candidates)))
+        order = np.argsort(candidates, kind='stable')
+        sorted_candidates = candidates[order]
+        positions = np.asarray(self.neighbors.positions[seeds], dtype=np.intp)
+        scores = np.asarray(self.neighbors.scores[seeds], dtype=np.float64)
+        slots = np.minimum(np.searchsorted(sorted_candidates, positions), max(len(candidates) - 1, 0))
+        found = sorted_candidates[slots] == positions if len(candidates) else np.zeros_like(positions, dtype=bool)
+        rows = np.broadcast_to(np.arange(len(seeds))[:, None], positions.shape)
+        similarities[rows[found], order[slots[found]]] = scores[found]
+        return similarities
 
-        return recommendations
+    def get_recommendations(self, movie_name, number_of_recommendations=12):
 
-    def get_recommendations_by_id(self, movie_id, number_of_recommendations=12):
         """
-        Recommend top similar movies based on the provided movie ID using cosine similarity.
-        This method uses the same logic as get_recommendations but skips the difflib matching.
+        Recommend top similar movies based on the provided movie name using cosine similarity.
 
         Parameters:
-            movie_id (str): The unique movie ID (imdb_id) to find recommendations for.
+            movie_name (str): The title of the movie to find similar recommendations for.
             number_of_recommendations (int): The number of recommendations to return.
 
         Returns:
             recommendations (list of str): A list of recommended movie titles.
         """
-        # Ensure the movie_id is a clean string
-        movie_id = str(movie_id).strip()
-        # Look up the movie row by its imdb_id.
-        movie_row = self.movies_tmdb[self.movies_tmdb['imdb_id'] == movie_id]
-        if movie_row.empty:
-            print("Movie ID not found:", movie_id)
-            return []
+        return [result.title for result in self.recommend(movie_name, number_of_recommendations)]
 
-        index_of_the_movie = movie_row.index.values[0]
-        title_of_the_movie = movie_row.iloc[0]['title']
+    def get_recommendations_by_index(self, index_of_the_movie, number_of_recommendations=12):
+        """
+        Recommend top similar movies for the movie at the given row position, e.g. one returned by find_movie.
+
+        Parameters:
+            index_of_the_movie (int): Row position of the movie to find recommendations for.
+            number_of_recommendations (int): The number of recommendations to return.
 
-        similarity_score = list(enumerate(self.similarity[index_of_the_movie]))
+        Returns:
+            recommendations (list of str): A list of recommended movie titles.
+        """
+        return [result.title for result in self.recommend_by_index(index_of_the_movie, number_of_recommendations)]
 
-        sorted_similar_movies = sorted(similarity_score, key=lambda x: x[1], reverse=True)
+    def get_recommendations_by_id(self, movie_id, number_of_recommendations=12):
+        """
+        Recommend top similar movies based on the provided movie ID using cosine similarity.
+        This method uses the same logic as get_recommendations but skips the fuzzy title matching.
 
-        recommendations = []
-        i = 1
-        for movie in sorted_similar_movies:
-            idx = movie[0]
-            title_from_index = self.movies_tmdb.loc[idx, 'title']
-            # Skip the movie itself.
-            if title_from_index != title_of_the_movie:
-                if i <= number_of_recommendations:
-                    recommendations.append(title_from_index)
-                    i += 1
-                else:
-                    break
+        Parameters:
+            movie_id (str): The unique movie ID (imdb_id) to find recommendations for.
+            number_of_recommendations (int): The number of recommendations to return.
 
-        return recommendations
+        Returns:
+            recommendations (list of str): A list of recommended movie titles.
+        """
+        return [result.title for result in self.recommend_by_id(movie_id, number_of_recommendations)]
@@ -0,0 +1,50 @@
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+
+class CPUExecutor:
+    """
+    A bounded thread pool for the CPU-bound work of the async views (scoring, fuzzy matching,
+    loading the recommender), so the event loop never blocks on it.
+
+    NumPy releases the GIL during large array operations, so several requests can score at once.
+    The pool is created on first use with RECOMMENDATION_EXECUTOR_WORKERS threads; work beyond
+    that waits in the pool's queue instead of starting more threads.
+    """
+
+    def __init__(self, max_workers=None):
+        self._max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    max_workers = self._max_workers or getattr(settings, 'RECOMMENDATION_EXECUTOR_WORKERS', 4)
+                    self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='recommender-cpu')
+        return self._executor
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Runs a function on the pool and waits for its result without blocking the event loop.
+
+        Parameters:
+            func (callable): The function to run.
+            args, kwargs: Its arguments.
+
+        Returns:
+            object: The function's return value (its exception is raised here).
+        """
+        loop = asyncio.get_running_loop()
+        # Run in a copy of the caller's context, so the work is timed as a stage of its request.
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self._get_executor(), functools.partial(context.run, func, *args, **kwargs))
+
+
+cpu_executor = CPUExecutor()
@@ -0,0 +1,440 @@
+import functools
+import hashlib
+import json
+import multiprocessing
+import os
+import pickle
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+# Bump when the preprocessing below changes, so the cached stages built by older code are not reused.
+PIPELINE_VERSION = 1
+
+
+def fix_jr(cast_string):
+    """
+    Corrects the formatting of 'Jr.' in a cast string.
+
+    Parameters:
+        cast_string (str): A string containing cast members separated by commas.
+
+    Returns:
+        str: A corrected cast string with 'Jr.' properly appended to the preceding name.
+    """
+    corrected_parts = []
+    for i, part in enumerate(cast_string.split(', ')):
+        if i > 0 and part.strip() == 'Jr.':
+            corrected_parts[-1] = f"{corrected_parts[-1]} Jr."
+        else:
+            corrected_parts.append(part)
+    return ', '.join(corrected_parts)
+
+
+@functools.lru_cache(maxsize=None)
+def _stop_words():
+    from nltk.corpus import stopwords
+    return frozenset(stopwords.words('english'))
+
+
+@functools.lru_cache(maxsize=None)
+def _stemmer():
+    from nltk.stem import SnowballStemmer
+    return SnowballStemmer('english')
+
+
+@functools.lru_cache(maxsize=None)
+def _stem(token):
+    # Memoized per token: a catalog has far fewer distinct words than word occurrences.
+    return _stemmer().stem(token)
+
+
+def preprocess_text(text, stem=True):
+    """
+    Preprocesses text by lowercasing, tokenizing, removing stop words and non-alphabetic tokens,
+    and optionally applying Snowball stemming.
+
+    Parameters:
+        text (str): The text to preprocess.
+        stem (bool): Whether to stem the tokens.
+
+    Returns:
+        str: The preprocessed tokens, joined by spaces.
+    """
+    from nltk import word_tokenize
+    stop_words = _stop_words()
+    tokens = [word for word in word_tokenize(text.lower()) if word.isalpha() and word not in stop_words]
+    if stem:
+        tokens = [_stem(word) for word in tokens]
+    return ' '.join(tokens)
+
+
+def check_nltk_data():
+    """
+    Checks that the NLTK data the preprocessing needs is installed.
+
+    Raises:
+        LookupError: If the 'punkt_tab' tokenizer or the 'stopwords' corpus is missing
+            (install them with `nltk.download('punkt_tab')` and `nltk.download('stopwords')`).
+    """
+    import nltk
+    nltk.data.find('tokenizers/punkt_tab/english/')
+    nltk.data.find('corpora/stopwords')
+
+
+def _preprocess_chunk(task):
+    texts, stem = task
+    return [preprocess_text(text, stem) if text else '' for text in texts]
+
+
+def preprocess_texts(texts, stem=True, workers=1, chunk_size=2000):
+    """
+    Preprocesses many texts, in chunks spread over a pool of worker processes.
+
+    Parameters:
+        texts (list of str): The texts to preprocess.
+        stem (bool): Whether to stem the tokens.
+        workers (int): The number of worker processes (1 preprocesses in this process).
+        chunk_size (int): The number of texts sent to a worker at a time.
+
+    Returns:
+        list of str: The preprocessed texts, in the same order.
+    """
+    tasks = [(texts[start:start + chunk_size], stem) for start in range(0, len(texts), chunk_size)]
+    if workers > 1 and len(tasks) > 1:
+        with multiprocessing.Pool(workers) as pool:
+            chunks = pool.map(_preprocess_chunk, tasks, chunksize=1)
+    else:
+        chunks = [_preprocess_chunk(task) for task in tasks]
+    return [text for chunk in chunks for text in chunk]
+
+
+def _as_text(value, separator=' '):
+    """Returns a text column value as a string: lists are joined, missing values are empty."""
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return separator.join(str(item) for item in value)
+    if isinstance(value, str):
+        return value
+    return ''
+
+
+def read_catalog(path, chunk_size=100000):
+    """
+    Reads the movie catalog (movies_filter.pkl, or the same columns as a CSV read in chunks).
+
+    Parameters:
+        path (str): Path to the pickled DataFrame or to a CSV file.
+        chunk_size (int): The number of CSV rows read at a time.
+
+    Returns:
+        pandas.DataFrame: The catalog, one row per movie, in catalog order.
+    """
+    if path.endswith('.pkl'):
+        return pd.read_pickle(path).reset_index(drop=True)
+    chunks = pd.read_csv(path, chunksize=chunk_size, parse_dates=['release_date'])
+    return pd.concat(chunks, ignore_index=True)
+
+
+def read_tags(tags_path, links_path, imdb_ids, chunk_size=500000):
+    """
+    Reads the MovieLens tags and joins the tags of every catalog movie into one string.
+
+    tags.csv has tens of millions of rows, so it is read in chunks; each chunk is reduced to the
+    catalog's movies and grouped before the next one is read.
+
+    Parameters:
+        tags_path (str): Path to MovieLens tags.csv (userId, movieId, tag, timestamp).
+        links_path (str): Path to MovieLens links.csv (movieId, imdbId, tmdbId).
+        imdb_ids (iterable of int): The IMDb IDs of the catalog's movies.
+        chunk_size (int): The number of CSV rows read at a time.
+
+    Returns:
+        pandas.Series: The space-joined tags of every catalog movie that has tags, by IMDb ID.
+    """
+    links = pd.read_csv(links_path, usecols=['movieId', 'imdbId'])
+    links = links[links.imdbId.isin(set(imdb_ids))]
+    imdb_by_movielens_id = dict(zip(links.movieId, links.imdbId))
+
+    grouped = []
+    for chunk in pd.read_csv(tags_path, usecols=['movieId', 'tag'], chunksize=chunk_size):
+        chunk = chunk[chunk.movieId.isin(imdb_by_movielens_id.keys()) & chunk.tag.notna()]
+        imdb = chunk.movieId.map(imdb_by_movielens_id)
+        grouped.append(chunk.tag.astype(str).groupby(imdb.values, sort=False).agg(' '.join))
+    if not grouped:
+        return pd.Series(dtype=object)
+    return pd.concat(grouped).groupby(level=0, sort=False).agg(' '.join)
+
+
+def frame_hash(frame):
+    """Returns a hex digest of the values of a DataFrame (or Series), ignoring its index."""
+    return hashlib.sha1(pd.util.hash_pandas_object(frame, index=False).values.tobytes()).hexdigest()
+
+
+def file_hash(path, block_size=1 << 20):
+    """Returns a hex digest of a file's content, read in blocks."""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def stage_key(*parts):
+    """Returns the cache key of a stage from the keys of its inputs and its parameters."""
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class StageCache:
+    """
+    An on-disk cache of the intermediate results of the feature pipeline.
+
+    Every stage result is pickled under the hash of the stage's inputs and parameters, so a rebuild
+    reuses the stages whose inputs did not change. Only the latest result of each stage is kept.
+
+    Attributes:
+        directory (str): The directory the results are written to.
+        hits (dict): Whether each stage run so far was served from the cache, by stage name.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.hits = {}
+
+    def _path(self, stage, key):
+        return os.path.join(self.directory, f'{stage}-{key[:16]}.pkl')
+
+    def get_or_build(self, stage, key, build):
+        """
+        Returns the cached result of a stage, building and caching it when its key is not cached.
+
+        Parameters:
+            stage (str): The name of the stage.
+            key (str): The hash of the stage's inputs and parameters.
+            build (callable): Computes the result; called without arguments on a miss.
+
+        Returns:
+            object: The result of the stage.
+        """
+        path = self._path(stage, key)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                result = pickle.load(f)
+            self.hits[stage] = True
+            return result
+
+        result = build()
+        os.makedirs(self.directory, exist_ok=True)
+        with open(path + '.tmp', 'wb') as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + '.tmp', path)
+        for name in os.listdir(self.directory):
+            if name.startswith(f'{stage}-') and name.endswith('.pkl') and name != os.path.basename(path):
+                os.remove(os.path.join(self.directory, name))
+        self.hits[stage] = False
+        return result
+
+
+def text_inputs(movies, tags=None):
+    """
+    Returns the raw text columns the documents are built from, as strings.
+
+    Parameters:
+        movies (pandas.DataFrame): The catalog.
+        tags (pandas.Series): The joined tags by IMDb ID (see `read_tags`); a `tag` column of
+            `movies` is used when None.
+
+    Returns:
+        pandas.DataFrame: One row per movie with its genres, tag, overview, cast, director and
+            spoken_languages.
+    """
+    if tags is not None:
+        tag = movies.imdb_id.map(tags)
+    elif 'tag' in movies:
+        tag = movies['tag']
+    else:
+        tag = pd.Series('', index=movies.index)
+    return pd.DataFrame({
+        'genres': movies['genres'].map(lambda value: _as_text(value).replace(', ', ' ')),
+        'tag': tag.map(_as_text),
+        'overview': movies['overview'].map(_as_text),
+        'cast': movies['cast'].map(lambda value: fix_jr(_as_text(value))),
+        'director': movies['director'].map(_as_text),
+        'spoken_languages': movies['spoken_languages'].map(_as_text),
+    }).reset_index(drop=True)
+
+
+def build_documents(texts, workers=1):
+    """
+    Builds the text document of every movie that the TF-IDF vectorizer is fitted on.
+
+    Tags and overviews are stemmed, cast and director names are only cleaned, and genres and
+    spoken languages are kept as they are.
+
+    Parameters:
+        texts (pandas.DataFrame): The text columns (see `text_inputs`).
+        workers (int): The number of worker processes used for preprocessing.
+
+    Returns:
+        list of str: One document per movie.
+    """
+    columns = [texts['genres'].tolist()]
+    for name, stem in [('tag', True), ('overview', True), ('cast', False), ('director', False)]:
+        columns.append(preprocess_texts(texts[name].tolist(), stem=stem, workers=workers))
+    columns.append(texts['spoken_languages'].tolist())
+    return [' '.join(parts) for parts in zip(*columns)]
+
+
+def numeric_inputs(movies, current_year):
+    """
+    Returns the numeric feature columns: the movie's age in years, its popularity and IMDb rating.
+
+    Parameters:
+        movies (pandas.DataFrame): The catalog.
+        current_year (int): The year the ages are computed from.
+
+    Returns:
+        pandas.DataFrame: One row per movie with its movie_age, popularity and imdb_rating.
+    """
+    return pd.DataFrame({
+        'movie_age': current_year - pd.to_datetime(movies['release_date']).dt.year,
+        'popularity': movies['popularity'],
+        'imdb_rating': movies['imdb_rating'],
+    }).astype(np.float64).reset_index(drop=True)
+
+
+def language_inputs(movies):
+    """Returns the original language of every movie, as the one-column frame the encoder takes."""
+    return movies[['original_language']].astype(str).reset_index(drop=True)
+
+
+def transform_movies(movies, transformers, tags=None, workers=1):
+    """
+    Vectorizes movies with the transformers fitted by `FeaturePipeline.run`, e.g. to add new movies
+    to the catalog without refitting.
+
+    Parameters:
+        movies (pandas.DataFrame): The movies, with the catalog's columns.
+        transformers (dict): The fitted transformers (see `load_transformers`).
+        tags (pandas.Series): The joined tags by IMDb ID (see `read_tags`), or None.
+        workers (int): The number of worker processes used for text preprocessing.
+
+    Returns:
+        scipy.sparse.csr_matrix: The M x D feature vectors, with the columns of the catalog's features.
+    """
+    documents = build_documents(text_inputs(movies, tags), workers)
+    numeric = numeric_inputs(movies, transformers['current_year'])
+    return sp.hstack([
+        transformers['vectorizer'].transform(documents),
+        transformers['encoder'].transform(language_inputs(movies)),
+        sp.csr_matrix(np.nan_to_num(transformers['scaler'].transform(numeric))),
+    ], format='csr')
+
+
+class FeaturePipeline:
+    """
+    Builds the content feature vectors of the catalog: TF-IDF over the preprocessed text,
+    one-hot original language and the scaled numeric features, stacked side by side.
+
+    Each stage is cached by a StageCache under the hash of its inputs:
+
+        tags       the MovieLens tags joined per movie (tags.csv, links.csv, catalog IMDb IDs)
+        documents  the preprocessed text of every movie (text columns, tags)
+        tfidf      the fitted vectorizer and the TF-IDF matrix (documents, vectorizer parameters)
+        language   the fitted encoder and the one-hot matrix (original_language)
+        numeric    the fitted scaler and the scaled matrix (numeric columns)
+
+    Attributes:
+        cache (StageCache): The stage cache.
+        workers (int): The number of worker processes used for text preprocessing.
+        max_features (int): The vocabulary size of the vectorizer.
+        current_year (int): The year movie ages are computed from.
+    """
+
+    def __init__(self, cache_directory, workers=1, max_features=200000, current_year=None):
+        self.cache = StageCache(cache_directory)
+        self.workers = workers
+        self.max_features = max_features
+        self.current_year = current_year or datetime.now().year
+
+    def run(self, movies, tags_path=None, links_path=None, chunk_size=500000):
+        """
+        Builds the feature vectors of the catalog.
+
+        Parameters:
+            movies (pandas.DataFrame): The catalog (see `read_catalog`).
+            tags_path (str): Path to MovieLens tags.csv; a `tag` column of `movies` is used when None.
+            links_path (str): Path to MovieLens links.csv, required with `tags_path`.
+            chunk_size (int): The number of tags.csv rows read at a time.
+
+        Returns:
+            tuple of (scipy.sparse.csr_matrix, dict): The N x D feature vectors, by catalog row, and the
+            fitted transformers that vectorize new movies the same way: 'vectorizer', 'encoder',
+            'scaler' and 'current_year'.
+        """
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.pipeline import make_pipeline
+        from sklearn.preprocessing import MinMaxScaler, OneHotEncoder, RobustScaler
+
+        tags = None
+        if tags_path is not None:
+            tags_key = stage_key(PIPELINE_VERSION, file_hash(tags_path), file_hash(links_path),
+                                 frame_hash(movies.imdb_id))
+            tags = self.cache.get_or_build(
+                'tags', tags_key, lambda: read_tags(tags_path, links_path, movies.imdb_id, chunk_size)
+            )
+
+        texts = text_inputs(movies, tags)
+        documents_key = stage_key(PIPELINE_VERSION, frame_hash(texts))
+        documents = self.cache.get_or_build('documents', documents_key, lambda: build_documents(texts, self.workers))
+
+        def fit_tfidf():
+            vectorizer = TfidfVectorizer(stop_words='english', max_features=self.max_features, ngram_range=(1, 2))
+            return vectorizer, vectorizer.fit_transform(documents).tocsr()
+
+        vectorizer, tfidf = self.cache.get_or_build(
+            'tfidf', stage_key(documents_key, self.max_features), fit_tfidf
+        )
+
+        languages = language_inputs(movies)
+
+        def fit_language():
+            encoder = OneHotEncoder(handle_unknown='ignore')
+            return encoder, sp.csr_matrix(encoder.fit_transform(languages))
+
+        encoder, language = self.cache.get_or_build(
+            'language', stage_key(PIPELINE_VERSION, frame_hash(languages)), fit_language
+        )
+
+        numeric = numeric_inputs(movies, self.current_year)
+
+        def fit_numeric():
+            scaler = make_pipeline(RobustScaler(), MinMaxScaler(feature_range=(0, 1)))
+            # Missing values (e.g. no IMDb rating) are left out of the fit and count as 0.
+            return scaler, sp.csr_matrix(np.nan_to_num(scaler.fit_transform(numeric)))
+
+        scaler, scaled = self.cache.get_or_build(
+            'numeric', stage_key(PIPELINE_VERSION, frame_hash(numeric)), fit_numeric
+        )
+
+        features = sp.hstack([tfidf, language, scaled], format='csr')
+        transformers = {
+            'vectorizer': vectorizer,
+            'encoder': encoder,
+            'scaler': scaler,
+            'current_year': self.current_year,
+        }
+        return features, transformers
+
+
+def save_transformers(path, transformers):
+    """Pickles the fitted transformers, atomically."""
+    with open(path + '.tmp', 'wb') as f:
+        pickle.dump(transformers, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(path + '.tmp', path)
+
+
+def load_transformers(path):
+    """Loads the fitted transformers written by `save_transformers`."""
+    with open(path, 'rb') as f:
+        return pickle.load(f)
@@ -0,0 +1,88 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections
+
+from .models import Rating
+from .provider import get_recommender, svd_provider
+
+logger = logging.getLogger(__name__)
+
+
+def rating_version(updated_ats):
+    """
+    Identifies the state of a user's ratings by their number and latest update time, so any saved,
+    changed or deleted rating gives a new version.
+
+    Parameters:
+        updated_ats (list of datetime): The update times of all the user's ratings.
+
+    Returns:
+        tuple of (int, datetime): The number of ratings and the latest update time (None without ratings).
+    """
+    return len(updated_ats), max(updated_ats, default=None)
+
+
+class FoldInWorker:
+    """
+    Updates the personalized recommender's factors of users whose ratings changed, off the request thread.
+
+    Updates run on a small background thread pool. Several rating changes of the same user made
+    before its update starts are coalesced into one update, which reads the user's latest ratings.
+    """
+
+    def __init__(self, max_workers=1):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='svd-fold-in')
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def schedule(self, user_id):
+        """
+        Schedules an update of the user's factors, if the personalized recommender is loaded.
+
+        Parameters:
+            user_id (int): The ID of the user whose ratings changed.
+
+        Returns:
+            Future or None: The scheduled update, None if nothing was scheduled.
+        """
+        if not svd_provider.is_ready():
+            # Users are folded in on their first visit once the model is loaded.
+            return None
+        with self._lock:
+            if user_id in self._pending:
+                return None
+            self._pending.add(user_id)
+        return self._executor.submit(self._run, user_id)
+
+    def _run(self, user_id):
+        with self._lock:
+            self._pending.discard(user_id)
+        close_old_connections()
+        try:
+            self.refresh_user(user_id)
+        except Exception:
+            logger.exception("Folding in the ratings of user %s failed", user_id)
+        finally:
+            close_old_connections()
+
+    def refresh_user(self, user_id):
+        """
+        Folds in the user's current ratings and publishes the result to the personalized recommender.
+
+        Parameters:
+            user_id (int): The ID of the user.
+        """
+        svd_recommender = svd_provider.get()
+        ratings = list(Rating.objects.filter(user_id=user_id).values_list('movie_id', 'rating', 'updated_at'))
+        positions = get_recommender().get_positions(movie_id for movie_id, _, _ in ratings)
+        rated = [(position, rating) for position, (_, rating, _) in zip(positions, ratings) if position is not None]
+        user = svd_recommender.fold_in(
+            [position for position, _ in rated],
+            svd_recommender.to_model_scale([rating for _, rating in rated]),
+        )
+        svd_recommender.publish_user(user_id, user, rating_version([updated_at for _, _, updated_at in ratings]))
+
+
+fold_in_worker = FoldInWorker()
@@ -0,0 +1,99 @@
+import numpy as np
+from .movie import Recommendation
+
+
+def _min_max(scores):
+    """Scales finite scores onto [0, 1]; non-finite scores (e.g. movies unknown to the model) become 0."""
+    scores = np.asarray(scores, dtype=np.float64)
+    finite = np.isfinite(scores)
+    normalized = np.zeros_like(scores)
+    if finite.any():
+        low, high = scores[finite].min(), scores[finite].max()
+        if high > low:
+            normalized[finite] = (scores[finite] - low) / (high - low)
+    return normalized
+
+
+class HybridRecommender:
+    """
+    Blends the personalized SVD predictions with content similarity to the movies a user rated highly.
+
+    Only a small candidate set is scored: the content neighbors of the user's highly rated movies
+    and the SVD model's top-M movies. Both score vectors are computed over the candidates, scaled
+    onto [0, 1] and blended with the request's weights in one vectorized pass.
+
+    Attributes:
+        cosine_recommender (CosineRecommender): The content-based recommender.
+        svd_recommender (SVDRecommender): The collaborative-filtering recommender, or None to rank by content only.
+        candidate_count (int): The number of candidates taken from each side (M).
+        liked_rating (int): The lowest rating, on the app's 1-10 scale, of a movie the content side starts from.
+    """
+
+    def __init__(self, cosine_recommender, svd_recommender=None, candidate_count=200, liked_rating=7):
+        self.cosine_recommender = cosine_recommender
+        self.svd_recommender = svd_recommender
+        self.candidate_count = candidate_count
+        self.liked_rating = liked_rating
+
+    def recommend(self, user_factors, user_bias, rated_positions, ratings, cf_weight=0.5, content_weight=0.5,
+                  number_of_recommendations=12):
+        """
+        Recommend movies for a user by blending collaborative-filtering and content scores.
+
+        Parameters:
+            user_factors (numpy array): The user's SVD factors, None for the baseline prediction.
+            user_bias (float): The user's SVD bias.
+            rated_positions (list of int): The catalog rows of the movies the user rated; never recommended.
+            ratings (list of float): The user's ratings of those movies, on the app's 1-10 scale.
+            cf_weight (float): The weight of the normalized predicted rating.
+            content_weight (float): The weight of the normalized content similarity.
+            number_of_recommendations (int): The number of recommendations to return.
+
+        Returns:
+            list of Recommendation: The recommended movies with their blended score, best first.
+        """
+        cosine_recommender = self.cosine_recommender
+        rated_positions = np.asarray(rated_positions, dtype=np.intp)
+        ratings = np.asarray(ratings, dtype=np.float64)
+        liked = ratings >= self.liked_rating
+        liked_positions, liked_ratings = rated_positions[liked], ratings[liked]
+
+        parts = []
+        if len(liked_positions):
+            parts.append([result.position for result in cosine_recommender.recommend_for_seeds(
+                liked_positions.tolist(), number_of_recommendations=self.candidate_count,
+            )])
+        if self.svd_recommender is not None:
+            parts.append([result.position for result in self.svd_recommender.recommend(
+                user_factors, user_bias, rated_positions.tolist(), self.candidate_count,
+            )])
+        if not parts or number_of_recommendations <= 0:
+            return []
+        candidates = np.unique(np.concatenate([np.asarray(part, dtype=np.intp) for part in parts]))
+        candidates = candidates[~np.isin(candidates, rated_positions)]
+        if len(candidates) == 0:
+            return []
+
+        content = np.zeros(len(candidates))
+        if len(liked_positions):
+            # Higher rated movies count more.
+            weights = liked_ratings / liked_ratings.sum()
+            content = weights @ cosine_recommender.similarity_between(liked_positions, candidates)
+        cf = np.zeros(len(candidates))
+        if self.svd_recommender is not None:
+            cf = self.svd_recommender.predict(candidates, user_factors, user_bias)
+
+        scores = cf_weight * _min_max(cf) + content_weight * _min_max(content)
+        count = min(number_of_recommendations, len(candidates))
+        # Highest score first, lower position first on ties, as in CosineRecommender.recommend_for_seeds:
+        # every candidate tied with the count-th best score is kept until the ties are ordered.
+        kth_score = np.partition(scores, len(scores) - count)[len(scores) - count]
+        best = np.flatnonzero(scores >= kth_score)
+        best = best[np.lexsort((candidates[best], -scores[best]))][:count]
+
+        imdb_ids = cosine_recommender.catalog.column('imdb_id')
+        titles = cosine_recommender.catalog.column('title')
+        return [
+            Recommendation(position, imdb_ids[position], titles[position], score)
+            for position, score in zip(candidates[best].tolist(), scores[best].tolist())
+        ]
@@ -0,0 +1,59 @@
+import os
+import time
+import scipy.sparse as sp
+from django.core.management.base import BaseCommand
+
+from recommendations.ann_index import ANNIndex
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FEATURES_PATH = os.path.join(APP_DIR, 'ml_models', 'content_features.npz')
+
+ANN_PATH = os.path.join(APP_DIR, 'ml_models', 'content_ann')
+
+
+class Command(BaseCommand):
+    """
+    Builds the approximate nearest-neighbor index over the sparse content feature vectors.
+
+    The features are the notebook's `combined_features` (TF-IDF + one-hot language + scaled
+    numeric columns), saved with `scipy.sparse.save_npz`, one row per movie of movies_filter.pkl.
+
+    Usage:
+        python manage.py build_ann_index --features recommendations/ml_models/content_features.npz --probes 8
+    """
+    help = "Builds an IVF approximate nearest-neighbor index over the sparse content feature vectors."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--features', default=FEATURES_PATH,
+                            help="Path to the sparse N x D feature matrix (.npz written by scipy.sparse.save_npz).")
+        parser.add_argument('--output', default=ANN_PATH,
+                            help="Directory to write the index to.")
+        parser.add_argument('--lists', type=int, default=None,
+                            help="Number of clusters (default: about sqrt(N); at most --sample).")
+        parser.add_argument('--probes', type=int, default=8,
+                            help="Default number of clusters searched per query; more probes give better recall.")
+        parser.add_argument('--dimensions', type=int, default=256,
+                            help="Number of random projection dimensions used for clustering.")
+        parser.add_argument('--iterations', type=int, default=10,
+                            help="Number of k-means iterations.")
+        parser.add_argument('--sample', type=int, default=100000,
+                            help="Number of movies the cluster centroids are trained on.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        features = sp.load_npz(options['features'])
+        index = ANNIndex.build(
+            features,
+            n_lists=options['lists'],
+            dimensions=options['dimensions'],
+            n_probe=options['probes'],
+            iterations=options['iterations'],
+            sample_size=options['sample'],
+        )
+        index.save(options['output'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {len(index)} movies in {index.n_lists} clusters in {time.perf_counter() - started:.1f}s; "
+            f"wrote {options['output']}"
+        ))
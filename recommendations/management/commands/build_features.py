@@ -0,0 +1,83 @@
+import os
+import time
+import scipy.sparse as sp
+from django.core.management.base import BaseCommand, CommandError
+
+from recommendations.features import FeaturePipeline, check_nltk_data, read_catalog, save_transformers
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PROJECT_ROOT = os.path.dirname(APP_DIR)
+
+MOVIES_PATH = os.path.join(PROJECT_ROOT, 'data', 'movies_filter.pkl')
+
+FEATURES_PATH = os.path.join(APP_DIR, 'ml_models', 'content_features.npz')
+
+TRANSFORMERS_PATH = os.path.join(APP_DIR, 'ml_models', 'content_transformers.pkl')
+
+CACHE_PATH = os.path.join(APP_DIR, 'ml_models', 'feature_cache')
+
+
+class Command(BaseCommand):
+    """
+    Builds the content feature vectors of the catalog, as the notebook does: TF-IDF over the
+    stemmed tags and overview plus cast, director, genres and spoken languages, the one-hot
+    original language, and the robust + min-max scaled movie age, popularity and IMDb rating.
+
+    Text is preprocessed on a pool of worker processes, and every stage is cached on disk under
+    the hash of its inputs, so a rebuild only redoes the stages whose inputs changed. The feature
+    matrix feeds build_ann_index and build_neighbor_index --features; the fitted vectorizer,
+    encoder and scaler are saved next to it.
+
+    Usage:
+        python manage.py build_features --tags data/tags.csv --links data/links.csv --workers 8
+    """
+    help = "Builds the sparse content feature vectors of the catalog, caching every stage on disk."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--movies', default=MOVIES_PATH,
+                            help="Path to the catalog (movies_filter.pkl, or a CSV with the same columns).")
+        parser.add_argument('--tags', default=None,
+                            help="Path to MovieLens tags.csv (default: the catalog's `tag` column, if any).")
+        parser.add_argument('--links', default=None,
+                            help="Path to MovieLens links.csv, mapping MovieLens IDs to IMDb IDs (required with --tags).")
+        parser.add_argument('--output', default=FEATURES_PATH,
+                            help="Path of the feature matrix (.npz written by scipy.sparse.save_npz).")
+        parser.add_argument('--transformers', default=TRANSFORMERS_PATH,
+                            help="Path of the pickled fitted vectorizer, encoder and scaler.")
+        parser.add_argument('--cache', default=CACHE_PATH,
+                            help="Directory the intermediate stages are cached in.")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Number of worker processes used for text preprocessing.")
+        parser.add_argument('--chunk-size', type=int, default=500000,
+                            help="Number of CSV rows read at a time.")
+        parser.add_argument('--max-features', type=int, default=200000,
+                            help="Vocabulary size of the TF-IDF vectorizer.")
+
+    def handle(self, *args, **options):
+        if options['tags'] and not options['links']:
+            raise CommandError("--links is required with --tags.")
+        try:
+            check_nltk_data()
+        except LookupError:
+            raise CommandError(
+                "The NLTK data is missing; install it with "
+                "python -c \"import nltk; nltk.download('punkt_tab'); nltk.download('stopwords')\""
+            )
+
+        started = time.perf_counter()
+        movies = read_catalog(options['movies'], options['chunk_size'])
+        pipeline = FeaturePipeline(options['cache'], workers=options['workers'], max_features=options['max_features'])
+        features, transformers = pipeline.run(movies, options['tags'], options['links'], options['chunk_size'])
+
+        os.makedirs(os.path.dirname(options['output']) or '.', exist_ok=True)
+        sp.save_npz(options['output'] + '.tmp.npz', features)
+        os.replace(options['output'] + '.tmp.npz', options['output'])
+        save_transformers(options['transformers'], transformers)
+
+        for stage, hit in pipeline.cache.hits.items():
+            self.stdout.write(f"{stage}: {'cached' if hit else 'built'}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Built {features.shape[0]} x {features.shape[1]} features in {time.perf_counter() - started:.1f}s; "
+            f"wrote {options['output']}"
+        ))
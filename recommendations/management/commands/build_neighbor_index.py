@@ -0,0 +1,66 @@
+import os
+import numpy as np
+import scipy.sparse as sp
+from django.core.management.base import BaseCommand
+
+from recommendations.artifacts import load_similarity
+from recommendations.neighbor_index import NeighborIndex
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SIMILARITY_PATH = os.path.join(APP_DIR, 'ml_models', 'cosine_matrix')
+
+NEIGHBORS_PATH = os.path.join(APP_DIR, 'ml_models', 'cosine_neighbors')
+
+
+class Command(BaseCommand):
+    """
+    Builds the top-K neighbor index from the dense cosine similarity matrix, or straight from the
+    sparse content feature vectors on a pool of worker processes, without the N x N matrix.
+
+    Usage:
+        python manage.py build_neighbor_index --k 50 --dtype float16
+        python manage.py build_neighbor_index --features recommendations/ml_models/content_features.npz --workers 8
+    """
+    help = "Builds a compact top-K neighbor index from the cosine similarity matrix or the content features."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--similarity', default=SIMILARITY_PATH,
+                            help="Path to the N x N similarity matrix (pickle or .npy).")
+        parser.add_argument('--features', default=None,
+                            help="Path to the sparse N x D feature matrix (.npz); used instead of --similarity.")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Number of worker processes when building from --features.")
+        parser.add_argument('--output', default=NEIGHBORS_PATH,
+                            help="Directory the neighbor index .npy files are written to.")
+        parser.add_argument('--k', type=int, default=50,
+                            help="Number of neighbors kept per movie.")
+        parser.add_argument('--dtype', choices=['float16', 'float32'], default='float32',
+                            help="Dtype used to store the similarity scores.")
+        parser.add_argument('--block-size', type=int, default=1024,
+                            help="Number of rows processed at once (per worker).")
+
+    def handle(self, *args, **options):
+        if options['features']:
+            index = NeighborIndex.build_from_features(
+                sp.load_npz(options['features']),
+                options['output'],
+                k=options['k'],
+                dtype=np.dtype(options['dtype']),
+                block_size=options['block_size'],
+                workers=options['workers'],
+            )
+        else:
+            similarity = load_similarity(options['similarity'])
+            index = NeighborIndex.build(
+                similarity,
+                k=options['k'],
+                dtype=np.dtype(options['dtype']),
+                block_size=options['block_size'],
+            )
+            index.save(options['output'])
+
+        size_mb = (index.positions.nbytes + index.scores.nbytes) / 1024 ** 2
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {len(index)} x {index.k} neighbors ({size_mb:.1f} MB) to {options['output']}"
+        ))
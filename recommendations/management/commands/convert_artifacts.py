@@ -0,0 +1,38 @@
+import os
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from recommendations.artifacts import load_similarity, save_array
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SIMILARITY_PATH = os.path.join(APP_DIR, 'ml_models', 'cosine_matrix')
+
+SIMILARITY_NPY_PATH = os.path.join(APP_DIR, 'ml_models', 'cosine_matrix.npy')
+
+
+class Command(BaseCommand):
+    """
+    Converts the pickled similarity matrix into a raw .npy file that workers memory-map.
+
+    Usage:
+        python manage.py convert_artifacts --dtype float32
+    """
+    help = "Converts the pickled cosine similarity matrix into a memory-mappable .npy file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--similarity', default=SIMILARITY_PATH,
+                            help="Path to the pickled N x N similarity matrix.")
+        parser.add_argument('--output', default=SIMILARITY_NPY_PATH,
+                            help="Path of the .npy file to write.")
+        parser.add_argument('--dtype', choices=['float16', 'float32', 'float64'], default='float32',
+                            help="Dtype of the written matrix.")
+
+    def handle(self, *args, **options):
+        similarity = load_similarity(options['similarity'])
+        save_array(options['output'], np.asarray(similarity, dtype=options['dtype']))
+
+        size_mb = os.path.getsize(options['output']) / 1024 ** 2
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {similarity.shape[0]} x {similarity.shape[1]} matrix ({size_mb:.1f} MB) to {options['output']}"
+        ))
@@ -0,0 +1,68 @@
+import json
+import os
+import pickle
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+
+from recommendations.artifacts import save_array
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PROJECT_ROOT = os.path.abspath(os.path.join(APP_DIR, '..'))
+
+SVD_MODEL_PATH = os.path.join(APP_DIR, 'ml_models', 'svd')
+
+
+class Command(BaseCommand):
+    """
+    Exports the notebook's trained surprise SVD model as plain arrays for the personalized recommender.
+
+    Usage:
+        python manage.py export_svd_model --model svd_best_model --links data/links.csv
+    """
+    help = "Exports a pickled surprise SVD model as factor and bias arrays keyed by IMDb ID."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', required=True,
+                            help="Path to the pickled surprise SVD model (e.g. the notebook's svd_best_model).")
+        parser.add_argument('--links', default=os.path.join(PROJECT_ROOT, 'data', 'links.csv'),
+                            help="Path to MovieLens links.csv, mapping MovieLens movie IDs to IMDb IDs.")
+        parser.add_argument('--output', default=SVD_MODEL_PATH,
+                            help="Directory to write the arrays to.")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['model'], 'rb') as f:
+                # Unpickling the model needs scikit-surprise; serving the exported arrays does not.
+                model = pickle.load(f)
+        except ModuleNotFoundError as exc:
+            raise CommandError(f"Loading the model requires scikit-surprise: {exc}")
+        trainset = model.trainset
+
+        links = pd.read_csv(options['links'])
+        imdb_by_movielens_id = dict(zip(links['movieId'], links['imdbId'].astype(int).astype(str)))
+        movielens_ids = [trainset.to_raw_iid(inner_id) for inner_id in range(trainset.n_items)]
+        item_ids = [imdb_by_movielens_id.get(int(movie_id), '') for movie_id in movielens_ids]
+        user_ids = [str(trainset.to_raw_uid(inner_id)) for inner_id in range(trainset.n_users)]
+
+        output = options['output']
+        os.makedirs(output, exist_ok=True)
+        save_array(os.path.join(output, 'item_ids.npy'), np.array(item_ids, dtype=str))
+        save_array(os.path.join(output, 'item_factors.npy'), np.asarray(model.qi, dtype=np.float32))
+        save_array(os.path.join(output, 'item_biases.npy'), np.asarray(model.bi, dtype=np.float32))
+        save_array(os.path.join(output, 'user_ids.npy'), np.array(user_ids, dtype=str))
+        save_array(os.path.join(output, 'user_factors.npy'), np.asarray(model.pu, dtype=np.float32))
+        save_array(os.path.join(output, 'user_biases.npy'), np.asarray(model.bu, dtype=np.float32))
+        with open(os.path.join(output, 'meta.json'), 'w') as f:
+            json.dump({
+                'global_mean': float(trainset.global_mean),
+                'rating_scale': list(trainset.rating_scale),
+                'n_factors': int(model.qi.shape[1]),
+                'regularization': float(model.reg_pu),
+            }, f)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {len(user_ids)} users and {len(item_ids)} movies "
+            f"({sum(1 for item_id in item_ids if item_id)} with an IMDb ID) to {output}"
+        ))
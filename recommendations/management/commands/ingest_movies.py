@@ -0,0 +1,163 @@
+import os
+import shutil
+import time
+import pandas as pd
+import scipy.sparse as sp
+from django.core.management.base import BaseCommand, CommandError
+
+from recommendations.ann_index import ANNIndex
+from recommendations.features import check_nltk_data, load_transformers, read_catalog, read_tags, transform_movies
+from recommendations.neighbor_index import NeighborIndex
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PROJECT_ROOT = os.path.dirname(APP_DIR)
+
+MOVIES_PATH = os.path.join(PROJECT_ROOT, 'data', 'movies_filter.pkl')
+
+FEATURES_PATH = os.path.join(APP_DIR, 'ml_models', 'content_features.npz')
+
+TRANSFORMERS_PATH = os.path.join(APP_DIR, 'ml_models', 'content_transformers.pkl')
+
+NEIGHBORS_PATH = os.path.join(APP_DIR, 'ml_models', 'cosine_neighbors')
+
+ANN_PATH = os.path.join(APP_DIR, 'ml_models', 'content_ann')
+
+
+class Command(BaseCommand):
+    """
+    Adds new movies to the catalog without rebuilding the similarity model.
+
+    The new movies are vectorized with the vectorizer, encoder and scaler fitted by build_features,
+    and only their similarities to the catalog are computed: they get their own neighbor lists and
+    enter the lists of existing movies they are more similar to than the last neighbor. The movies
+    are appended, so the positions of existing movies (and everything keyed by them) stay valid.
+    The catalog, the feature matrix, the neighbor index and the ANN index are updated when present;
+    the app picks them up when its workers restart.
+
+    Everything is computed and written to temporary files first, and the indexes replace their
+    previous versions before the features and the catalog, so a failed run leaves the catalog as it
+    was; an index replaced by a run interrupted before the catalog is restored by the next run. An
+    index with fewer movies than the catalog (e.g. restored from a backup) is caught up with the
+    movies it lacks, even when there are no new movies.
+
+    Usage:
+        python manage.py ingest_movies --movies data/new_movies.csv --tags data/tags.csv --links data/links.csv
+    """
+    help = "Appends new movies to the catalog, the content features and the neighbor indexes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--movies', required=True,
+                            help="Path to the new movies (a pickled DataFrame or CSV with the catalog's columns).")
+        parser.add_argument('--tags', default=None,
+                            help="Path to MovieLens tags.csv with tags of the new movies.")
+        parser.add_argument('--links', default=None,
+                            help="Path to MovieLens links.csv (required with --tags).")
+        parser.add_argument('--catalog', default=MOVIES_PATH,
+                            help="Path to the catalog (movies_filter.pkl).")
+        parser.add_argument('--features', default=FEATURES_PATH,
+                            help="Path to the catalog's feature matrix written by build_features.")
+        parser.add_argument('--transformers', default=TRANSFORMERS_PATH,
+                            help="Path to the fitted transformers written by build_features.")
+        parser.add_argument('--neighbors', default=NEIGHBORS_PATH,
+                            help="Directory of the neighbor index, updated if it exists.")
+        parser.add_argument('--ann', default=ANN_PATH,
+                            help="Directory of the ANN index, updated if it exists.")
+        parser.add_argument('--workers', type=int, default=1,
+                            help="Number of worker processes used for text preprocessing.")
+        parser.add_argument('--block-size', type=int, default=64,
+                            help="Number of new movies whose similarities are computed at once.")
+
+    def handle(self, *args, **options):
+        if options['tags'] and not options['links']:
+            raise CommandError("--links is required with --tags.")
+        try:
+            check_nltk_data()
+        except LookupError:
+            raise CommandError(
+                "The NLTK data is missing; install it with "
+                "python -c \"import nltk; nltk.download('punkt_tab'); nltk.download('stopwords')\""
+            )
+        if not options['catalog'].endswith('.pkl'):
+            raise CommandError("--catalog must be the pickled catalog.")
+
+        started = time.perf_counter()
+        catalog = read_catalog(options['catalog'])
+        features = sp.load_npz(options['features']).tocsr()
+        if features.shape[0] != len(catalog):
+            raise CommandError(
+                f"The feature matrix has {features.shape[0]} rows but the catalog has {len(catalog)} movies; "
+                f"rebuild it with build_features."
+            )
+        indexes = {}
+        if os.path.isdir(options['neighbors']):
+            indexes['neighbors'] = NeighborIndex.load(options['neighbors'])
+        if os.path.isdir(options['ann']):
+            indexes['ann'] = ANNIndex.load(options['ann'])
+        if not indexes:
+            raise CommandError(
+                "Neither a neighbor index nor an ANN index exists; the dense similarity matrix cannot be "
+                "extended incrementally (see build_neighbor_index --features)."
+            )
+        for name, index in list(indexes.items()):
+            if len(index) > len(catalog) and os.path.isdir(options[name] + '.old'):
+                # A run was interrupted after replacing this index but before the catalog: restore it.
+                shutil.rmtree(options[name])
+                os.rename(options[name] + '.old', options[name])
+                index = indexes[name] = type(index).load(options[name])
+            if len(index) > len(catalog):
+                raise CommandError(
+                    f"The {name} index has {len(index)} movies but the catalog has {len(catalog)}; "
+                    f"restore it or rebuild it."
+                )
+
+        movies = read_catalog(options['movies'])
+        new_movies = movies[~movies.imdb_id.isin(catalog.imdb_id)].drop_duplicates('imdb_id').reset_index(drop=True)
+        skipped = len(movies) - len(new_movies)
+        if new_movies.empty and all(len(index) == len(catalog) for index in indexes.values()):
+            self.stdout.write(self.style.SUCCESS(f"No new movies to add ({skipped} already in the catalog)."))
+            return
+
+        all_features = features
+        if not new_movies.empty:
+            tags = None
+            if options['tags']:
+                tags = read_tags(options['tags'], options['links'], new_movies.imdb_id)
+            new_features = transform_movies(
+                new_movies, load_transformers(options['transformers']), tags, options['workers']
+            )
+            all_features = sp.vstack([features, new_features], format='csr')
+
+        # Each index is extended with every catalog row it does not have yet.
+        if 'neighbors' in indexes:
+            indexes['neighbors'] = indexes['neighbors'].extend(all_features, block_size=options['block_size'])
+        if 'ann' in indexes:
+            indexes['ann'] = indexes['ann'].extend(all_features[len(indexes['ann']):])
+        for name, index in indexes.items():
+            shutil.rmtree(options[name] + '.tmp', ignore_errors=True)
+            index.save(options[name] + '.tmp')
+
+        catalog = pd.concat([catalog, new_movies.reindex(columns=catalog.columns)], ignore_index=True)
+        catalog.to_pickle(options['catalog'] + '.tmp')
+        sp.save_npz(options['features'] + '.tmp.npz', all_features)
+
+        # The catalog goes last: until it is replaced, the indexes only have extra rows nothing refers to.
+        for name in indexes:
+            _replace_directory(options[name] + '.tmp', options[name])
+        os.replace(options['features'] + '.tmp.npz', options['features'])
+        os.replace(options['catalog'] + '.tmp', options['catalog'])
+        for name in indexes:
+            shutil.rmtree(options[name] + '.old')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Added {len(new_movies)} movies ({skipped} already in the catalog) in "
+            f"{time.perf_counter() - started:.1f}s; the catalog has {all_features.shape[0]} movies"
+        ))
+
+
+def _replace_directory(source, destination):
+    """Replaces a directory with another one, keeping the previous one as `<destination>.old`."""
+    previous = destination + '.old'
+    shutil.rmtree(previous, ignore_errors=True)
+    os.rename(destination, previous)
+    os.rename(source, destination)
@@ -0,0 +1,131 @@
+import itertools
+import multiprocessing
+import os
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from recommendations.models import Rating
+from recommendations.provider import USER_RECOMMENDATIONS_PATH, get_recommender, get_svd_recommender
+from recommendations.user_recommendations import UserRecommendationTable
+
+# The personalized recommender of a pool worker, inherited from the parent (fork) or loaded once per worker.
+_svd_recommender = None
+
+
+def _init_worker():
+    global _svd_recommender
+    if _svd_recommender is None:
+        import django
+        django.setup()
+        _svd_recommender = get_svd_recommender()
+
+
+def _score_shard(shard):
+    """Folds in and scores one block of users; runs in a pool worker."""
+    user_ids, rated_positions, rated_ratings, number_of_recommendations = shard
+    svd_recommender = _svd_recommender
+    user_factors = np.zeros((len(user_ids), svd_recommender.n_factors), dtype=np.float32)
+    user_biases = np.zeros(len(user_ids), dtype=np.float32)
+    for row, (positions, ratings) in enumerate(zip(rated_positions, rated_ratings)):
+        user = svd_recommender.fold_in(positions, ratings)
+        if user is not None:
+            user_factors[row], user_biases[row] = user
+    positions, scores = svd_recommender.recommend_many(
+        user_factors, user_biases, rated_positions, number_of_recommendations
+    )
+    return np.asarray(user_ids, dtype=np.int64), positions, scores
+
+
+class Command(BaseCommand):
+    """
+    Precomputes the personalized top-N recommendations of every user with ratings.
+
+    Users are split into blocks that are scored with one matrix product each, on a pool of
+    worker processes, and the lists are written as a memory-mappable table the views read in O(1).
+    With --incremental, only the users whose ratings changed since the last run are recomputed.
+
+    Usage:
+        python manage.py precompute_user_recommendations --top-n 50 --workers 4
+        python manage.py precompute_user_recommendations --incremental
+    """
+    help = "Precomputes the personalized recommendations of every user with the SVD model."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=USER_RECOMMENDATIONS_PATH,
+                            help="Directory to write the table to.")
+        parser.add_argument('--top-n', type=int, default=50,
+                            help="Number of recommendations stored per user.")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Number of worker processes (1 scores in this process).")
+        parser.add_argument('--block-size', type=int, default=256,
+                            help="Number of users scored together with one matrix product.")
+        parser.add_argument('--incremental', action='store_true',
+                            help="Only recompute the users whose ratings changed since the last run.")
+
+    def handle(self, *args, **options):
+        global _svd_recommender
+        try:
+            _svd_recommender = get_svd_recommender()
+        except FileNotFoundError as exc:
+            raise CommandError(f"The SVD model is not exported yet (see export_svd_model): {exc}")
+        cosine_recommender = get_recommender()
+
+        previous = None
+        if options['incremental'] and os.path.exists(os.path.join(options['output'], 'meta.json')):
+            previous = UserRecommendationTable.load(options['output'], mmap_mode=None)
+            if previous.model_version != _svd_recommender.model_version:
+                self.stdout.write("The model changed since the last run; recomputing every user.")
+                previous = None
+
+        # Ratings saved from now on are picked up by the next incremental run.
+        started_at = timezone.now()
+        ratings = Rating.objects.all()
+        if previous is not None:
+            changed_users = Rating.objects.filter(updated_at__gt=previous.computed_at).values('user_id')
+            ratings = ratings.filter(user_id__in=changed_users)
+        rows = ratings.order_by('user_id').values_list('user_id', 'movie_id', 'rating').iterator(chunk_size=10000)
+
+        # The ratings are read here rather than lazily from the pool's feeder thread.
+        shards = list(self._shards(rows, cosine_recommender, options['block_size'], options['top_n']))
+        if options['workers'] > 1:
+            with multiprocessing.Pool(options['workers'], initializer=_init_worker) as pool:
+                results = list(pool.imap_unordered(_score_shard, shards))
+        else:
+            results = [_score_shard(shard) for shard in shards]
+
+        if results:
+            user_ids, positions, scores = (np.concatenate(parts) for parts in zip(*results))
+        else:
+            user_ids = np.empty(0, dtype=np.int64)
+            positions = np.empty((0, options['top_n']), dtype=np.int32)
+            scores = np.empty((0, options['top_n']), dtype=np.float32)
+        table = UserRecommendationTable(user_ids, positions, scores, _svd_recommender.model_version, started_at)
+        if previous is not None:
+            table = previous.merge(table)
+        table.save(options['output'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Computed recommendations for {len(user_ids)} users ({len(table)} in the table) in {options['output']}"
+        ))
+
+    def _shards(self, rows, cosine_recommender, block_size, number_of_recommendations):
+        """Groups the rating rows (ordered by user) into blocks of users, with catalog positions and model-scale ratings."""
+        block = []
+        for user_id, user_rows in itertools.groupby(rows, key=lambda row: row[0]):
+            block.append((user_id, list(user_rows)))
+            if len(block) == block_size:
+                yield self._shard(block, cosine_recommender, number_of_recommendations)
+                block = []
+        if block:
+            yield self._shard(block, cosine_recommender, number_of_recommendations)
+
+    def _shard(self, block, cosine_recommender, number_of_recommendations):
+        user_ids, rated_positions, rated_ratings = [], [], []
+        for user_id, user_rows in block:
+            positions = cosine_recommender.get_positions(movie_id for _, movie_id, _ in user_rows)
+            rated = [(position, rating) for position, (_, _, rating) in zip(positions, user_rows) if position is not None]
+            user_ids.append(user_id)
+            rated_positions.append(np.array([position for position, _ in rated], dtype=np.intp))
+            rated_ratings.append(_svd_recommender.to_model_scale([rating for _, rating in rated]))
+        return user_ids, rated_positions, rated_ratings, number_of_recommendations
@@ -0,0 +1,87 @@
+import json
+import os
+from django.core.management.base import BaseCommand, CommandError
+
+from recommendations.benchmarks import compare, default_cases, report_metadata, run_benchmarks
+from recommendations.provider import get_recommender
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PROJECT_ROOT = os.path.dirname(APP_DIR)
+
+BENCHMARKS_DIR = os.path.join(PROJECT_ROOT, 'benchmarks')
+
+
+class Command(BaseCommand):
+    """
+    Times the recommender and view hot paths over realistic inputs taken from the loaded catalog:
+    fuzzy titles, popular and rare IMDb IDs, short and long autocomplete terms, the home page and
+    card rendering. Reports p50/p95/p99 latencies and peak allocations per call, saves them as
+    JSON, and fails when a case is slower than the stored baseline by more than the threshold.
+
+    Usage:
+        python manage.py run_benchmarks --save-baseline
+        python manage.py run_benchmarks --threshold 0.2 --metric p95_ms
+        python -m recommendations.benchmarks --only autocomplete
+    """
+    help = "Runs the recommender micro-benchmarks and checks them against a stored baseline."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=os.path.join(BENCHMARKS_DIR, 'latest.json'),
+                            help="Path the results are written to.")
+        parser.add_argument('--baseline', default=os.path.join(BENCHMARKS_DIR, 'baseline.json'),
+                            help="Path of the baseline results compared against, if it exists.")
+        parser.add_argument('--save-baseline', action='store_true',
+                            help="Store this run as the new baseline instead of comparing against it.")
+        parser.add_argument('--iterations', type=int, default=200,
+                            help="Number of timed calls per case.")
+        parser.add_argument('--warmup', type=int, default=20,
+                            help="Number of untimed calls made before timing.")
+        parser.add_argument('--threshold', type=float, default=0.25,
+                            help="Allowed relative slowdown against the baseline (0.25 = 25%%).")
+        parser.add_argument('--metric', choices=['p50_ms', 'p95_ms', 'p99_ms', 'mean_ms'], default='p50_ms',
+                            help="Statistic compared against the baseline.")
+        parser.add_argument('--only', nargs='*', default=None,
+                            help="Only run the cases whose name contains one of these strings.")
+
+    def handle(self, *args, **options):
+        cosine_recommender = get_recommender()
+        results = run_benchmarks(
+            default_cases(cosine_recommender), options['iterations'], options['warmup'], options['only']
+        )
+        if not results:
+            raise CommandError("No benchmark matches --only.")
+
+        width = max(len(name) for name in results)
+        self.stdout.write(f"{'case':<{width}}  {'p50 ms':>9}  {'p95 ms':>9}  {'p99 ms':>9}  {'peak KiB':>9}")
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<{width}}  {result['p50_ms']:>9.3f}  {result['p95_ms']:>9.3f}  "
+                f"{result['p99_ms']:>9.3f}  {result['alloc_peak_max_kib']:>9.1f}"
+            )
+
+        report = {'metadata': report_metadata(cosine_recommender), 'results': results}
+        paths = [options['output']] + ([options['baseline']] if options['save_baseline'] else [])
+        for path in paths:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, 'w') as f:
+                json.dump(report, f, indent=2)
+        if options['save_baseline']:
+            self.stdout.write(self.style.SUCCESS(f"Saved the baseline to {options['baseline']}"))
+            return
+
+        if not os.path.exists(options['baseline']):
+            self.stdout.write(f"No baseline at {options['baseline']}; run with --save-baseline to store one.")
+            return
+        with open(options['baseline']) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, options['metric'], options['threshold'])
+        if regressions:
+            details = "; ".join(f"{name}: {before:.3f} -> {after:.3f} ms" for name, before, after in regressions)
+            raise CommandError(
+                f"{len(regressions)} benchmark(s) regressed by more than {options['threshold']:.0%} "
+                f"({options['metric']}): {details}"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"No regressions against {options['baseline']} ({options['metric']}, {options['threshold']:.0%} threshold)"
+        ))
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.6 on 2026-10-18 02:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recommendations", "0002_remove_userprofile_bio_rating_updated_at"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="rating",
+            index=models.Index(fields=["user", "-updated_at", "-id"], name="rating_user_updated_idx"),
+        ),
+    ]
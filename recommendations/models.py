@@ -39,8 +39,12 @@ class Rating(models.Model):
 
         Attributes:
             unique_together (tuple): Ensures that a user can only rate a specific movie once.
+            indexes (list): Serves a user's ratings newest first, one page at a time (see my_ratings_view).
         """
         unique_together = ('user', 'movie_id')
+        indexes = [
+            models.Index(fields=['user', '-updated_at', '-id'], name='rating_user_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} rated {self.movie_id} = {self.rating}"
@@ -1,7 +1,32 @@
+import pandas as pd
+
+POSTER_BASE_URL = "https://image.tmdb.org/t/p/w500"
+
+DEFAULT_POSTER_URL = "/static/images/default.jpg"
+
+
+def build_poster_url(poster_path):
+    """Returns the full TMDB poster URL for a poster path, or the default poster if it is missing."""
+    if poster_path and not pd.isnull(poster_path):
+        return POSTER_BASE_URL + str(poster_path)
+    return DEFAULT_POSTER_URL
+
+
+def release_year(release_date):
+    """Returns the release year of a Timestamp or 'YYYY-MM-DD' string as a string, or '' if unknown."""
+    if isinstance(release_date, pd.Timestamp):
+        return str(release_date.year)
+    if isinstance(release_date, str) and release_date:
+        return release_date.split("-")[0]
+    return ""
+
+
 class Movie:
     """
     A class representing a movie with relevant details.
 
+    Movies are built on demand for every card rendered, so the class uses __slots__ to stay small and fast to create.
+
     Attributes:
         title (str): The title of the movie.
         poster_url (str): The URL of the movie's poster image.
@@ -10,6 +35,8 @@ class Movie:
         release_date (str): The release date of the movie.
         movie_id (str): The unique IMDb ID of the movie.
     """
+    __slots__ = ('title', 'poster_url', 'overview', 'vote_average', 'release_date', 'movie_id')
+
     def __init__(self, title, poster_url, overview, vote_average, release_date, movie_id):
         self.title = title
         self.poster_url = poster_url
@@ -19,4 +46,35 @@ class Movie:
         self.movie_id = movie_id
 
     def __repr__(self):
-        return f"Movie({self.title}, IMDb ID: {self.movie_id})"
\ No newline at end of file
+        return f"Movie({self.title}, IMDb ID: {self.movie_id})"
+
+
+class Recommendation:
+    """
+    A single recommendation result, pointing at a row of the movie catalog.
+
+    Attributes:
+        position (int): The row position of the recommended movie in the catalog.
+        imdb_id (str): The unique IMDb ID of the recommended movie.
+        title (str): The title of the recommended movie.
+        score (float): The similarity score between the seed movie and the recommended movie.
+    """
+    __slots__ = ('position', 'imdb_id', 'title', 'score')
+
+    def __init__(self, position, imdb_id, title, score):
+        self.position = position
+        self.imdb_id = imdb_id
+        self.title = title
+        self.score = score
+
+    def __getstate__(self):
+        return (self.position, self.imdb_id, self.title, self.score)
+
+    def __setstate__(self, state):
+        self.position, self.imdb_id, self.title, self.score = state
+
+    def __eq__(self, other):
+        return isinstance(other, Recommendation) and self.__getstate__() == other.__getstate__()
+
+    def __repr__(self):
+        return f"Recommendation({self.title}, IMDb ID: {self.imdb_id}, score: {self.score:.4f})"
@@ -0,0 +1,149 @@
+import numpy as np
+import pandas as pd
+from .movie import Movie, build_poster_url
+
+
+class CategoricalColumn:
+    """
+    A low-cardinality string column stored as integer codes into one array of interned categories.
+
+    Attributes:
+        codes (numpy array): The category code of every row, -1 for a missing value.
+        categories (numpy array): The distinct values, each stored once.
+    """
+
+    def __init__(self, codes, categories):
+        self.codes = codes
+        self.categories = categories
+
+    @classmethod
+    def from_values(cls, values):
+        categorical = pd.Categorical(values)
+        codes = categorical.codes.astype(np.int16 if len(categorical.categories) < 2 ** 15 else np.int32)
+        return cls(codes, np.asarray(categorical.categories, dtype=object))
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, position):
+        code = self.codes[position]
+        return self.categories[code] if code >= 0 else None
+
+
+class MovieCatalog:
+    """
+    A compact, read-only, column-oriented movie catalog.
+
+    Only the columns the web app uses are kept: numeric fields as contiguous float arrays, release
+    dates as a datetime64 array, repetitive strings (genres, languages, director) as categorical
+    columns, and free text (titles, overviews, cast, ...) as object arrays. Rows are addressed by
+    position, and Movie records are only built for the rows being displayed.
+    """
+
+    TEXT_COLUMNS = ('imdb_id', 'title', 'overview', 'poster_path', 'cast', 'writers')
+
+    CATEGORICAL_COLUMNS = ('genres', 'spoken_languages', 'original_language', 'director')
+
+    NUMERIC_COLUMNS = ('imdb_rating', 'imdb_votes', 'runtime', 'popularity', 'vote_average', 'vote_count')
+
+    def __init__(self, columns, length):
+        self._columns = columns
+        self._length = length
+
+    @classmethod
+    def from_dataframe(cls, movies_tmdb):
+        """
+        Builds a catalog from the notebook's cleaned movies DataFrame, dropping the columns the app does not use.
+
+        Parameters:
+            movies_tmdb (DataFrame): The movies DataFrame (e.g. loaded from movies_filter.pkl).
+
+        Returns:
+            MovieCatalog: The catalog, with rows in the same order as the DataFrame.
+        """
+        columns = {}
+        for name in cls.TEXT_COLUMNS:
+            if name in movies_tmdb:
+                values = movies_tmdb[name]
+                if name == 'imdb_id':
+                    values = values.astype(str).str.strip()
+                columns[name] = values.to_numpy(dtype=object)
+        for name in cls.CATEGORICAL_COLUMNS:
+            if name in movies_tmdb:
+                # Lists (e.g. spoken_languages) are stored as their comma-separated display string.
+                values = [", ".join(value) if isinstance(value, list) else value for value in movies_tmdb[name]]
+                columns[name] = CategoricalColumn.from_values(values)
+        for name in cls.NUMERIC_COLUMNS:
+            if name in movies_tmdb:
+                columns[name] = pd.to_numeric(movies_tmdb[name], errors='coerce').to_numpy(dtype=np.float64)
+        if 'release_date' in movies_tmdb:
+            columns['release_date'] = pd.to_datetime(movies_tmdb['release_date'], errors='coerce').to_numpy()
+        return cls(columns, len(movies_tmdb))
+
+    def __len__(self):
+        return self._length
+
+    def __contains__(self, name):
+        return name in self._columns
+
+    def column(self, name):
+        """Returns the whole column (an array, or a CategoricalColumn) by name."""
+        return self._columns[name]
+
+    def top_positions(self, name, count):
+        """
+        Returns the positions of the rows with the highest values of a numeric column.
+
+        Parameters:
+            name (str): The numeric column name (e.g. 'popularity').
+            count (int): The number of positions to return.
+
+        Returns:
+            numpy array: Up to `count` row positions, highest value first; ties keep catalog order
+            and missing values come last.
+        """
+        values = np.nan_to_num(self._columns[name], nan=-np.inf)
+        return np.argsort(-values, kind='stable')[:count]
+
+    def value(self, name, position, default='N/A'):
+        """
+        Returns a single value of the catalog.
+
+        Parameters:
+            name (str): The column name.
+            position (int): The row position.
+            default: The value returned when the catalog has no such column.
+
+        Returns:
+            The stored value; release dates are returned as pandas Timestamps and missing dates as None.
+        """
+        column = self._columns.get(name)
+        if column is None:
+            return default
+        value = column[position]
+        if name == 'release_date':
+            return None if pd.isnull(value) else pd.Timestamp(value)
+        return value
+
+    def poster_url(self, position):
+        """Returns the poster URL of the movie at the given position."""
+        return build_poster_url(self.value('poster_path', position, default=None))
+
+    def movie(self, position):
+        """
+        Builds the Movie record for the movie at the given position.
+
+        Parameters:
+            position (int): The row position.
+
+        Returns:
+            Movie: The movie, ready to be rendered by MovieDisplay.
+        """
+        return Movie(
+            title=self.value('title', position),
+            poster_url=self.poster_url(position),
+            overview=self.value('overview', position, 'No overview available.'),
+            vote_average=self.value('imdb_rating', position),
+            release_date=self.value('release_date', position) or 'N/A',
+            movie_id=self.value('imdb_id', position),
+        )
@@ -1,3 +1,10 @@
+import threading
+
+from django.utils.html import escape
+
+from .result_cache import LRUCache
+
+
 class MovieDisplay:
     """
     A class to generate HTML for displaying a list of movie recommendations.
@@ -16,28 +23,112 @@ class MovieDisplay:
             Returns:
                 str: A string containing the HTML representation of the movie cards.
         """
-        html = ""
+        return "".join(self.iter_html())
+
+    def iter_html(self):
+        """
+            Yields the HTML card of every movie, so a page can be streamed as it is rendered.
+
+            Returns:
+                generator of str: The HTML of each movie card.
+        """
         for movie in self.movies:
-            html += f"""
+            yield self.render_card(movie)
+
+    @staticmethod
+    def render_card(movie):
+        """
+            Generates the HTML card of a single movie. The title, overview and URLs are HTML-escaped.
+
+            Parameters:
+                movie (Movie): The movie to render.
+
+            Returns:
+                str: The HTML of the movie card.
+        """
+        movie_id = escape(movie.movie_id)
+        title = escape(movie.title)
+        release_date = movie.release_date.strftime("%Y-%m-%d") if hasattr(movie.release_date, 'strftime') else movie.release_date
+        return f"""
             <div class="col-md-3 col-sm-6 movie-card">
               <div class="card">
-                <a href="/recommendations/movie/{movie.movie_id}/">
-                  <img class="card-img-top" src="{movie.poster_url}" alt="{movie.title}">
+                <a href="/recommendations/movie/{movie_id}/">
+                  <img class="card-img-top" src="{escape(movie.poster_url)}" alt="{title}">
                 </a>
                 <div class="card-body">
                   <h5 class="card-title">
-                    <a href="/recommendations/movie/{movie.movie_id}/" style="text-decoration:none; color:inherit;">
-                      {movie.title}
+                    <a href="/recommendations/movie/{movie_id}/" style="text-decoration:none; color:inherit;">
+                      {title}
                     </a>
                   </h5>
-                  <p class="card-text">{movie.overview[:100]}...</p>
+                  <p class="card-text">{escape(movie.overview[:100])}...</p>
                   <p class="card-text">
                       <small class="text-muted">
-                        IMDB Rating: {movie.vote_average} | Released: {movie.release_date.strftime("%Y-%m-%d") if hasattr(movie.release_date, 'strftime') else movie.release_date}
+                        IMDB Rating: {escape(movie.vote_average)} | Released: {escape(release_date)}
                       </small>
                     </p>
                 </div>
               </div>
             </div>
             """
-        return html
\ No newline at end of file
+
+
+class CardCache:
+    """
+    Caches the rendered HTML card of each movie, keyed on the model version and the movie's IMDb ID.
+
+    A card is rendered (and its text escaped and its release date formatted) once, the first time
+    the movie is displayed; pages are then assembled by joining the cached fragments. The cache is
+    cleared as soon as a new model version is seen.
+
+    Attributes:
+        cards (LRUCache): The cached cards, the least recently displayed ones are evicted first.
+    """
+
+    def __init__(self, max_entries=20000):
+        self.cards = LRUCache(max_entries=max_entries)
+        self.version = None
+        self._lock = threading.Lock()
+
+    def iter_cards(self, model_version, catalog, positions):
+        """
+        Yields the HTML card of the movie at each position, rendering only the ones not cached yet.
+
+        Parameters:
+            model_version (str): The version of the loaded model (CosineRecommender.model_version).
+            catalog (MovieCatalog): The catalog the positions point into.
+            positions (iterable of int): The row positions of the movies to display, in display order.
+
+        Returns:
+            generator of str: The HTML of each movie card.
+        """
+        if model_version != self.version:
+            with self._lock:
+                if model_version != self.version:
+                    self.cards.clear()
+                    self.version = model_version
+
+        for position in positions:
+            imdb_id = catalog.value('imdb_id', position)
+            card = self.cards.get(imdb_id)
+            if card is None:
+                card = MovieDisplay.render_card(catalog.movie(position))
+                self.cards.set(imdb_id, card)
+            yield card
+
+    def render_html(self, model_version, catalog, positions):
+        """
+        Returns the HTML cards of the movies at the given positions, joined into one string.
+
+        Parameters:
+            model_version (str): The version of the loaded model (CosineRecommender.model_version).
+            catalog (MovieCatalog): The catalog the positions point into.
+            positions (iterable of int): The row positions of the movies to display, in display order.
+
+        Returns:
+            str: A string containing the HTML representation of the movie cards.
+        """
+        return "".join(self.iter_cards(model_version, catalog, positions))
+
+
+card_cache = CardCache()
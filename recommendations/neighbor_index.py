@@ -0,0 +1,253 @@
+import multiprocessing
+import os
+import numpy as np
+from .ann_index import normalize_rows
+from .artifacts import save_array
+
+
+class NeighborIndex:
+    """
+    A compact top-K neighbor index built offline from a cosine similarity matrix.
+
+    Instead of the dense N x N matrix, only the K most similar movies of every movie are kept,
+    so memory is O(N * K) and a lookup is O(K).
+
+    Attributes:
+        positions (numpy array): An N x K int32 array with the row positions of each movie's neighbors,
+            ordered from most to least similar. The movie itself is never one of its neighbors.
+        scores (numpy array): An N x K float array (float16 or float32) with the matching similarity scores.
+    """
+
+    def __init__(self, positions, scores):
+        self.positions = positions
+        self.scores = scores
+
+    @property
+    def k(self):
+        """The number of neighbors stored per movie."""
+        return self.positions.shape[1]
+
+    def __len__(self):
+        return self.positions.shape[0]
+
+    def neighbors(self, index_of_the_movie):
+        """
+        Returns the stored neighbors of the movie at the given row position.
+
+        Returns:
+            tuple of (numpy array, numpy array): Neighbor row positions and their similarity scores.
+        """
+        return self.positions[index_of_the_movie], self.scores[index_of_the_movie]
+
+    @classmethod
+    def build(cls, similarity, k=50, dtype=np.float32, block_size=1024):
+        """
+        Builds the index from a dense similarity matrix, one block of rows at a time.
+
+        Parameters:
+            similarity (numpy array): The N x N cosine similarity matrix.
+            k (int): The number of neighbors to keep per movie.
+            dtype (numpy dtype): The dtype used to store scores (float16 or float32).
+            block_size (int): The number of rows processed at once.
+
+        Returns:
+            NeighborIndex: The built index.
+        """
+        n = similarity.shape[0]
+        k = max(0, min(k, n - 1))
+        positions = np.empty((n, k), dtype=np.int32)
+        scores = np.empty((n, k), dtype=dtype)
+        if k == 0:
+            return cls(positions, scores)
+
+        for start in range(0, n, block_size):
+            stop = min(start + block_size, n)
+            block = np.array(similarity[start:stop], dtype=np.float64)
+            positions[start:stop], scores[start:stop] = _top_k_rows(block, start, k)
+
+        return cls(positions, scores)
+
+    @classmethod
+    def build_from_features(cls, features, directory, k=50, dtype=np.float32, block_size=1024, workers=1):
+        """
+        Builds the index straight from the sparse content feature vectors, without ever holding the
+        N x N similarity matrix.
+
+        The features are unit-normalized once; then blocks of rows are multiplied with the whole
+        matrix (cosine similarity), reduced to their top-K and written into memory-mapped output
+        files, so peak memory is O(block_size x N) per worker. Blocks are spread over a pool of
+        worker processes.
+
+        Parameters:
+            features (scipy sparse matrix): The N x D content feature vectors, by catalog row.
+            directory (str): The directory the index is written to, as by `save`.
+            k (int): The number of neighbors to keep per movie.
+            dtype (numpy dtype): The dtype used to store scores (float16 or float32).
+            block_size (int): The number of rows processed at once by a worker.
+            workers (int): The number of worker processes (1 builds in this process).
+
+        Returns:
+            NeighborIndex: The built index, memory-mapped from `directory`.
+        """
+        features = normalize_rows(features)
+        n = features.shape[0]
+        k = max(0, min(k, n - 1))
+
+        os.makedirs(directory, exist_ok=True)
+        positions_path = os.path.join(directory, 'positions.npy')
+        scores_path = os.path.join(directory, 'scores.npy')
+        # Written in place as blocks complete, then renamed, so running workers never map a half-written file.
+        positions = np.lib.format.open_memmap(positions_path + '.tmp', mode='w+', dtype=np.int32, shape=(n, k))
+        scores = np.lib.format.open_memmap(scores_path + '.tmp', mode='w+', dtype=dtype, shape=(n, k))
+
+        starts = range(0, n, block_size) if k else []
+        tasks = [(start, min(start + block_size, n), k) for start in starts]
+        if workers > 1 and len(tasks) > 1:
+            with multiprocessing.Pool(workers, initializer=_init_block_worker, initargs=(features,)) as pool:
+                for start, stop, top, top_scores in pool.imap_unordered(_features_block_top_k, tasks):
+                    positions[start:stop], scores[start:stop] = top, top_scores
+        else:
+            _init_block_worker(features)
+            try:
+                for task in tasks:
+                    start, stop, top, top_scores = _features_block_top_k(task)
+                    positions[start:stop], scores[start:stop] = top, top_scores
+            finally:
+                _release_block_worker()
+
+        positions.flush()
+        scores.flush()
+        del positions, scores
+        os.replace(positions_path + '.tmp', positions_path)
+        os.replace(scores_path + '.tmp', scores_path)
+        return cls.load(directory)
+
+    def extend(self, features, block_size=64):
+        """
+        Returns the index with new movies appended, without rebuilding the neighbors of the others.
+
+        Only the similarities of the new movies to every movie are computed, in blocks of new movies.
+        The new movies get their own top-K lists, and a new movie enters the list of an existing
+        movie when it is more similar than that list's last neighbor.
+
+        Parameters:
+            features (scipy sparse matrix): The (N + M) x D content feature vectors of every movie, by
+                catalog row; the first N are the movies already in the index.
+            block_size (int): The number of new movies whose similarities are computed at once.
+
+        Returns:
+            NeighborIndex: The extended index, held in memory (see `save`).
+        """
+        n, k = self.positions.shape
+        total = features.shape[0]
+        positions = np.empty((total, k), dtype=np.int32)
+        scores = np.empty((total, k), dtype=self.scores.dtype)
+        positions[:n], scores[:n] = self.positions, self.scores
+        if k == 0:
+            return NeighborIndex(positions, scores)
+
+        _init_block_worker(normalize_rows(features))
+        try:
+            for start in range(n, total, block_size):
+                stop = min(start + block_size, total)
+                block = _similarity_block(start, stop)
+                incoming = block[:, :n].T
+                # On ties the movie already in a list keeps its place, as the lower position.
+                affected = np.flatnonzero((incoming > scores[:n, -1:]).any(axis=1))
+                if len(affected):
+                    candidates = np.concatenate(
+                        [positions[affected], np.broadcast_to(np.arange(start, stop), (len(affected), stop - start))],
+                        axis=1,
+                    )
+                    candidate_scores = np.concatenate(
+                        [scores[affected].astype(block.dtype), incoming[affected]], axis=1
+                    )
+                    best = np.lexsort((candidates, -candidate_scores))[:, :k]
+                    positions[affected] = np.take_along_axis(candidates, best, axis=1)
+                    scores[affected] = np.take_along_axis(candidate_scores, best, axis=1)
+                positions[start:stop], scores[start:stop] = _top_k_rows(block, start, k)
+        finally:
+            _release_block_worker()
+
+        return NeighborIndex(positions, scores)
+
+    def save(self, directory):
+        """
+        Saves the index as raw .npy files (positions.npy and scores.npy) in the given directory,
+        so it can be memory-mapped by `load`.
+        """
+        os.makedirs(directory, exist_ok=True)
+        save_array(os.path.join(directory, 'positions.npy'), self.positions)
+        save_array(os.path.join(directory, 'scores.npy'), self.scores)
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        """
+        Loads an index saved with `save`. By default the arrays are memory-mapped read-only,
+        so all worker processes share one copy through the OS page cache.
+        """
+        return cls(
+            np.load(os.path.join(directory, 'positions.npy'), mmap_mode=mmap_mode),
+            np.load(os.path.join(directory, 'scores.npy'), mmap_mode=mmap_mode),
+        )
+
+
+def _top_k_rows(block, start, k):
+    """Returns the top-k positions and scores of each row of a block of similarity rows starting at row `start`."""
+    rows = np.arange(block.shape[0])
+    # A movie is never its own neighbor.
+    block[rows, rows + start] = -np.inf
+
+    top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+    # The partition keeps arbitrary movies among those tied with the k-th best score. In the rows
+    # where some of them were left out, keep the ones at the lowest positions, like a stable full sort.
+    top_scores = np.take_along_axis(block, top, axis=1)
+    kth_score = top_scores.min(axis=1, keepdims=True)
+    ties = block == kth_score
+    crowded = np.flatnonzero(ties.sum(axis=1) > (top_scores == kth_score).sum(axis=1))
+    if len(crowded):
+        ties = ties[crowded]
+        above = block[crowded] > kth_score[crowded]
+        missing = k - above.sum(axis=1, keepdims=True)
+        ties &= np.cumsum(ties, axis=1, dtype=np.int32) <= missing
+        top[crowded] = np.nonzero(above | ties)[1].reshape(len(crowded), k)
+    top.sort(axis=1)
+    # Order by score, breaking ties by row position.
+    order = np.argsort(-np.take_along_axis(block, top, axis=1), axis=1, kind='stable')
+    top = np.take_along_axis(top, order, axis=1)
+    return top, np.take_along_axis(block, top, axis=1)
+
+
+# The normalized features of a build worker process, split by _init_block_worker.
+_sparse_features = None
+_dense_features = None
+
+
+def _init_block_worker(features, dense_column_share=0.1):
+    # Columns set for most movies (e.g. the scaled numeric features) would make every sparse
+    # product fully dense, so they are multiplied as a small dense matrix instead.
+    global _sparse_features, _dense_features
+    column_counts = np.bincount(features.indices, minlength=features.shape[1])
+    dense_columns = np.flatnonzero(column_counts > dense_column_share * features.shape[0])
+    sparse_columns = np.setdiff1d(np.arange(features.shape[1]), dense_columns)
+    _sparse_features = features[:, sparse_columns].tocsr()
+    _dense_features = features[:, dense_columns].toarray()
+
+
+def _release_block_worker():
+    # In-process builds drop the features when done, instead of holding them for the process lifetime.
+    global _sparse_features, _dense_features
+    _sparse_features = _dense_features = None
+
+
+def _similarity_block(start, stop):
+    """Returns the cosine similarities of the rows start:stop to every row, as a dense block."""
+    block = (_sparse_features[start:stop] @ _sparse_features.T).toarray()
+    block += _dense_features[start:stop] @ _dense_features.T
+    return block
+
+
+def _features_block_top_k(task):
+    start, stop, k = task
+    top, top_scores = _top_k_rows(_similarity_block(start, stop), start, k)
+    return start, stop, top, top_scores
@@ -0,0 +1,216 @@
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+
+from .cosine_recommender import CosineRecommender
+from .svd_recommender import SVDRecommender
+from .user_recommendations import UserRecommendationTable
+
+logger = logging.getLogger(__name__)
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+PROJECT_ROOT = os.path.abspath(os.path.join(APP_DIR, '..'))
+
+MOVIES_CSV_PATH = os.path.join(PROJECT_ROOT, 'data', 'movies_filter.pkl')
+
+SIMILARITY_PATH = os.path.join(APP_DIR, 'ml_models', 'cosine_matrix')
+
+SIMILARITY_NPY_PATH = os.path.join(APP_DIR, 'ml_models', 'cosine_matrix.npy')
+
+NEIGHBORS_PATH = os.path.join(APP_DIR, 'ml_models', 'cosine_neighbors')
+
+ANN_PATH = os.path.join(APP_DIR, 'ml_models', 'content_ann')
+
+SVD_MODEL_PATH = os.path.join(APP_DIR, 'ml_models', 'svd')
+
+USER_RECOMMENDATIONS_PATH = os.path.join(APP_DIR, 'ml_models', 'user_recommendations')
+
+
+def load_cosine_recommender():
+    """
+    Loads the CosineRecommender from the best available artifacts.
+
+    The compact neighbor index (built with `manage.py build_neighbor_index`) is preferred, then the
+    approximate nearest-neighbor index (`manage.py build_ann_index`, searching CONTENT_ANN_PROBES
+    clusters per query when that setting is set), then the memory-mapped matrix
+    (`manage.py convert_artifacts`), then the pickled dense matrix.
+
+    Returns:
+        CosineRecommender: The loaded recommender.
+    """
+    if os.path.isdir(NEIGHBORS_PATH):
+        return CosineRecommender(MOVIES_CSV_PATH, neighbors_path=NEIGHBORS_PATH)
+    if os.path.isdir(ANN_PATH):
+        return CosineRecommender(
+            MOVIES_CSV_PATH, ann_path=ANN_PATH, ann_probes=getattr(settings, 'CONTENT_ANN_PROBES', None)
+        )
+    if os.path.exists(SIMILARITY_NPY_PATH):
+        return CosineRecommender(MOVIES_CSV_PATH, SIMILARITY_NPY_PATH)
+    return CosineRecommender(MOVIES_CSV_PATH, SIMILARITY_PATH)
+
+
+def load_svd_recommender():
+    """
+    Loads the personalized SVDRecommender from the arrays exported with `manage.py export_svd_model`.
+
+    Returns:
+        SVDRecommender: The loaded recommender, aligned with the shared CosineRecommender's catalog.
+    """
+    return SVDRecommender(
+        SVD_MODEL_PATH, get_recommender(), max_folded_users=getattr(settings, 'SVD_FOLDED_USERS_MAX_ENTRIES', 10000)
+    )
+
+
+def load_user_recommendations():
+    """
+    Loads the precomputed personalized recommendations (`manage.py precompute_user_recommendations`).
+
+    Returns:
+        UserRecommendationTable: The memory-mapped table.
+    """
+    return UserRecommendationTable.load(USER_RECOMMENDATIONS_PATH)
+
+
+class RecommenderProvider:
+    """
+    Lazily loads a recommender on first use, once, in a thread-safe way.
+
+    The load can also be started ahead of time in a background thread (see `warm_up`), and its
+    progress is reported by `status` for the readiness endpoint.
+
+    With a source path, the recommender follows that file: while it is missing, `get` raises
+    FileNotFoundError without attempting a load, and when it is rewritten (its modification time
+    changes), the next `get` loads the new version.
+
+    Attributes:
+        state (str): One of 'not_loaded', 'loading', 'ready' or 'failed'.
+        load_seconds (float): How long the last successful load took, None until loaded.
+        error (str): The error of the last failed load, None otherwise.
+    """
+    NOT_LOADED = 'not_loaded'
+    LOADING = 'loading'
+    READY = 'ready'
+    FAILED = 'failed'
+
+    def __init__(self, factory, source_path=None):
+        self._factory = factory
+        self._source_path = source_path
+        self._source_mtime = None
+        self._lock = threading.Lock()
+        self._recommender = None
+        self.state = self.NOT_LOADED
+        self.load_seconds = None
+        self.error = None
+
+    def get(self):
+        """
+        Returns the recommender, loading it first if needed. Concurrent callers wait for a single load.
+
+        Returns:
+            The loaded recommender.
+        """
+        source_mtime = None
+        if self._source_path is not None:
+            source_mtime = os.stat(self._source_path).st_mtime_ns
+        recommender = self._recommender
+        if recommender is not None and source_mtime == self._source_mtime:
+            return recommender
+        with self._lock:
+            if self._recommender is None or source_mtime != self._source_mtime:
+                self._load()
+                self._source_mtime = source_mtime
+            return self._recommender
+
+    def _load(self):
+        # While reloading, the previous recommender keeps serving, so the provider stays ready.
+        if self._recommender is None:
+            self.state = self.LOADING
+        self.error = None
+        started = time.perf_counter()
+        try:
+            recommender = self._factory()
+        except Exception as exc:
+            if self._recommender is None:
+                self.state = self.FAILED
+            self.error = repr(exc)
+            logger.exception("Loading the recommender failed")
+            raise
+        self.load_seconds = time.perf_counter() - started
+        self._recommender = recommender
+        self.state = self.READY
+        logger.info("Recommender loaded in %.2fs", self.load_seconds)
+
+    def reload(self):
+        """
+        Loads a fresh recommender (e.g. after new artifacts were built) and swaps it in once it is ready.
+        Requests keep using the previous recommender while the new one loads.
+
+        Returns:
+            The newly loaded recommender.
+        """
+        with self._lock:
+            self._load()
+            return self._recommender
+
+    def warm_up(self):
+        """
+        Starts loading the recommender in a background daemon thread.
+
+        Returns:
+            threading.Thread: The started thread.
+        """
+        thread = threading.Thread(target=self._warm_up, name='recommender-warm-up', daemon=True)
+        thread.start()
+        return thread
+
+    def _warm_up(self):
+        try:
+            self.get()
+        except Exception:
+            # Already logged and recorded in `error`; the next request retries the load.
+            pass
+
+    def is_ready(self):
+        return self.state == self.READY
+
+    def status(self):
+        """Returns the load state, load duration and last error as a JSON-ready dict."""
+        return {
+            'status': self.state,
+            'load_seconds': round(self.load_seconds, 3) if self.load_seconds is not None else None,
+            'error': self.error,
+        }
+
+
+recommender_provider = RecommenderProvider(load_cosine_recommender)
+
+
+def get_recommender():
+    """Returns the shared CosineRecommender, loading it on first use."""
+    return recommender_provider.get()
+
+
+svd_provider = RecommenderProvider(load_svd_recommender)
+
+
+def get_svd_recommender():
+    """Returns the shared SVDRecommender, loading it on first use."""
+    return svd_provider.get()
+
+
+# The table is optional and rewritten by a periodic job: follow its meta.json, which is written last.
+user_recommendations_provider = RecommenderProvider(
+    load_user_recommendations, source_path=os.path.join(USER_RECOMMENDATIONS_PATH, 'meta.json')
+)
+
+
+def get_user_recommendations():
+    """
+    Returns the precomputed UserRecommendationTable, loading it on first use and whenever it is recomputed.
+    Raises FileNotFoundError while it does not exist.
+    """
+    return user_recommendations_provider.get()
@@ -0,0 +1,153 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class LRUCache:
+    """
+    A bounded, thread-safe, in-process LRU cache whose entries also expire after a TTL.
+
+    Attributes:
+        max_entries (int): The maximum number of entries; the least recently used one is evicted first.
+        ttl (float): Seconds an entry stays valid, None for no expiry.
+    """
+
+    def __init__(self, max_entries=10000, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RecommendationCache:
+    """
+    Caches recommendation results keyed on (model version, seed movie, number of recommendations).
+
+    Lookups go to a bounded in-process LRU tier first, then to an optional shared Django cache
+    backend (e.g. Redis or Memcached, configured in CACHES). Because the model version is part of
+    every key, loading a new model artifact makes all older entries unreachable; the local tier is
+    also cleared as soon as a new version is seen.
+
+    Attributes:
+        local (LRUCache): The in-process tier.
+        backend (BaseCache): The Django cache backend tier, None when disabled.
+        hits (int): Lookups answered by the local tier.
+        backend_hits (int): Lookups answered by the Django cache backend.
+        misses (int): Lookups that had to compute the result.
+    """
+
+    def __init__(self, max_entries=10000, ttl=3600, backend_alias=None):
+        self.local = LRUCache(max_entries=max_entries, ttl=ttl)
+        self.backend = caches[backend_alias] if backend_alias else None
+        self.ttl = ttl
+        self.version = None
+        self.hits = 0
+        self.backend_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        """
+        Builds the cache from the RECOMMENDATION_CACHE setting, a dict with the optional keys
+        MAX_ENTRIES, TTL (seconds) and BACKEND (a CACHES alias, None to disable the shared tier).
+        """
+        options = getattr(settings, 'RECOMMENDATION_CACHE', {})
+        return cls(
+            max_entries=options.get('MAX_ENTRIES', 10000),
+            ttl=options.get('TTL', 3600),
+            backend_alias=options.get('BACKEND'),
+        )
+
+    def get_or_compute(self, model_version, seed_id, count, compute):
+        """
+        Returns the cached result for the seed movie, computing and storing it on a miss.
+
+        Parameters:
+            model_version (str): The version of the loaded model (CosineRecommender.model_version).
+            seed_id (str): The IMDb ID of the seed movie.
+            count (int): The number of recommendations requested.
+            compute (callable): Called with no arguments to compute the result on a miss.
+
+        Returns:
+            The cached or freshly computed result.
+        """
+        if model_version != self.version:
+            with self._lock:
+                if model_version != self.version:
+                    self.local.clear()
+                    self.version = model_version
+
+        key = f"recs:{model_version}:{seed_id}:{count}"
+        result = self.local.get(key)
+        if result is not None:
+            with self._lock:
+                self.hits += 1
+            return result
+
+        if self.backend is not None:
+            result = self.backend.get(key)
+            if result is not None:
+                with self._lock:
+                    self.backend_hits += 1
+                self.local.set(key, result)
+                return result
+
+        with self._lock:
+            self.misses += 1
+        result = compute()
+        self.local.set(key, result)
+        if self.backend is not None:
+            self.backend.set(key, result, timeout=self.ttl)
+        return result
+
+    def stats(self):
+        """Returns the hit and miss counters as a JSON-ready dict."""
+        with self._lock:
+            version, hits, backend_hits, misses = self.version, self.hits, self.backend_hits, self.misses
+        lookups = hits + backend_hits + misses
+        return {
+            'model_version': version,
+            'entries': len(self.local),
+            'hits': hits,
+            'backend_hits': backend_hits,
+            'misses': misses,
+            'hit_rate': round((hits + backend_hits) / lookups, 4) if lookups else None,
+        }
+
+
+recommendation_cache = RecommendationCache.from_settings()
@@ -0,0 +1,13 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .fold_in import fold_in_worker
+from .models import Rating
+
+
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Rating)
+def refresh_user_factors(sender, instance, **kwargs):
+    """Schedules an update of the user's personalized recommendations once the rating change is committed."""
+    transaction.on_commit(lambda: fold_in_worker.schedule(instance.user_id))
@@ -0,0 +1,308 @@
+import json
+import os
+import numpy as np
+from .artifacts import artifact_version
+from .movie import Recommendation
+from .result_cache import LRUCache
+
+# The lowest and highest rating users can give in the app (see RatingForm).
+APP_RATING_SCALE = (1, 10)
+
+
+class SVDRecommender:
+    """
+    A personalized recommender serving the notebook's SVD collaborative-filtering model.
+
+    The model is loaded from arrays exported with `manage.py export_svd_model`, and the item
+    factors are aligned with the rows of the movie catalog once at load time. Recommending for a
+    user is then a single matrix-vector product over all movies followed by a partial top-k
+    selection, instead of one `predict()` call per movie.
+
+    A predicted rating follows the SVD model: global_mean + user_bias + item_bias + user_factors . item_factors.
+    Users unknown to the model get the baseline prediction global_mean + item_bias, as in surprise.
+    The app's own users get factors folded in from their ratings (see `fold_in`). They are never
+    matched to the users exported with the model, whose IDs are MovieLens user IDs, not app user IDs.
+
+    Attributes:
+        item_factors (numpy array): The N x K item factors, by catalog row (zeros for movies unknown to the model).
+        item_biases (numpy array): The item biases, by catalog row.
+        known_items (numpy array): True for the catalog rows the model was trained on.
+        global_mean (float): The mean rating of the training set.
+        rating_scale (tuple of float): The (lowest, highest) rating of the training set.
+        regularization (float): The regularization of the fold-in least squares, per rating.
+        model_version (str): A fingerprint of the loaded SVD artifacts and of the content recommender's
+            artifacts (whose catalog rows the scores are indexed by).
+    """
+
+    def __init__(self, model_path, cosine_recommender, max_folded_users=10000):
+        with open(os.path.join(model_path, 'meta.json')) as f:
+            meta = json.load(f)
+        self.global_mean = float(meta['global_mean'])
+        self.rating_scale = tuple(meta.get('rating_scale', (0.5, 5.0)))
+        self.regularization = float(meta.get('regularization', 0.1))
+
+        self.catalog = cosine_recommender.catalog
+        self.model_version = cosine_recommender.model_version + '-' + artifact_version(*(
+            os.path.join(model_path, name) for name in [
+                'meta.json', 'item_ids.npy', 'item_factors.npy', 'item_biases.npy',
+                'user_ids.npy', 'user_factors.npy', 'user_biases.npy',
+            ]
+        ))
+
+        # Align the model's items with the catalog rows, so scores are indexed by catalog position.
+        item_ids = np.load(os.path.join(model_path, 'item_ids.npy'))
+        item_factors = np.load(os.path.join(model_path, 'item_factors.npy'))
+        item_biases = np.load(os.path.join(model_path, 'item_biases.npy'))
+        positions = np.array([
+            -1 if position is None else position for position in cosine_recommender.get_positions(item_ids)
+        ], dtype=np.intp)
+        found = positions >= 0
+
+        n = len(self.catalog)
+        self.item_factors = np.zeros((n, item_factors.shape[1]), dtype=np.float32)
+        self.item_factors[positions[found]] = item_factors[found]
+        self.item_biases = np.zeros(n, dtype=np.float32)
+        self.item_biases[positions[found]] = item_biases[found]
+        self.known_items = np.zeros(n, dtype=bool)
+        self.known_items[positions[found]] = True
+
+        user_ids = np.load(os.path.join(model_path, 'user_ids.npy'))
+        self.user_factors = np.load(os.path.join(model_path, 'user_factors.npy'), mmap_mode='r')
+        self.user_biases = np.load(os.path.join(model_path, 'user_biases.npy'), mmap_mode='r')
+        self._user_rows = {str(user_id): row for row, user_id in enumerate(user_ids.tolist())}
+        # (factors and bias, rating version) folded in from the app users' ratings, replaced as a whole
+        # on every update. The factors are None for users none of whose rated movies the model knows.
+        # The least recently used users are evicted; their next request folds them in again.
+        self._folded_users = LRUCache(max_entries=max_folded_users)
+
+    @property
+    def n_factors(self):
+        return self.item_factors.shape[1]
+
+    def get_user(self, user_id):
+        """
+        Look up the factors and bias folded in from an app user's ratings.
+
+        Parameters:
+            user_id (str or int): The app user's ID.
+
+        Returns:
+            tuple of (numpy array, float) or None: The user's factors and bias, or None if the user
+            was not folded in yet.
+        """
+        folded = self._folded_users.get(str(user_id))
+        return folded[0] if folded is not None else None
+
+    def get_exported_user(self, user_id):
+        """
+        Look up the factors and bias of a user of the training set, exported with the model.
+
+        Parameters:
+            user_id (str or int): The user's ID in the training set (a MovieLens user ID, not an app user ID).
+
+        Returns:
+            tuple of (numpy array, float) or None: The user's factors and bias, or None for an unknown user.
+        """
+        row = self._user_rows.get(str(user_id))
+        if row is None:
+            return None
+        return np.asarray(self.user_factors[row], dtype=np.float32), float(self.user_biases[row])
+
+    def has_folded_user(self, user_id):
+        return self.get_user(user_id) is not None
+
+    def is_user_current(self, user_id, rating_version):
+        """
+        Whether a user's folded-in factors were computed from their current ratings.
+
+        Each worker process folds users in on its own, so a process that did not handle a rating
+        change finds out from the rating version it reads with the user's ratings.
+
+        Parameters:
+            user_id (str or int): The app user's ID.
+            rating_version (tuple): The version of the user's current ratings (see `fold_in.rating_version`).
+
+        Returns:
+            bool: True if the folded-in factors are up to date, or if the user has no ratings and none were folded in.
+        """
+        folded = self._folded_users.get(str(user_id))
+        if folded is None:
+            return rating_version[0] == 0
+        return folded[1] == rating_version
+
+    def to_model_scale(self, ratings):
+        """Maps ratings on the app's 1-10 scale linearly onto the model's rating scale."""
+        low, high = self.rating_scale
+        app_low, app_high = APP_RATING_SCALE
+        return low + (np.asarray(ratings, dtype=np.float32) - app_low) * ((high - low) / (app_high - app_low))
+
+    def fold_in(self, positions, ratings):
+        """
+        Compute a user's factors and bias from their ratings, keeping the item factors fixed.
+
+        This solves the regularized least squares problem of the SVD model for one user,
+        min sum (r - global_mean - b_i - b_u - p_u . q_i)^2 + regularization * n * (|p_u|^2 + b_u^2),
+        in closed form, which costs a single (K+1) x (K+1) solve.
+
+        Parameters:
+            positions (iterable of int): The catalog rows of the rated movies.
+            ratings (iterable of float): The ratings, on the model's rating scale.
+
+        Returns:
+            tuple of (numpy array, float) or None: The user's factors and bias, or None if none of
+            the rated movies is known to the model.
+        """
+        positions = np.fromiter(positions, dtype=np.intp)
+        ratings = np.asarray(ratings, dtype=np.float64)
+        known = self.known_items[positions]
+        positions, ratings = positions[known], ratings[known]
+        if len(positions) == 0:
+            return None
+
+        design = np.empty((len(positions), self.n_factors + 1))
+        design[:, :-1] = self.item_factors[positions]
+        design[:, -1] = 1.0
+        residuals = ratings - self.global_mean - self.item_biases[positions]
+        gram = design.T @ design
+        gram[np.diag_indices_from(gram)] += self.regularization * len(positions)
+        solution = np.linalg.solve(gram, design.T @ residuals)
+        return solution[:-1].astype(np.float32), float(solution[-1])
+
+    def publish_user(self, user_id, user, rating_version=None):
+        """
+        Publish (or, with None and no rating version, remove) the folded-in factors and bias of a user.
+
+        Parameters:
+            user_id (str or int): The user's ID.
+            user (tuple of (numpy array, float)): The factors and bias, as returned by `fold_in`.
+            rating_version (tuple): The version of the ratings they were folded in from (see `is_user_current`).
+        """
+        if user is None and rating_version is None:
+            self._folded_users.delete(str(user_id))
+        else:
+            self._folded_users.set(str(user_id), (user, rating_version))
+
+    def predict_all(self, user_factors=None, user_bias=0.0):
+        """
+        Predict the rating of every movie of the catalog for a user, with one matrix-vector product.
+
+        Parameters:
+            user_factors (numpy array): The user's K factors, None for the baseline prediction.
+            user_bias (float): The user's bias.
+
+        Returns:
+            numpy array: The predicted rating of every catalog row, clipped to the rating scale;
+            -inf for movies unknown to the model.
+        """
+        scores = self.item_biases + np.float32(self.global_mean + user_bias)
+        if user_factors is not None:
+            scores += self.item_factors @ np.asarray(user_factors, dtype=np.float32)
+        np.clip(scores, *self.rating_scale, out=scores)
+        scores[~self.known_items] = -np.inf
+        return scores
+
+    def predict(self, positions, user_factors=None, user_bias=0.0):
+        """
+        Predict the rating of some movies of the catalog for a user.
+
+        Parameters:
+            positions (numpy array): The catalog rows of the movies.
+            user_factors (numpy array): The user's K factors, None for the baseline prediction.
+            user_bias (float): The user's bias.
+
+        Returns:
+            numpy array: The predicted rating of each movie, clipped to the rating scale;
+            -inf for movies unknown to the model.
+        """
+        positions = np.asarray(positions, dtype=np.intp)
+        scores = self.item_biases[positions] + np.float32(self.global_mean + user_bias)
+        if user_factors is not None:
+            scores += self.item_factors[positions] @ np.asarray(user_factors, dtype=np.float32)
+        np.clip(scores, *self.rating_scale, out=scores)
+        scores[~self.known_items[positions]] = -np.inf
+        return scores
+
+    def recommend(self, user_factors=None, user_bias=0.0, exclude=(), number_of_recommendations=12):
+        """
+        Recommend the movies with the highest predicted rating for a user.
+
+        Parameters:
+            user_factors (numpy array): The user's K factors, None for the baseline prediction.
+            user_bias (float): The user's bias.
+            exclude (iterable of int): Catalog rows never to recommend, e.g. the movies the user already rated.
+            number_of_recommendations (int): The number of recommendations to return.
+
+        Returns:
+            list of Recommendation: The recommended movies, with their predicted rating as score,
+            from highest to lowest.
+        """
+        scores = self.predict_all(user_factors, user_bias)
+        exclude = np.fromiter(exclude, dtype=np.intp)
+        scores[exclude] = -np.inf
+
+        count = min(max(number_of_recommendations, 0), int(np.isfinite(scores).sum()))
+        if count == 0:
+            return []
+        candidates = np.argpartition(-scores, count - 1)[:count]
+        # Highest score first, lower position first on ties.
+        candidates = candidates[np.lexsort((candidates, -scores[candidates]))]
+
+        imdb_ids = self.catalog.column('imdb_id')
+        titles = self.catalog.column('title')
+        return [
+            Recommendation(position, imdb_ids[position], titles[position], score)
+            for position, score in zip(candidates.tolist(), scores[candidates].tolist())
+        ]
+
+    def recommend_many(self, user_factors, user_biases, excludes, number_of_recommendations=12):
+        """
+        Recommend movies for a block of users at once, scoring all of them with one matrix product.
+
+        Parameters:
+            user_factors (numpy array): A B x K array with the factors of each user (zeros for the baseline).
+            user_biases (numpy array): The B user biases.
+            excludes (list of numpy array): For each user, the catalog rows never to recommend.
+            number_of_recommendations (int): The number of recommendations per user.
+
+        Returns:
+            tuple of (numpy array, numpy array): B x N int32 catalog positions and float32 predicted
+            ratings, highest first. Rows with fewer recommendations are padded with position -1.
+        """
+        user_factors = np.asarray(user_factors, dtype=np.float32)
+        scores = user_factors @ self.item_factors.T
+        scores += self.item_biases
+        scores += (self.global_mean + np.asarray(user_biases, dtype=np.float32))[:, None]
+        np.clip(scores, *self.rating_scale, out=scores)
+        scores[:, ~self.known_items] = -np.inf
+        for row, exclude in enumerate(excludes):
+            scores[row, exclude] = -np.inf
+
+        count = min(max(number_of_recommendations, 0), scores.shape[1])
+        if count == 0:
+            empty = np.empty((len(scores), 0))
+            return empty.astype(np.int32), empty.astype(np.float32)
+        candidates = np.argpartition(-scores, count - 1, axis=1)[:, :count]
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        # Highest score first, lower position first on ties.
+        order = np.lexsort((candidates, -candidate_scores), axis=-1)
+        candidates = np.take_along_axis(candidates, order, axis=1).astype(np.int32)
+        candidate_scores = np.take_along_axis(candidate_scores, order, axis=1).astype(np.float32)
+        candidates[~np.isfinite(candidate_scores)] = -1
+        return candidates, candidate_scores
+
+    def recommend_for_user(self, user_id, exclude=(), number_of_recommendations=12):
+        """
+        Recommend movies for an app user with their folded-in factors, falling back to the baseline
+        for users not folded in yet.
+
+        Parameters:
+            user_id (str or int): The app user's ID.
+            exclude (iterable of int): Catalog rows never to recommend, e.g. the movies the user already rated.
+            number_of_recommendations (int): The number of recommendations to return.
+
+        Returns:
+            list of Recommendation: The recommended movies, from highest to lowest predicted rating.
+        """
+        user = self.get_user(user_id)
+        user_factors, user_bias = user if user is not None else (None, 0.0)
+        return self.recommend(user_factors, user_bias, exclude, number_of_recommendations)
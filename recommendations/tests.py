@@ -1,8 +1,44 @@
+import difflib
+import io
 import json
-from django.test import TestCase, Client
+import os
+import pickle
+import tempfile
+import threading
+import unittest
+from datetime import timedelta
+from unittest import mock
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, Client, override_settings
+from django.utils import timezone
 from django.urls import reverse
 from django.contrib.auth.models import User
 from recommendations.models import Rating
+from recommendations.cosine_recommender import CosineRecommender
+from recommendations import neighbor_index
+from recommendations.neighbor_index import NeighborIndex
+from recommendations.ann_index import ANNIndex, normalize_rows
+from recommendations.artifacts import save_array
+from recommendations.title_index import TitleIndex, normalize_title
+from recommendations.autocomplete_index import AutocompleteIndex
+from recommendations.movie_catalog import MovieCatalog
+from recommendations.movie import Movie
+from recommendations.provider import RecommenderProvider, get_recommender
+from recommendations.movie_display import CardCache, MovieDisplay
+from recommendations.svd_recommender import SVDRecommender
+from recommendations.fold_in import FoldInWorker, rating_version
+from recommendations.hybrid_recommender import HybridRecommender
+from recommendations.benchmarks import BenchmarkCase, compare
+from recommendations.user_recommendations import UserRecommendationTable
+from recommendations.result_cache import LRUCache, RecommendationCache, recommendation_cache
+from recommendations.timing import StageHistograms, stage, stage_histograms
+from recommendations.features import (
+    FeaturePipeline, StageCache, check_nltk_data, fix_jr, read_tags, save_transformers,
+)
 
 
 # INDEX VIEW TESTS
@@ -89,6 +125,143 @@ class RecommendationViewTest(TestCase):
         self.assertContains(response, "Recommendations for")
 
 
+class SeedRecommendationViewTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+
+    def post(self, payload):
+        return self.client.post(reverse('seed_recommendations_view'), json.dumps(payload), content_type='application/json')
+
+    def test_single_query(self):
+        """A single query returns one result without its seeds."""
+        response = self.post({'liked': ['12345', '100001'], 'num_recs': 5})
+        self.assertEqual(response.status_code, 200)
+        [result] = response.json()['results']
+        self.assertEqual(len(result['recommendations']), 5)
+        self.assertTrue({'12345', '100001'}.isdisjoint(r['imdb_id'] for r in result['recommendations']))
+        self.assertEqual(result['unknown_ids'], [])
+
+    def test_batch_of_queries(self):
+        """Many queries are answered in order, reporting unknown IDs."""
+        response = self.post({'queries': [
+            {'liked': ['12345'], 'num_recs': 3},
+            {'liked': ['missing'], 'disliked': ['100001']},
+        ]})
+        first, second = response.json()['results']
+        self.assertEqual(len(first['recommendations']), 3)
+        self.assertEqual(second, {'recommendations': [], 'unknown_ids': ['missing']})
+
+    def test_malformed_body(self):
+        """Malformed bodies are rejected with 400, and GET is not allowed."""
+        self.assertEqual(self.post({'liked': 'tt1'}).status_code, 400)
+        self.assertEqual(self.post([1, 2]).status_code, 400)
+        self.assertEqual(self.post({'queries': [{'liked': []}] * 101}).status_code, 400)
+        too_many = self.post({'liked': ['12345'] * 30, 'disliked': ['100001'] * 21})
+        self.assertEqual(too_many.status_code, 400)
+        self.assertIn('At most 50', too_many.json()['error'])
+        self.assertEqual(self.client.get(reverse('seed_recommendations_view')).status_code, 405)
+
+    def test_out_of_range_numbers(self):
+        """Infinite counts and non-finite or negative dislike weights are rejected with 400."""
+        for body in ['{"liked": ["12345"], "num_recs": 1e400}',
+                     '{"liked": ["12345"], "disliked": ["100001"], "disliked_weight": NaN}',
+                     '{"liked": ["12345"], "disliked": ["100001"], "disliked_weight": Infinity}',
+                     '{"liked": ["12345"], "disliked": ["100001"], "disliked_weight": -1}']:
+            response = self.client.post(reverse('seed_recommendations_view'), body, content_type='application/json')
+            self.assertEqual(response.status_code, 400, body)
+
+
+class AsyncAPIViewTest(TestCase):
+    async def test_recommendations(self):
+        """The async recommendation endpoint matches the title and returns JSON recommendations."""
+        response = await self.async_client.get(
+            reverse('recommendation_api_view'), {'movie_input': 'Frozen', 'num_recs': 5}
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['title'], 'Frozen')
+        self.assertEqual(len(data['recommendations']), 5)
+        missing = await self.async_client.get(reverse('recommendation_api_view'))
+        self.assertEqual(missing.status_code, 400)
+
+    async def test_movie_detail_with_user_rating(self):
+        """The async detail endpoint awaits the logged-in user's rating."""
+        user = await User.objects.acreate(username="asyncuser")
+        await Rating.objects.acreate(user=user, movie_id='12345', rating=8)
+        await self.async_client.aforce_login(user)
+        response = await self.async_client.get(reverse('movie_detail_api_view', args=['12345']))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['title'], 'Frozen')
+        self.assertEqual(data['user_rating'], 8)
+        missing = await self.async_client.get(reverse('movie_detail_api_view', args=['missing']))
+        self.assertEqual(missing.status_code, 404)
+
+    async def test_autocomplete(self):
+        """The async autocomplete endpoint returns the same suggestions as the sync one."""
+        response = await self.async_client.get(reverse('autocomplete_api_view'), {'term': 'fro'})
+        expected = await self.async_client.get(reverse('autocomplete_view'), {'term': 'fro'})
+        self.assertEqual(response.json(), expected.json())
+        self.assertTrue(response.json())
+
+
+@override_settings(STAGE_TIMING={'ENABLED': True})
+class StageTimingTest(TestCase):
+    def setUp(self):
+        stage_histograms.clear()
+        self.addCleanup(stage_histograms.clear)
+        # A cached result would skip the similarity stages.
+        recommendation_cache.local.clear()
+
+    def test_server_timing_and_metrics(self):
+        """Stage durations are sent as a Server-Timing header and aggregated into the metrics."""
+        response = self.client.get(reverse('recommendation_view'), {'movie_input': 'Frozen'})
+        stages = [part.split(';')[0] for part in response['Server-Timing'].split(', ')]
+        self.assertEqual(stages, ['fuzzy_match', 'similarity', 'lookup', 'cards', 'render', 'total'])
+
+        metrics = self.client.get(reverse('metrics_view'))
+        self.assertEqual(metrics.status_code, 200)
+        self.assertTrue(metrics['Content-Type'].startswith('text/plain; version=0.0.4'))
+        text = metrics.content.decode()
+        self.assertIn('# TYPE recommender_stage_duration_seconds histogram', text)
+        self.assertIn(
+            'recommender_stage_duration_seconds_count{view="recommendation_view",stage="fuzzy_match"} 1', text
+        )
+        self.assertIn(
+            'recommender_stage_duration_seconds_bucket{view="recommendation_view",stage="total",le="+Inf"} 1', text
+        )
+
+    async def test_async_view_stages(self):
+        """Stages run on the CPU pool are timed as part of their request."""
+        response = await self.async_client.get(reverse('recommendation_api_view'), {'movie_input': 'Frozen'})
+        self.assertIn('fuzzy_match;dur=', response['Server-Timing'])
+        self.assertIn('similarity;dur=', response['Server-Timing'])
+
+    @override_settings(STAGE_TIMING={'ENABLED': False})
+    def test_disabled(self):
+        """Without stage timing there is no header, no metrics endpoint, and stages outside a request are no-ops."""
+        response = self.client.get(reverse('recommendation_view'), {'movie_input': 'Frozen'})
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(self.client.get(reverse('metrics_view')).status_code, 404)
+        with stage('outside'):
+            pass
+        self.assertNotIn('outside', stage_histograms.render())
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Each bucket counts the observations up to its bound; the sum and count cover them all."""
+        histograms = StageHistograms(buckets=(0.01, 0.1))
+        for seconds in [0.005, 0.05, 0.5]:
+            histograms.observe('view', {'stage': seconds})
+        lines = histograms.render('m').splitlines()
+        self.assertEqual(lines[2:], [
+            'm_bucket{view="view",stage="stage",le="0.01"} 1',
+            'm_bucket{view="view",stage="stage",le="0.1"} 2',
+            'm_bucket{view="view",stage="stage",le="+Inf"} 3',
+            'm_sum{view="view",stage="stage"} 0.555',
+            'm_count{view="view",stage="stage"} 3',
+        ])
+
+
 ###############################################################################
 #                           AUTOCOMPLETE VIEW TESTS
 ###############################################################################
@@ -303,6 +476,33 @@ class MyRatingsViewTest(TestCase):
         response = self.client.get(reverse('my_ratings_view'))
         self.assertIn(b'9', response.content)
 
+    def test_my_ratings_keyset_pages(self):
+        """Ratings are served newest first, one page at a time, without gaps or repeats."""
+        Rating.objects.filter(user=self.user).delete()
+        movie_ids = list(dict.fromkeys(get_recommender().catalog.column('imdb_id')))[:5]
+        for rating, movie_id in enumerate(movie_ids, start=1):
+            Rating.objects.create(user=self.user, movie_id=movie_id, rating=rating)
+        self.client.login(username="testuser", password="testpass")
+
+        seen = []
+        url = reverse('my_ratings_view')
+        with mock.patch('recommendations.views.RATINGS_PAGE_SIZE', 2):
+            response = self.client.get(url)
+            while True:
+                self.assertLessEqual(len(response.context['rated_movies']), 2)
+                seen.extend(movie['movie_id'] for movie in response.context['rated_movies'])
+                if not response.context['next_cursor']:
+                    break
+                response = self.client.get(url, {'before': response.context['next_cursor']})
+        self.assertEqual(seen, list(reversed(movie_ids)))
+
+    def test_my_ratings_invalid_cursor(self):
+        """An invalid cursor falls back to the first page."""
+        self.client.login(username="testuser", password="testpass")
+        response = self.client.get(reverse('my_ratings_view'), {'before': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['is_first_page'])
+
     def test_my_ratings_logout_redirect(self):
         """If we logout and try to access my_ratings, we can't get 200."""
         self.client.login(username='testuser', password='testpass')
@@ -331,3 +531,1088 @@ class UserDisplayTest(TestCase):
         self.client.login(username="testuser", password="testpass")
         response = self.client.get(reverse('index_view'))
         self.assertContains(response, "Welcome, testuser!")
+
+
+###############################################################################
+#                         COSINE RECOMMENDER TESTS
+###############################################################################
+def build_test_recommender(directory):
+    """Writes a tiny catalog and similarity matrix to `directory` and loads a CosineRecommender from them."""
+    movies = pd.DataFrame({
+        'imdb_id': [1, 2, 3, 4, 5],
+        'title': ['Alpha', 'Beta', 'Gamma', 'Alpha', 'Delta'],
+        'popularity': [5.0, 50.0, 20.0, 1.0, 10.0],
+    })
+    similarity = np.array([
+        [1.0, 0.2, 0.9, 0.95, 0.5],
+        [0.2, 1.0, 0.3, 0.1, 0.3],
+        [0.9, 0.3, 1.0, 0.4, 0.6],
+        [0.95, 0.1, 0.4, 1.0, 0.2],
+        [0.5, 0.3, 0.6, 0.2, 1.0],
+    ])
+    movies_path = os.path.join(directory, 'movies.pkl')
+    similarity_path = os.path.join(directory, 'similarity')
+    movies.to_pickle(movies_path)
+    with open(similarity_path, 'wb') as f:
+        pickle.dump(similarity, f)
+    return CosineRecommender(movies_path, similarity_path)
+
+
+class CosineRecommenderTest(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.recommender = build_test_recommender(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_top_similar_excludes_same_title(self):
+        """The seed and movies sharing its title are never recommended."""
+        positions, scores = self.recommender.get_top_similar(0, 3)
+        self.assertEqual(positions.tolist(), [2, 4, 1])
+        self.assertEqual(scores.tolist(), [0.9, 0.5, 0.2])
+
+    def test_top_similar_ties_keep_row_order(self):
+        """Equal scores are returned in row order, like a stable sort."""
+        positions, _ = self.recommender.get_top_similar(1, 2)
+        self.assertEqual(positions.tolist(), [2, 4])
+
+    def test_recommendations_by_id(self):
+        """Recommendations by id return titles in similarity order."""
+        self.assertEqual(self.recommender.get_recommendations_by_id(' 3 ', 2), ['Alpha', 'Delta'])
+        self.assertEqual(self.recommender.get_recommendations_by_id('missing'), [])
+
+    def test_position_lookups(self):
+        """IMDb IDs and titles resolve to row positions through the hash indexes."""
+        self.assertEqual(self.recommender.get_position(' 4 '), 3)
+        self.assertIsNone(self.recommender.get_position('missing'))
+        self.assertEqual(self.recommender.get_positions_by_title('Alpha'), [0, 3])
+        self.assertEqual(self.recommender.get_positions_by_title('Omega'), [])
+
+    def test_recommendations_by_name(self):
+        """Recommendations by name match the closest title."""
+        self.assertEqual(self.recommender.get_recommendations('Gama', 2), ['Alpha', 'Delta'])
+
+    def test_structured_results(self):
+        """Structured results carry the row position, IMDb ID, title and score."""
+        results = self.recommender.recommend_by_id('3', 2)
+        self.assertEqual([result.position for result in results], [0, 4])
+        self.assertEqual([result.imdb_id for result in results], ['1', '5'])
+        self.assertEqual([result.score for result in results], [0.9, 0.6])
+        self.assertEqual(pickle.loads(pickle.dumps(results)), results)
+        self.assertEqual(self.recommender.recommend('Gama', 2), results)
+
+    def test_recommend_for_seeds(self):
+        """Seeds are combined by mean similarity, disliked movies count against, and seeds are excluded."""
+        results = self.recommender.recommend_for_seeds([1, 4], number_of_recommendations=5)
+        self.assertEqual([result.position for result in results], [2, 0, 3])
+        np.testing.assert_allclose([result.score for result in results], [0.45, 0.35, 0.15])
+        results = self.recommender.recommend_for_seeds([1, 4], [2], number_of_recommendations=5)
+        self.assertEqual([result.position for result in results], [3, 0])
+        np.testing.assert_allclose([result.score for result in results], [-0.25, -0.55])
+        # Movies sharing a seed's title are excluded too.
+        results = self.recommender.recommend_for_seeds([0], number_of_recommendations=5)
+        self.assertEqual([result.position for result in results], [2, 4, 1])
+        self.assertEqual(self.recommender.recommend_for_seeds([], [2]), [])
+
+    def test_popular_cards(self):
+        """The most popular movies and their cards are prepared once, most popular first."""
+        self.assertEqual(self.recommender.popular_positions.tolist(), [1, 2, 4, 0, 3])
+        self.assertEqual(len(self.recommender.popular_cards), 5)
+        self.assertIn('/recommendations/movie/2/', self.recommender.popular_cards[0])
+
+
+class NeighborIndexTest(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dense = build_test_recommender(self.tmp_dir.name)
+        self.neighbors_path = os.path.join(self.tmp_dir.name, 'neighbors')
+        NeighborIndex.build(self.dense.similarity, k=3, block_size=2).save(self.neighbors_path)
+        self.recommender = CosineRecommender(
+            os.path.join(self.tmp_dir.name, 'movies.pkl'), neighbors_path=self.neighbors_path
+        )
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_build_excludes_self(self):
+        """Each row holds K neighbors, never the movie itself."""
+        index = NeighborIndex.load(self.neighbors_path)
+        self.assertIsInstance(index.positions, np.memmap)
+        self.assertEqual(index.positions.shape, (5, 3))
+        self.assertEqual(index.positions.dtype, np.int32)
+        for row, positions in enumerate(index.positions):
+            self.assertNotIn(row, positions)
+
+    def test_matches_dense_recommendations(self):
+        """The neighbor index gives the same results as the dense matrix within K."""
+        self.assertIsNone(self.recommender.similarity)
+        for movie_id in ['1', '2', '3', '5']:
+            self.assertEqual(
+                self.recommender.get_recommendations_by_id(movie_id, 2),
+                self.dense.get_recommendations_by_id(movie_id, 2),
+            )
+
+    def test_recommend_for_seeds(self):
+        """Seeds combine their stored neighbor lists; only neighbors of liked movies are candidates."""
+        results = self.recommender.recommend_for_seeds([1, 4], number_of_recommendations=5)
+        self.assertEqual([result.position for result in results], [2, 0])
+        np.testing.assert_allclose([result.score for result in results], [0.45, 0.35])
+
+    def test_similarity_between(self):
+        """Only stored neighbors have a similarity with a neighbor index; others count as 0."""
+        similarities = self.recommender.similarity_between([1, 4], [3, 0, 2])
+        np.testing.assert_allclose(similarities, [[0.0, 0.2, 0.3], [0.0, 0.5, 0.6]])
+        np.testing.assert_allclose(self.dense.similarity_between([1], [3, 0]), [[0.1, 0.2]])
+
+    def test_requires_an_artifact(self):
+        """A recommender without any similarity artifact is rejected."""
+        with self.assertRaises(ValueError):
+            CosineRecommender(os.path.join(self.tmp_dir.name, 'movies.pkl'))
+
+    def test_memory_mapped_similarity(self):
+        """A .npy similarity matrix is memory-mapped and gives the same results as the pickle."""
+        npy_path = os.path.join(self.tmp_dir.name, 'similarity.npy')
+        save_array(npy_path, self.dense.similarity)
+        mapped = CosineRecommender(os.path.join(self.tmp_dir.name, 'movies.pkl'), npy_path)
+        self.assertIsInstance(mapped.similarity, np.memmap)
+        self.assertEqual(mapped.get_recommendations_by_id('2', 3), self.dense.get_recommendations_by_id('2', 3))
+
+
+class BlockedNeighborBuildTest(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(0)
+        text = sp.random(60, 40, density=0.1, format='csr', random_state=0)
+        numeric = sp.csr_matrix(rng.random((60, 2)))
+        self.features = sp.hstack([text, numeric]).tocsr()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_matches_dense_build(self):
+        """Building from the features in blocks and in parallel matches the dense similarity build."""
+        normalized = normalize_rows(self.features)
+        dense = NeighborIndex.build((normalized @ normalized.T).toarray(), k=5)
+        for workers in [1, 2]:
+            path = os.path.join(self.tmp_dir.name, f'neighbors_{workers}')
+            index = NeighborIndex.build_from_features(self.features, path, k=5, block_size=7, workers=workers)
+            self.assertIsInstance(index.positions, np.memmap)
+            self.assertEqual(index.positions.tolist(), dense.positions.tolist())
+            np.testing.assert_allclose(index.scores, dense.scores, atol=1e-6)
+            self.assertEqual(sorted(os.listdir(path)), ['positions.npy', 'scores.npy'])
+        self.assertIsNone(neighbor_index._sparse_features)
+        self.assertIsNone(neighbor_index._dense_features)
+
+    def test_extend_matches_full_build(self):
+        """Appending movies to an index gives the same lists as building it over every movie."""
+        path = os.path.join(self.tmp_dir.name, 'neighbors')
+        index = NeighborIndex.build_from_features(self.features[:50], path, k=5)
+        extended = index.extend(self.features, block_size=4)
+        self.assertIsNone(neighbor_index._sparse_features)
+        full = NeighborIndex.build_from_features(self.features, os.path.join(self.tmp_dir.name, 'full'), k=5)
+        self.assertEqual(extended.positions.tolist(), full.positions.tolist())
+        np.testing.assert_allclose(extended.scores, full.scores, atol=1e-6)
+
+
+    def test_ties_at_the_cutoff_keep_lower_positions(self):
+        """With many tied scores, the lists match a stable full sort, and extending matches a full build."""
+        rng = np.random.default_rng(0)
+        similarity = rng.integers(0, 3, size=(300, 300)).astype(np.float64)
+        index = NeighborIndex.build(similarity, k=20)
+        for movie in [0, 150, 299]:
+            scores = similarity[movie].copy()
+            scores[movie] = -np.inf
+            self.assertEqual(index.positions[movie].tolist(), np.lexsort((np.arange(300), -scores))[:20].tolist())
+
+        # Movies with the same features tie with each other everywhere.
+        features = sp.csr_matrix(rng.integers(0, 2, size=(6, 8)).astype(np.float64))[rng.integers(0, 6, size=300)]
+        path = os.path.join(self.tmp_dir.name, 'neighbors')
+        extended = NeighborIndex.build_from_features(features[:250], path, k=20).extend(features, block_size=16)
+        full = NeighborIndex.build_from_features(features, os.path.join(self.tmp_dir.name, 'full'), k=20)
+        self.assertEqual(extended.positions.tolist(), full.positions.tolist())
+
+
+class TitleIndexTest(TestCase):
+    def setUp(self):
+        self.index = TitleIndex(['The Matrix', 'Frozen', 'Frozen II', 'Inception ', 'Toy Story'])
+
+    def test_normalize_title(self):
+        """Normalization ignores case, punctuation and extra whitespace."""
+        self.assertEqual(normalize_title('  Spider-Man:  Homecoming '), 'spider man homecoming')
+
+    def test_exact_match(self):
+        """An exact (normalized) title returns its own row position."""
+        self.assertEqual(self.index.match('frozen'), ('Frozen', 1))
+
+    def test_fuzzy_match(self):
+        """Misspelled titles still find the closest movie."""
+        self.assertEqual(self.index.match('Incepton'), ('Inception ', 3))
+        self.assertEqual(self.index.match('the matrx'), ('The Matrix', 0))
+
+    def test_ties_resolve_like_get_close_matches(self):
+        """Equally close titles resolve to the largest title, as difflib does, then to the lowest row."""
+        titles = ['Dream 673', 'Dream 678', 'Dream 671', 'Dream 678']
+        index = TitleIndex(titles)
+        self.assertEqual(index.match('Dream 67'), ('Dream 678', 1))
+        self.assertEqual(difflib.get_close_matches('Dream 67', titles, n=1), ['Dream 678'])
+
+    def test_no_match(self):
+        """Unrelated or empty queries return None."""
+        self.assertIsNone(self.index.match('zzzzqqq'))
+        self.assertIsNone(self.index.match('   '))
+
+
+class AutocompleteIndexTest(TestCase):
+    def setUp(self):
+        movies = pd.DataFrame({
+            'imdb_id': ['1', '2', '3', '4'],
+            'title': ['The Dark Knight', 'Dark Waters', 'Darkman', 'Frozen'],
+            'popularity': [90.0, 10.0, 40.0, 70.0],
+            'release_date': [pd.Timestamp('2008-07-18'), '2019-11-22', None, pd.Timestamp('2013-11-27')],
+            'poster_path': ['/dk.jpg', None, '/dm.jpg', '/fr.jpg'],
+        })
+        self.index = AutocompleteIndex(MovieCatalog.from_dataframe(movies), limit=2)
+
+    def test_ranked_by_popularity(self):
+        """Matches are ordered by popularity and limited."""
+        self.assertEqual([s['value'] for s in self.index.suggest('dark')], ['1', '3'])
+
+    def test_matches_any_word_prefix(self):
+        """Any title word can start the match, across several words."""
+        self.assertEqual([s['value'] for s in self.index.suggest('Dark Kni')], ['1'])
+        self.assertEqual([s['value'] for s in self.index.suggest('wat')], ['2'])
+
+    def test_entry_fields(self):
+        """Entries carry the label with year, imdb_id and poster URL."""
+        self.assertEqual(self.index.suggest('frozen'), [{
+            'label': 'Frozen (2013)',
+            'value': '4',
+            'poster_url': 'https://image.tmdb.org/t/p/w500/fr.jpg',
+        }])
+        self.assertEqual(self.index.suggest('waters')[0]['poster_url'], '/static/images/default.jpg')
+
+    def test_no_match(self):
+        """Unknown prefixes return no suggestions."""
+        self.assertEqual(self.index.suggest('zz'), [])
+        self.assertEqual(self.index.suggest('xyz'), [])
+
+
+class MovieCatalogTest(TestCase):
+    def setUp(self):
+        self.catalog = MovieCatalog.from_dataframe(pd.DataFrame({
+            'imdb_id': [111, 222],
+            'title': ['Frozen', 'Heat'],
+            'overview': ['An ice queen.', 'A heist.'],
+            'release_date': [pd.Timestamp('2013-11-27'), pd.NaT],
+            'poster_path': ['/fr.jpg', None],
+            'imdb_rating': [7.4, 8.3],
+            'genres': ['Animation, Family', 'Crime'],
+            'director': ['Chris Buck', 'Michael Mann'],
+            'spoken_languages': [['English'], ['English', 'Spanish']],
+            'budget': [150, 60],
+        }))
+
+    def test_drops_unused_columns(self):
+        """Columns the app never reads are not kept."""
+        self.assertEqual(len(self.catalog), 2)
+        self.assertNotIn('budget', self.catalog)
+        self.assertEqual(self.catalog.value('budget', 0), 'N/A')
+
+    def test_column_types(self):
+        """Numeric fields are float arrays and repetitive strings are categorical."""
+        self.assertEqual(self.catalog.column('imdb_rating').dtype, np.float64)
+        self.assertEqual(self.catalog.value('director', 1), 'Michael Mann')
+        self.assertEqual(self.catalog.value('spoken_languages', 1), 'English, Spanish')
+        self.assertEqual(self.catalog.value('imdb_id', 0), '111')
+
+    def test_movie_record(self):
+        """Movie records are built on demand with poster URL and release date."""
+        movie = self.catalog.movie(0)
+        self.assertIsInstance(movie, Movie)
+        self.assertEqual(movie.poster_url, 'https://image.tmdb.org/t/p/w500/fr.jpg')
+        self.assertEqual(movie.release_date, pd.Timestamp('2013-11-27'))
+        missing = self.catalog.movie(1)
+        self.assertEqual(missing.poster_url, '/static/images/default.jpg')
+        self.assertEqual(missing.release_date, 'N/A')
+        with self.assertRaises(AttributeError):
+            movie.extra = 'no __dict__'
+
+
+class RecommenderProviderTest(TestCase):
+    def test_loads_once_across_threads(self):
+        """Concurrent callers share a single load."""
+        calls = []
+        provider = RecommenderProvider(lambda: calls.append(1) or object())
+        threads = [threading.Thread(target=provider.get) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(provider.is_ready())
+        self.assertIsNotNone(provider.status()['load_seconds'])
+
+    def test_warm_up_in_background(self):
+        """warm_up loads the recommender in a background thread."""
+        provider = RecommenderProvider(object)
+        self.assertEqual(provider.status()['status'], 'not_loaded')
+        provider.warm_up().join()
+        self.assertEqual(provider.status()['status'], 'ready')
+
+    def test_failed_load_is_reported_and_retried(self):
+        """A failed load is reported, and the next call tries again."""
+        attempts = []
+
+        def factory():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise FileNotFoundError('cosine_matrix')
+            return object()
+
+        provider = RecommenderProvider(factory)
+        provider.warm_up().join()
+        self.assertEqual(provider.status()['status'], 'failed')
+        self.assertIn('cosine_matrix', provider.status()['error'])
+        provider.get()
+        self.assertTrue(provider.is_ready())
+
+    def test_reload_swaps_recommender(self):
+        """reload replaces the recommender and keeps serving the old one if it fails."""
+        versions = iter(['v1', 'v2'])
+
+        def factory():
+            version = next(versions, None)
+            if version is None:
+                raise FileNotFoundError('cosine_matrix')
+            return version
+
+        provider = RecommenderProvider(factory)
+        self.assertEqual(provider.get(), 'v1')
+        self.assertEqual(provider.reload(), 'v2')
+        with self.assertRaises(FileNotFoundError):
+            provider.reload()
+        self.assertEqual(provider.get(), 'v2')
+        self.assertTrue(provider.is_ready())
+
+
+    def test_follows_source_file(self):
+        """Without its source file nothing is loaded; a rewritten source file is loaded again."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            source_path = os.path.join(tmp_dir, 'meta.json')
+            factory = mock.Mock(side_effect=['v1', 'v2'])
+            provider = RecommenderProvider(factory, source_path=source_path)
+            with self.assertRaises(FileNotFoundError), self.assertNoLogs('recommendations.provider'):
+                provider.get()
+            factory.assert_not_called()
+
+            with open(source_path, 'w') as f:
+                f.write('{}')
+            self.assertEqual(provider.get(), 'v1')
+            self.assertEqual(provider.get(), 'v1')
+            os.utime(source_path, ns=(0, os.stat(source_path).st_mtime_ns + 1))
+            self.assertEqual(provider.get(), 'v2')
+            self.assertEqual(factory.call_count, 2)
+
+
+class HealthViewTest(TestCase):
+    def test_not_ready_returns_503(self):
+        """Before the recommender is loaded, the endpoint reports 503."""
+        with mock.patch('recommendations.views.recommender_provider', RecommenderProvider(object)):
+            response = self.client.get(reverse('health_view'))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['status'], 'not_loaded')
+
+    def test_ready_returns_200(self):
+        """Once loaded, the endpoint reports 200 with the load duration."""
+        provider = RecommenderProvider(object)
+        provider.get()
+        with mock.patch('recommendations.views.recommender_provider', provider):
+            response = self.client.get(reverse('health_view'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'ready')
+
+
+class LRUCacheTest(TestCase):
+    def test_evicts_least_recently_used(self):
+        """The least recently used entry is evicted when full."""
+        cache = LRUCache(max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(len(cache), 2)
+
+    def test_entries_expire(self):
+        """Entries older than the TTL are not returned."""
+        cache = LRUCache(ttl=60)
+        cache.set('a', 1)
+        with mock.patch('recommendations.result_cache.time.monotonic', return_value=float('inf')):
+            self.assertIsNone(cache.get('a'))
+
+
+class RecommendationCacheTest(TestCase):
+    def test_hits_and_misses(self):
+        """A repeated request is served from the cache and counted."""
+        cache = RecommendationCache()
+        computed = []
+        compute = lambda: computed.append(1) or ['Beta']
+        self.assertEqual(cache.get_or_compute('v1', '2', 5, compute), ['Beta'])
+        self.assertEqual(cache.get_or_compute('v1', '2', 5, compute), ['Beta'])
+        self.assertEqual(len(computed), 1)
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_counters_are_exact_across_threads(self):
+        """Concurrent lookups each count exactly once."""
+        cache = RecommendationCache()
+        cache.get_or_compute('v1', '2', 5, lambda: ['Beta'])
+
+        def lookups():
+            for _ in range(2000):
+                cache.get_or_compute('v1', '2', 5, lambda: ['Beta'])
+
+        threads = [threading.Thread(target=lookups) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (16000, 1))
+
+    def test_new_model_version_invalidates(self):
+        """Loading a new model version drops the cached results."""
+        cache = RecommendationCache()
+        cache.get_or_compute('v1', '2', 5, lambda: ['Old'])
+        self.assertEqual(cache.get_or_compute('v2', '2', 5, lambda: ['New']), ['New'])
+        self.assertEqual(cache.stats()['entries'], 1)
+
+    def test_backend_tier(self):
+        """Results are shared through the Django cache backend."""
+        first = RecommendationCache(backend_alias='default')
+        first.get_or_compute('v1', '2', 5, lambda: ['Beta'])
+        second = RecommendationCache(backend_alias='default')
+        self.assertEqual(second.get_or_compute('v1', '2', 5, lambda: ['Other']), ['Beta'])
+        self.assertEqual(second.stats()['backend_hits'], 1)
+
+
+class CardCacheTest(TestCase):
+    def setUp(self):
+        self.catalog = MovieCatalog.from_dataframe(pd.DataFrame({
+            'imdb_id': ['tt1', 'tt2'],
+            'title': ['Tom & Jerry', 'Heat'],
+            'overview': ['<b>Cat</b> and mouse.', 'A heist.'],
+            'release_date': [pd.Timestamp('1940-02-10'), pd.NaT],
+            'imdb_rating': [7.9, 8.3],
+        }))
+        self.cache = CardCache()
+
+    def test_cards_are_escaped(self):
+        """Titles and overviews are HTML-escaped when the card is rendered."""
+        html = self.cache.render_html('v1', self.catalog, [0])
+        self.assertIn('Tom &amp; Jerry', html)
+        self.assertIn('&lt;b&gt;Cat&lt;/b&gt;', html)
+        self.assertIn('Released: 1940-02-10', html)
+
+    def test_cards_are_cached_per_version(self):
+        """Cards are rendered once per model version and joined in display order."""
+        with mock.patch.object(MovieDisplay, 'render_card', wraps=MovieDisplay.render_card) as render_card:
+            html = self.cache.render_html('v1', self.catalog, [1, 0])
+            self.assertEqual(render_card.call_count, 2)
+            self.assertEqual(len(list(self.cache.iter_cards('v1', self.catalog, [0, 1]))), 2)
+            self.assertEqual(render_card.call_count, 2)
+            self.cache.render_html('v2', self.catalog, [0])
+            self.assertEqual(render_card.call_count, 3)
+        self.assertLess(html.index('Heat'), html.index('Tom &amp; Jerry'))
+
+
+def write_test_svd_model(directory):
+    """Writes SVD arrays for two users and four of the five test movies (imdb_id 5 is unknown to the model)."""
+    model_path = os.path.join(directory, 'svd')
+    os.makedirs(model_path)
+    rng = np.random.default_rng(0)
+    np.save(os.path.join(model_path, 'item_ids.npy'), np.array(['4', '1', '2', '3', '999']))
+    np.save(os.path.join(model_path, 'item_factors.npy'), rng.normal(size=(5, 3)).astype(np.float32))
+    np.save(os.path.join(model_path, 'item_biases.npy'), rng.normal(scale=0.3, size=5).astype(np.float32))
+    np.save(os.path.join(model_path, 'user_ids.npy'), np.array(['7', '8']))
+    np.save(os.path.join(model_path, 'user_factors.npy'), rng.normal(size=(2, 3)).astype(np.float32))
+    np.save(os.path.join(model_path, 'user_biases.npy'), np.array([0.2, -0.1], dtype=np.float32))
+    with open(os.path.join(model_path, 'meta.json'), 'w') as f:
+        json.dump({'global_mean': 3.5, 'rating_scale': [0.5, 5.0]}, f)
+    return model_path
+
+
+class SVDRecommenderTest(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cosine = build_test_recommender(self.tmp_dir.name)
+        self.recommender = SVDRecommender(write_test_svd_model(self.tmp_dir.name), self.cosine)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_matches_per_movie_predictions(self):
+        """Scores equal the SVD prediction of each movie, computed one at a time."""
+        user_factors, user_bias = self.recommender.get_exported_user(7)
+        model_path = os.path.join(self.tmp_dir.name, 'svd')
+        item_ids = np.load(os.path.join(model_path, 'item_ids.npy')).tolist()
+        item_factors = np.load(os.path.join(model_path, 'item_factors.npy'))
+        item_biases = np.load(os.path.join(model_path, 'item_biases.npy'))
+        expected = {}
+        for row, imdb_id in enumerate(item_ids[:4]):
+            prediction = 3.5 + user_bias + item_biases[row] + item_factors[row] @ user_factors
+            expected[self.cosine.get_position(imdb_id)] = min(max(prediction, 0.5), 5.0)
+
+        results = self.recommender.recommend(user_factors, user_bias, number_of_recommendations=10)
+        self.assertEqual(len(results), 4)
+        for result in results:
+            self.assertAlmostEqual(result.score, expected[result.position], places=5)
+        self.assertEqual([result.position for result in results], sorted(expected, key=lambda p: -expected[p]))
+
+    def test_excludes_rated_and_unknown_movies(self):
+        """Rated movies and movies unknown to the model are never recommended."""
+        results = self.recommender.recommend_for_user('7', exclude=[0, 2], number_of_recommendations=10)
+        self.assertEqual(sorted(result.position for result in results), [1, 3])
+
+    def test_unknown_user_gets_baseline(self):
+        """Users unknown to the model are ranked by the item biases."""
+        results = self.recommender.recommend_for_user('missing', number_of_recommendations=4)
+        biases = self.recommender.item_biases
+        self.assertEqual([result.position for result in results], [int(p) for p in np.argsort(-biases[:4])])
+
+
+    def test_fold_in_recovers_user(self):
+        """Folding in ratings generated by a user's factors recovers those factors."""
+        self.recommender.regularization = 0.0
+        user_factors, user_bias = self.recommender.get_exported_user('7')
+        positions = [0, 1, 2, 3]
+        ratings = (3.5 + user_bias + self.recommender.item_biases[positions]
+                   + self.recommender.item_factors[positions] @ user_factors)
+        folded_factors, folded_bias = self.recommender.fold_in(positions, ratings)
+        np.testing.assert_allclose(folded_factors, user_factors, atol=1e-3)
+        self.assertAlmostEqual(folded_bias, user_bias, places=3)
+        self.assertIsNone(self.recommender.fold_in([4], [3.0]))
+
+    def test_published_user_takes_precedence(self):
+        """App users get their folded-in factors, and the baseline (never an exported user's factors) otherwise."""
+        baseline = self.recommender.recommend(None, 0.0, number_of_recommendations=4)
+        exported = self.recommender.recommend(*self.recommender.get_exported_user('7'), number_of_recommendations=4)
+        self.assertNotEqual(baseline, exported)
+        self.assertIsNone(self.recommender.get_user(7))
+        self.assertEqual(self.recommender.recommend_for_user(7, number_of_recommendations=4), baseline)
+
+        other = self.recommender.get_exported_user('8')
+        self.recommender.publish_user(7, other)
+        self.assertTrue(self.recommender.has_folded_user('7'))
+        self.assertEqual(
+            self.recommender.recommend_for_user('7', number_of_recommendations=4),
+            self.recommender.recommend(*other, number_of_recommendations=4),
+        )
+        self.recommender.publish_user(7, None)
+        self.assertEqual(self.recommender.recommend_for_user('7', number_of_recommendations=4), baseline)
+
+    def test_folded_users_are_bounded(self):
+        """Only the most recently used folded-in users are kept; evicted users are folded in again."""
+        recommender = SVDRecommender(os.path.join(self.tmp_dir.name, 'svd'), self.cosine, max_folded_users=2)
+        user = self.recommender.get_exported_user('8')
+        for user_id in [1, 2, 3]:
+            recommender.publish_user(user_id, user, rating_version=(1, user_id))
+        self.assertFalse(recommender.has_folded_user(1))
+        self.assertFalse(recommender.is_user_current(1, (1, 1)))
+        self.assertTrue(recommender.is_user_current(2, (1, 2)))
+        recommender.publish_user(4, user, rating_version=(1, 4))
+        self.assertTrue(recommender.has_folded_user(2))
+        self.assertFalse(recommender.has_folded_user(3))
+
+    def test_refresh_user_folds_in_saved_ratings(self):
+        """The fold-in worker reads the user's ratings and publishes their factors."""
+        user = User.objects.create_user(username="rater", password="testpass")
+        Rating.objects.create(user=user, movie_id='1', rating=9)
+        Rating.objects.create(user=user, movie_id='3', rating=2)
+        with mock.patch('recommendations.fold_in.svd_provider.get', return_value=self.recommender), \
+                mock.patch('recommendations.fold_in.get_recommender', return_value=self.cosine):
+            FoldInWorker().refresh_user(user.pk)
+        self.assertTrue(self.recommender.has_folded_user(user.pk))
+
+    def test_ratings_changed_in_another_process_are_refolded(self):
+        """Factors folded in from older ratings are stale once a rating is saved or deleted elsewhere."""
+        user = User.objects.create_user(username="rater", password="testpass")
+        first = Rating.objects.create(user=user, movie_id='1', rating=9)
+
+        def current():
+            updated = Rating.objects.filter(user=user).values_list('updated_at', flat=True)
+            return self.recommender.is_user_current(user.pk, rating_version(list(updated)))
+
+        self.assertFalse(current())
+        with mock.patch('recommendations.fold_in.svd_provider.get', return_value=self.recommender), \
+                mock.patch('recommendations.fold_in.get_recommender', return_value=self.cosine):
+            FoldInWorker().refresh_user(user.pk)
+            self.assertTrue(current())
+            Rating.objects.filter(pk=first.pk).update(updated_at=first.updated_at + timedelta(seconds=1))
+            self.assertFalse(current())
+            FoldInWorker().refresh_user(user.pk)
+            Rating.objects.create(user=user, movie_id='3', rating=2)
+            Rating.objects.filter(pk=first.pk).delete()
+            self.assertFalse(current())
+            FoldInWorker().refresh_user(user.pk)
+            self.assertTrue(current())
+
+        with mock.patch('recommendations.views.get_svd_recommender', return_value=self.recommender), \
+                mock.patch('recommendations.views.get_user_recommendations', side_effect=FileNotFoundError), \
+                mock.patch('recommendations.views.fold_in_worker.schedule') as schedule:
+            self.client.force_login(user)
+            self.client.get(reverse('personal_recommendation_view'))
+            schedule.assert_not_called()
+            Rating.objects.filter(user=user).update(rating=4, updated_at=timezone.now() + timedelta(seconds=1))
+            self.client.get(reverse('personal_recommendation_view'))
+            schedule.assert_called_once_with(user.pk)
+
+    def test_rating_save_schedules_fold_in(self):
+        """Saving a rating schedules the user's fold-in once the change is committed."""
+        user = User.objects.create_user(username="rater", password="testpass")
+        with mock.patch('recommendations.signals.fold_in_worker.schedule') as schedule:
+            with self.captureOnCommitCallbacks(execute=True):
+                Rating.objects.create(user=user, movie_id='1', rating=9)
+        schedule.assert_called_once_with(user.pk)
+
+
+    def test_recommend_many_matches_single_user(self):
+        """Scoring a block of users gives the same lists as scoring each user alone."""
+        users = [
+            self.recommender.get_exported_user('7'), self.recommender.get_exported_user('8'), (np.zeros(3, np.float32), 0.0)
+        ]
+        excludes = [np.array([0]), np.array([], dtype=np.intp), np.array([1, 2])]
+        positions, scores = self.recommender.recommend_many(
+            np.stack([factors for factors, _ in users]), np.array([bias for _, bias in users]), excludes, 4
+        )
+        for row, ((factors, bias), exclude) in enumerate(zip(users, excludes)):
+            expected = self.recommender.recommend(factors, bias, exclude, 4)
+            self.assertEqual(positions[row][:len(expected)].tolist(), [result.position for result in expected])
+            np.testing.assert_allclose(scores[row][:len(expected)], [result.score for result in expected], rtol=1e-5)
+            self.assertTrue(np.all(positions[row][len(expected):] == -1))
+
+
+class UserRecommendationTableTest(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cosine = build_test_recommender(self.tmp_dir.name)
+        self.svd = SVDRecommender(write_test_svd_model(self.tmp_dir.name), self.cosine)
+        self.output = os.path.join(self.tmp_dir.name, 'user_recommendations')
+        self.user = User.objects.create_user(username="rater", password="testpass")
+        self.other = User.objects.create_user(username="other", password="testpass")
+        Rating.objects.create(user=self.user, movie_id='1', rating=9)
+        Rating.objects.create(user=self.other, movie_id='2', rating=3)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def precompute(self, *args):
+        with mock.patch('recommendations.management.commands.precompute_user_recommendations.get_svd_recommender',
+                        return_value=self.svd), \
+                mock.patch('recommendations.management.commands.precompute_user_recommendations.get_recommender',
+                           return_value=self.cosine):
+            call_command('precompute_user_recommendations', '--output', self.output, '--top-n', '3',
+                         *args, stdout=io.StringIO())
+        return UserRecommendationTable.load(self.output)
+
+    def test_precompute_matches_online_scoring(self):
+        """Precomputed lists equal the online recommendations, with rated movies left out."""
+        table = self.precompute('--workers', '2', '--block-size', '1')
+        self.assertEqual(len(table), 2)
+        for user, rated in [(self.user, 0), (self.other, 1)]:
+            positions, _ = table.get(user.pk)
+            self.assertNotIn(rated, positions.tolist())
+            factors, bias = self.svd.fold_in([rated], self.svd.to_model_scale([user.ratings.get().rating]))
+            expected = self.svd.recommend(factors, bias, [rated], 3)
+            self.assertEqual(positions.tolist(), [result.position for result in expected])
+        self.assertIsNone(table.get(12345))
+
+    def test_model_version_follows_svd_artifacts(self):
+        """Re-exporting the SVD model changes its version, so precomputed lists are not reused."""
+        first = self.svd.model_version
+        self.assertTrue(first.startswith(self.cosine.model_version))
+        model_path = os.path.join(self.tmp_dir.name, 'svd')
+        with open(os.path.join(model_path, 'meta.json'), 'w') as f:
+            json.dump({'global_mean': 3.625, 'rating_scale': [0.5, 5.0]}, f)
+        self.assertNotEqual(SVDRecommender(model_path, self.cosine).model_version, first)
+
+    def test_incremental_run_only_recomputes_changed_users(self):
+        """An incremental run recomputes only users whose ratings changed and keeps the others."""
+        first = self.precompute('--workers', '1')
+        Rating.objects.filter(user=self.user).update(updated_at=first.computed_at + timedelta(seconds=1))
+        Rating.objects.filter(user=self.other).update(rating=10)
+        with mock.patch.object(UserRecommendationTable, 'merge', autospec=True,
+                               side_effect=UserRecommendationTable.merge) as merge:
+            second = self.precompute('--workers', '1', '--incremental')
+        self.assertEqual(merge.call_args.args[1].user_ids.tolist(), [self.user.pk])
+        self.assertEqual(len(second), 2)
+        self.assertEqual(second.get(self.other.pk)[0].tolist(), first.get(self.other.pk)[0].tolist())
+        self.assertGreater(second.computed_at, first.computed_at)
+
+
+class HybridRecommenderTest(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cosine = build_test_recommender(self.tmp_dir.name)
+        self.svd = SVDRecommender(write_test_svd_model(self.tmp_dir.name), self.cosine)
+        self.hybrid = HybridRecommender(self.cosine, self.svd, candidate_count=10)
+        self.user_factors, self.user_bias = self.svd.get_exported_user('7')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def recommend(self, **weights):
+        results = self.hybrid.recommend(
+            self.user_factors, self.user_bias, [1], [9], number_of_recommendations=10, **weights
+        )
+        return [result.position for result in results]
+
+    def test_weights_select_the_ranking(self):
+        """Content-only and CF-only weights reproduce the content and SVD rankings."""
+        self.assertEqual(self.recommend(cf_weight=0, content_weight=1), [2, 4, 0, 3])
+        svd_results = self.svd.recommend(self.user_factors, self.user_bias, exclude=[1], number_of_recommendations=10)
+        svd_ranking = [result.position for result in svd_results]
+        self.assertEqual(self.recommend(cf_weight=1, content_weight=0)[:3], svd_ranking)
+
+    def test_blended_scores(self):
+        """Scores are the weighted sum of the min-max normalized CF and content scores."""
+        results = self.hybrid.recommend(self.user_factors, self.user_bias, [1], [9], cf_weight=0.3, content_weight=0.7)
+        candidates = np.array([0, 2, 3, 4])
+        content = self.cosine.similarity_between([1], candidates)[0]
+        cf = self.svd.predict(candidates, self.user_factors, self.user_bias)
+        cf_known = cf[:3]
+        expected = 0.7 * (content - content.min()) / (content.max() - content.min())
+        expected[:3] += 0.3 * (cf_known - cf_known.min()) / (cf_known.max() - cf_known.min())
+        for result in results:
+            self.assertAlmostEqual(result.score, expected[candidates.tolist().index(result.position)])
+        self.assertNotIn(1, [result.position for result in results])
+
+    def test_ties_keep_lower_positions(self):
+        """Candidates tied at the cutoff are chosen by lower catalog position."""
+        cosine = get_recommender()
+        scored = []
+
+        def similarity_between(seeds, candidates):
+            scored.append(candidates)
+            return (candidates % 3).astype(np.float64)[None, :]
+
+        with mock.patch.object(cosine, 'similarity_between', side_effect=similarity_between):
+            results = HybridRecommender(cosine, None, candidate_count=200).recommend(
+                None, 0.0, [0], [9], number_of_recommendations=50
+            )
+        candidates = scored[0]
+        expected = candidates[np.lexsort((candidates, -(candidates % 3)))][:50]
+        self.assertEqual([result.position for result in results], expected.tolist())
+
+    def test_low_ratings_do_not_seed_content(self):
+        """Without highly rated movies or an SVD model, there is nothing to recommend from."""
+        hybrid = HybridRecommender(self.cosine, None)
+        self.assertEqual(hybrid.recommend(None, 0.0, [1], [3]), [])
+        results = hybrid.recommend(None, 0.0, [1], [8], number_of_recommendations=2)
+        self.assertEqual([result.position for result in results], [2, 4])
+
+
+class PersonalRecommendationViewTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.client.login(username="testuser", password="testpass")
+
+    def test_requires_login(self):
+        """Anonymous users are redirected to the login page."""
+        self.client.logout()
+        response = self.client.get(reverse('personal_recommendation_view'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_model_not_available(self):
+        """Without exported SVD arrays the page explains that recommendations are not available."""
+        with mock.patch('recommendations.views.get_svd_recommender', side_effect=FileNotFoundError):
+            response = self.client.get(reverse('personal_recommendation_view'))
+        self.assertContains(response, "Personalized recommendations are not available yet.")
+        self.assertContains(response, "Recommended for You")
+
+    def test_hybrid_blend_without_model(self):
+        """The hybrid page ranks by content alone when the SVD model is missing, excluding rated movies."""
+        rated_id = str(get_recommender().catalog.value('imdb_id', 0))
+        Rating.objects.create(user=self.user, movie_id=rated_id, rating=9)
+        with mock.patch('recommendations.views.get_svd_recommender', side_effect=FileNotFoundError):
+            response = self.client.get(reverse('hybrid_recommendation_view'),
+                                       {'num_recs': 5, 'cf_weight': 'abc', 'content_weight': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Recommended for You")
+        positions = [result.position for result in response.context['recommendations']]
+        self.assertEqual(len(positions), 5)
+        self.assertNotIn(0, positions)
+
+    def test_serves_precomputed_list(self):
+        """A precomputed list of the loaded SVD model is served without scoring the user; another model's is not."""
+        recommender = get_recommender()
+        table = UserRecommendationTable(
+            np.array([self.user.pk]), np.array([[2, 0, -1]], dtype=np.int32),
+            np.array([[4.5, 4.0, -np.inf]], dtype=np.float32), 'svd-v1', timezone.now(),
+        )
+        svd_recommender = mock.Mock(model_version='svd-v1')
+        with mock.patch('recommendations.views.get_user_recommendations', return_value=table), \
+                mock.patch('recommendations.views.get_svd_recommender', return_value=svd_recommender):
+            response = self.client.get(reverse('personal_recommendation_view'), {'num_recs': 2})
+            svd_recommender.recommend_for_user.assert_not_called()
+            self.assertEqual([result.position for result in response.context['recommendations']], [2, 0])
+            self.assertContains(response, f"/recommendations/movie/{recommender.catalog.value('imdb_id', 2)}/")
+
+            svd_recommender.model_version = 'svd-v2'
+            svd_recommender.recommend_for_user.return_value = []
+            self.client.get(reverse('personal_recommendation_view'), {'num_recs': 2})
+            svd_recommender.recommend_for_user.assert_called_once()
+
+
+class ANNIndexTest(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(0)
+        # Five topics of 40 movies; each movie uses mostly the terms of its topic.
+        rows, columns = [], []
+        for movie in range(200):
+            topic = movie % 5
+            terms = np.concatenate([rng.integers(topic * 20, topic * 20 + 20, 8), rng.integers(0, 100, 2)])
+            rows.extend([movie] * len(terms))
+            columns.extend(terms.tolist())
+        self.features = sp.csr_matrix((rng.random(len(rows)), (rows, columns)), shape=(200, 100))
+        self.index = ANNIndex.build(self.features, n_lists=10, dimensions=32, n_probe=3)
+        self.path = os.path.join(self.tmp_dir.name, 'ann')
+        self.index.save(self.path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def exact(self, movie, k):
+        normalized = normalize_rows(self.features)
+        scores = np.asarray((normalized @ normalized[movie].T).todense()).ravel()
+        scores[movie] = -np.inf
+        return np.lexsort((np.arange(len(scores)), -scores))[:k].tolist()
+
+    def test_probing_every_list_is_exact(self):
+        """Searching every cluster returns the exact top-k with cosine scores."""
+        self.assertFalse([name for name in os.listdir(self.path) if name.endswith('.tmp')])
+        index = ANNIndex.load(self.path)
+        self.assertEqual(index.list_offsets[-1], 200)
+        for movie in [0, 17, 199]:
+            positions, scores = index.query(movie, 5, n_probe=index.n_lists)
+            self.assertEqual(positions.tolist(), self.exact(movie, 5))
+            self.assertTrue(np.all(np.diff(scores) <= 0))
+            self.assertLessEqual(scores[0], 1.0 + 1e-6)
+
+    def test_small_sample_limits_clusters(self):
+        """A training sample smaller than the requested clusters gives one cluster per sampled movie."""
+        index = ANNIndex.build(self.features, n_lists=10, dimensions=32, sample_size=4)
+        self.assertEqual(index.n_lists, 4)
+        self.assertEqual(index.list_offsets[-1], 200)
+
+    def test_recall_with_few_probes(self):
+        """A few probes already find most of the true neighbors, and more probes never hurt."""
+        recalls = []
+        for n_probe in [1, 3]:
+            found = sum(
+                len(set(self.index.query(movie, 10, n_probe=n_probe)[0].tolist()) & set(self.exact(movie, 10)))
+                for movie in range(0, 200, 10)
+            )
+            recalls.append(found / 200)
+        self.assertGreater(recalls[1], 0.6)
+        self.assertGreaterEqual(recalls[1], recalls[0])
+
+    def test_extend(self):
+        """Appended movies are searchable, and probing every list stays exact."""
+        index = ANNIndex.build(self.features[:180], n_lists=10, dimensions=32).extend(self.features[180:])
+        self.assertEqual(len(index), 200)
+        self.assertEqual(sorted(index.list_positions.tolist()), list(range(200)))
+        for movie in [0, 185, 199]:
+            positions, _ = index.query(movie, 5, n_probe=index.n_lists)
+            self.assertEqual(positions.tolist(), self.exact(movie, 5))
+
+    def test_recommender_backend(self):
+        """CosineRecommender answers from the ANN index and excludes same-title movies."""
+        movies = pd.DataFrame({'imdb_id': range(200), 'title': [f"Movie {i % 150}" for i in range(200)]})
+        movies_path = os.path.join(self.tmp_dir.name, 'movies.pkl')
+        movies.to_pickle(movies_path)
+        recommender = CosineRecommender(movies_path, ann_path=self.path, ann_probes=10)
+        self.assertEqual(recommender.ann.n_probe, 10)
+        positions, _ = recommender.get_top_similar(0, 5)
+        self.assertEqual(len(positions), 5)
+        self.assertNotIn(150, positions.tolist())
+        self.assertEqual(positions.tolist(), [p for p in self.exact(0, 6) if p != 150][:5])
+
+
+def nltk_data_installed():
+    try:
+        check_nltk_data()
+    except LookupError:
+        return False
+    return True
+
+
+class FeaturePipelineTest(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.cache_dir = os.path.join(self.tmp_dir.name, 'cache')
+
+    def test_fix_jr(self):
+        """A 'Jr.' part is appended to the previous name without dropping the next one."""
+        self.assertEqual(fix_jr("Robert Downey, Jr., Chris Evans"), "Robert Downey Jr., Chris Evans")
+        self.assertEqual(fix_jr("Tom Hanks, Tim Allen"), "Tom Hanks, Tim Allen")
+
+    def test_stage_cache(self):
+        """A stage is built once per key, and only its latest result is kept."""
+        cache = StageCache(self.cache_dir)
+        build = mock.Mock(side_effect=[1, 2])
+        self.assertEqual(cache.get_or_build('stage', 'a' * 40, build), 1)
+        self.assertEqual(cache.get_or_build('stage', 'a' * 40, build), 1)
+        self.assertTrue(cache.hits['stage'])
+        self.assertEqual(cache.get_or_build('stage', 'b' * 40, build), 2)
+        self.assertFalse(cache.hits['stage'])
+        self.assertEqual(build.call_count, 2)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+
+    def test_read_tags_in_chunks(self):
+        """Tags are joined per catalog movie in file order, across chunks."""
+        tags_path = os.path.join(self.tmp_dir.name, 'tags.csv')
+        links_path = os.path.join(self.tmp_dir.name, 'links.csv')
+        pd.DataFrame({
+            'userId': [1, 2, 3, 4, 5],
+            'movieId': [10, 20, 10, 30, 10],
+            'tag': ['funny', 'dark', 'classic', 'other', None],
+            'timestamp': 0,
+        }).to_csv(tags_path, index=False)
+        pd.DataFrame({'movieId': [10, 20, 30], 'imdbId': [1, 2, 3], 'tmdbId': [7, 8, 9]}).to_csv(links_path, index=False)
+        tags = read_tags(tags_path, links_path, [1, 2], chunk_size=2)
+        self.assertEqual(tags.to_dict(), {1: 'funny classic', 2: 'dark'})
+
+    @unittest.skipUnless(nltk_data_installed(), "the NLTK punkt_tab and stopwords data are not installed")
+    def test_rebuild_only_redoes_changed_stages(self):
+        """Changing a numeric column only rebuilds the numeric stage."""
+        movies = pd.DataFrame({
+            'imdb_id': [1, 2, 3],
+            'genres': [['Comedy'], ['Drama'], ['Comedy', 'Drama']],
+            'overview': ['Dogs running wild', 'A dark story', 'Running dogs, dark story'],
+            'cast': ['Actor A, Jr.', 'Actor B', 'Actor A, Jr., Actor B'],
+            'director': ['Dir A', 'Dir B', 'Dir A'],
+            'spoken_languages': [['English'], ['French'], ['English']],
+            'original_language': ['en', 'fr', 'en'],
+            'release_date': pd.to_datetime(['2000-01-01', '2010-01-01', '2020-01-01']),
+            'popularity': [1.0, 2.0, 3.0],
+            'imdb_rating': [5.0, 6.0, np.nan],
+        })
+        features, transformers = FeaturePipeline(self.cache_dir, current_year=2025).run(movies)
+        self.assertEqual(features.shape[0], 3)
+        self.assertTrue(np.all(np.isfinite(features.data)))
+        self.assertEqual(transformers['current_year'], 2025)
+
+        movies.loc[0, 'popularity'] = 10.0
+        pipeline = FeaturePipeline(self.cache_dir, current_year=2025)
+        rebuilt, _ = pipeline.run(movies)
+        self.assertEqual(pipeline.cache.hits, {'documents': True, 'tfidf': True, 'language': True, 'numeric': False})
+        self.assertEqual(rebuilt.shape, features.shape)
+
+    def test_ingest_movies_failure_and_recovery(self):
+        """A failed ingest leaves the catalog as it was, and an index behind the catalog is caught up."""
+        catalog = pd.read_pickle(os.path.join(os.path.dirname(__file__), '..', 'data', 'movies_filter.pkl'))[:110]
+        features = sp.random(110, 40, density=0.2, format='csr', random_state=0)
+        catalog_path = os.path.join(self.tmp_dir.name, 'movies.pkl')
+        features_path = os.path.join(self.tmp_dir.name, 'features.npz')
+        new_path = os.path.join(self.tmp_dir.name, 'new.pkl')
+        neighbors_path = os.path.join(self.tmp_dir.name, 'neighbors')
+        catalog[:100].to_pickle(catalog_path)
+        sp.save_npz(features_path, features[:100])
+        catalog[100:].to_pickle(new_path)
+        NeighborIndex.build_from_features(features[:100], neighbors_path, k=5)
+
+        def ingest():
+            call_command(
+                'ingest_movies', movies=new_path, catalog=catalog_path, features=features_path,
+                neighbors=neighbors_path, ann=os.path.join(self.tmp_dir.name, 'ann'), stdout=io.StringIO(),
+            )
+
+        command = 'recommendations.management.commands.ingest_movies'
+        with mock.patch(f'{command}.check_nltk_data'), mock.patch(f'{command}.load_transformers'), \
+                mock.patch(f'{command}.transform_movies', return_value=features[100:]):
+            with mock.patch.object(NeighborIndex, 'extend', side_effect=MemoryError):
+                with self.assertRaises(MemoryError):
+                    ingest()
+            self.assertEqual(len(pd.read_pickle(catalog_path)), 100)
+            self.assertEqual(sp.load_npz(features_path).shape[0], 100)
+
+            # As if an earlier run had replaced the catalog and the features but not the index.
+            catalog.to_pickle(catalog_path)
+            sp.save_npz(features_path, features)
+            ingest()
+        extended = NeighborIndex.load(neighbors_path)
+        full = NeighborIndex.build_from_features(features, os.path.join(self.tmp_dir.name, 'full'), k=5)
+        self.assertEqual(extended.positions.tolist(), full.positions.tolist())
+        self.assertFalse(os.path.exists(neighbors_path + '.old'))
+
+    @unittest.skipUnless(nltk_data_installed(), "the NLTK punkt_tab and stopwords data are not installed")
+    def test_ingest_movies(self):
+        """Ingested movies are appended to the catalog, the features and the neighbor index."""
+        catalog = pd.read_pickle(os.path.join(os.path.dirname(__file__), '..', 'data', 'movies_filter.pkl'))
+        catalog_path = os.path.join(self.tmp_dir.name, 'movies.pkl')
+        new_path = os.path.join(self.tmp_dir.name, 'new.pkl')
+        catalog[:100].to_pickle(catalog_path)
+        catalog[95:110].to_pickle(new_path)
+        features, transformers = FeaturePipeline(self.cache_dir).run(catalog[:100])
+        paths = {name: os.path.join(self.tmp_dir.name, name) for name in ['features.npz', 'transformers.pkl', 'neighbors']}
+        sp.save_npz(paths['features.npz'], features)
+        save_transformers(paths['transformers.pkl'], transformers)
+        NeighborIndex.build_from_features(features, paths['neighbors'], k=5)
+
+        call_command(
+            'ingest_movies', movies=new_path, catalog=catalog_path, features=paths['features.npz'],
+            transformers=paths['transformers.pkl'], neighbors=paths['neighbors'],
+            ann=os.path.join(self.tmp_dir.name, 'ann'), stdout=io.StringIO(),
+        )
+        ingested = pd.read_pickle(catalog_path)
+        self.assertEqual(ingested.imdb_id.tolist(), catalog.imdb_id[:110].tolist())
+        extended = NeighborIndex.load(paths['neighbors'])
+        full = NeighborIndex.build_from_features(sp.load_npz(paths['features.npz']), os.path.join(self.tmp_dir.name, 'full'), k=5)
+        self.assertEqual(len(extended), 110)
+        self.assertEqual(extended.positions.tolist(), full.positions.tolist())
+
+
+class BenchmarkTest(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+
+    def test_case_reports_percentiles(self):
+        """A case is called for every warmup, timed and traced iteration, cycling through its inputs."""
+        func = mock.Mock()
+        result = BenchmarkCase('case', func, [1, 2]).run(iterations=10, warmup=2, allocation_samples=3)
+        self.assertEqual(func.call_count, 15)
+        self.assertEqual({call.args[0] for call in func.call_args_list}, {1, 2})
+        self.assertEqual(result['iterations'], 10)
+        self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+        self.assertLessEqual(result['p95_ms'], result['p99_ms'])
+
+    def test_compare(self):
+        """Only cases slower than the baseline by more than the threshold are regressions."""
+        baseline = {'a': {'p50_ms': 1.0}, 'b': {'p50_ms': 1.0}, 'gone': {'p50_ms': 1.0}}
+        results = {'a': {'p50_ms': 1.2}, 'b': {'p50_ms': 1.5}, 'new': {'p50_ms': 9.0}}
+        self.assertEqual(compare(results, baseline, threshold=0.25), [('b', 1.0, 1.5)])
+        self.assertEqual(compare(results, baseline, threshold=0.1), [('a', 1.0, 1.2), ('b', 1.0, 1.5)])
+
+    def test_command_fails_on_regression(self):
+        """The command writes its results and fails against a much faster baseline."""
+        output = os.path.join(self.tmp_dir.name, 'out', 'latest.json')
+        baseline = os.path.join(self.tmp_dir.name, 'baseline.json')
+        options = {'iterations': 5, 'warmup': 1, 'only': ['by_id'], 'output': output, 'baseline': baseline}
+        call_command('run_benchmarks', save_baseline=True, stdout=io.StringIO(), **options)
+        with open(output) as f:
+            report = json.load(f)
+        self.assertEqual(set(report['results']), {'get_recommendations_by_id[popular]', 'get_recommendations_by_id[rare]'})
+        self.assertEqual(report['metadata']['catalog_size'], len(get_recommender().catalog))
+
+        for result in report['results'].values():
+            result['p50_ms'] = 1e-6
+        with open(baseline, 'w') as f:
+            json.dump(report, f)
+        with self.assertRaisesMessage(CommandError, "2 benchmark(s) regressed"):
+            call_command('run_benchmarks', stdout=io.StringIO(), **options)
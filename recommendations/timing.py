@@ -0,0 +1,196 @@
+import bisect
+import contextvars
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+# Upper bounds, in seconds, of the histogram buckets (Prometheus' default buckets).
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# The stage durations of the request being handled; None when timing is disabled or outside a request.
+_request_timings = contextvars.ContextVar('request_timings', default=None)
+
+
+class _Stage:
+    __slots__ = ('timings', 'name', 'started')
+
+    def __init__(self, timings, name):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.timings.record(self.name, time.perf_counter() - self.started)
+
+
+class _NoStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NO_STAGE = _NoStage()
+
+
+def stage(name):
+    """
+    Times a named stage of the current request, as a context manager:
+
+        with stage('fuzzy_match'):
+            match = title_index.match(name)
+
+    Outside a timed request (timing disabled, management commands, benchmarks) this returns a shared
+    no-op context manager, so the hooks cost one context variable lookup.
+
+    Parameters:
+        name (str): The stage name, reported in the Server-Timing header and the metrics.
+    """
+    timings = _request_timings.get()
+    if timings is None:
+        return _NO_STAGE
+    return _Stage(timings, name)
+
+
+class RequestTimings:
+    """The total duration, in seconds, of each stage of one request, in the order the stages first ran."""
+
+    def __init__(self):
+        self.durations = {}
+
+    def record(self, name, seconds):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def server_timing(self):
+        """Formats the durations as a Server-Timing header value (in milliseconds)."""
+        return ", ".join(f"{name};dur={seconds * 1000:.3f}" for name, seconds in self.durations.items())
+
+
+class StageHistograms:
+    """
+    Thread-safe histograms of stage durations per view and stage, rendered in the Prometheus text format.
+
+    Attributes:
+        buckets (tuple of float): The upper bounds of the buckets in seconds, ascending.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        # (view, stage) -> [bucket counts (the last one is +Inf), count, sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, view, durations):
+        """
+        Adds the stage durations of one request.
+
+        Parameters:
+            view (str): The name of the view that handled the request.
+            durations (dict): Seconds by stage name.
+        """
+        with self._lock:
+            for name, seconds in durations.items():
+                series = self._series.get((view, name))
+                if series is None:
+                    series = self._series[(view, name)] = [[0] * (len(self.buckets) + 1), 0, 0.0]
+                series[0][bisect.bisect_left(self.buckets, seconds)] += 1
+                series[1] += 1
+                series[2] += seconds
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self, metric='recommender_stage_duration_seconds'):
+        """
+        Renders the histograms in the Prometheus text exposition format.
+
+        Returns:
+            str: A histogram metric with view and stage labels and cumulative buckets.
+        """
+        with self._lock:
+            series = sorted((key, [list(value[0]), value[1], value[2]]) for key, value in self._series.items())
+        lines = [
+            f"# HELP {metric} Duration of the stages of a request, by view and stage.",
+            f"# TYPE {metric} histogram",
+        ]
+        bounds = [repr(float(bound)) for bound in self.buckets] + ['+Inf']
+        for (view, name), (counts, count, total) in series:
+            labels = f'view="{_label(view)}",stage="{_label(name)}"'
+            cumulative = 0
+            for bound, bucket_count in zip(bounds, counts):
+                cumulative += bucket_count
+                lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"{metric}_sum{{{labels}}} {total!r}")
+            lines.append(f"{metric}_count{{{labels}}} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _label(value):
+    """Escapes a Prometheus label value."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def timing_enabled():
+    return getattr(settings, 'STAGE_TIMING', {}).get('ENABLED', False)
+
+
+stage_histograms = StageHistograms(getattr(settings, 'STAGE_TIMING', {}).get('BUCKETS', DEFAULT_BUCKETS))
+
+
+class ServerTimingMiddleware:
+    """
+    Records the stage durations of each request (see stage), adds them to the response as a
+    Server-Timing header, with the whole request as the 'total' stage, and aggregates them
+    into stage_histograms, served by metrics_view.
+
+    Enabled by STAGE_TIMING['ENABLED']; when disabled, Django drops the middleware at startup
+    and the hooks in the recommender and the views are no-ops.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not timing_enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = RequestTimings()
+        token = _request_timings.set(timings)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_timings.reset(token)
+        return self._finish(request, response, timings, started)
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = _request_timings.set(timings)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_timings.reset(token)
+        return self._finish(request, response, timings, started)
+
+    @staticmethod
+    def _finish(request, response, timings, started):
+        timings.record('total', time.perf_counter() - started)
+        response['Server-Timing'] = timings.server_timing()
+        match = getattr(request, 'resolver_match', None)
+        stage_histograms.observe(match.url_name if match and match.url_name else 'unresolved', timings.durations)
+        return response
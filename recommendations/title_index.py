@@ -0,0 +1,89 @@
+import difflib
+import re
+from collections import defaultdict
+import numpy as np
+
+
+def normalize_title(title):
+    """Lowercases a title and collapses punctuation and repeated whitespace into single spaces."""
+    return " ".join(re.sub(r"[^\w\s]", " ", str(title).lower()).split())
+
+
+def title_trigrams(normalized_title):
+    """Returns the set of character trigrams of a normalized title, padded so short words still match."""
+    padded = f"  {normalized_title} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TitleIndex:
+    """
+    A character trigram inverted index over normalized movie titles for fast fuzzy matching.
+
+    A query is first matched against the index to find the few titles sharing the most trigrams
+    with it, and only those candidates are scored with difflib's SequenceMatcher. This replaces
+    a difflib.get_close_matches pass over the whole catalog.
+
+    Attributes:
+        titles (numpy array): The original titles, by row position.
+        normalized (list of str): The normalized titles, by row position.
+    """
+
+    def __init__(self, titles, max_candidates=50):
+        self.titles = np.asarray(titles, dtype=object)
+        self.normalized = [normalize_title(title) for title in self.titles]
+        self.max_candidates = max_candidates
+
+        self._exact = {}
+        postings = defaultdict(list)
+        for position, normalized in enumerate(self.normalized):
+            self._exact.setdefault(normalized, position)
+            for trigram in title_trigrams(normalized):
+                postings[trigram].append(position)
+        self._postings = {trigram: np.array(positions, dtype=np.int32) for trigram, positions in postings.items()}
+
+    def match(self, query, cutoff=0.6):
+        """
+        Finds the title closest to the query.
+
+        Parameters:
+            query (str): The (possibly misspelled) title typed by the user.
+            cutoff (float): The minimum SequenceMatcher ratio, as in difflib.get_close_matches.
+
+        Returns:
+            tuple of (str, int) or None: The best matching title and its row position, or None if
+            no title is close enough. Equal ratios are resolved like get_close_matches, to the
+            lexicographically largest title, and then to the lowest row position.
+        """
+        normalized_query = normalize_title(query)
+        if not normalized_query:
+            return None
+
+        position = self._exact.get(normalized_query)
+        if position is not None:
+            return self.titles[position], position
+
+        postings = [self._postings[trigram] for trigram in title_trigrams(normalized_query)
+                    if trigram in self._postings]
+        if not postings:
+            return None
+
+        shared = np.bincount(np.concatenate(postings), minlength=len(self.titles))
+        k = min(self.max_candidates, np.count_nonzero(shared))
+        candidates = np.sort(np.argpartition(-shared, k - 1)[:k])
+
+        matcher = difflib.SequenceMatcher()
+        matcher.set_seq2(normalized_query)
+        best_ratio, best_position = cutoff, None
+        for candidate in candidates:
+            matcher.set_seq1(self.normalized[candidate])
+            if matcher.real_quick_ratio() < best_ratio or matcher.quick_ratio() < best_ratio:
+                continue
+            ratio = matcher.ratio()
+            if ratio > best_ratio or ratio == best_ratio and (
+                best_position is None or self.titles[candidate] > self.titles[best_position]
+            ):
+                best_ratio, best_position = ratio, int(candidate)
+
+        if best_position is None:
+            return None
+        return self.titles[best_position], best_position
@@ -5,11 +5,19 @@ from . import views
 urlpatterns = [
     path('', views.index_view, name='index_view'),
     path('recommendations/', views.recommendation_view, name='recommendation_view'),
+    path('recommendations/seeds/', views.seed_recommendations_view, name='seed_recommendations_view'),
     path('recommendations/movie/<str:imdb_id>/', views.movie_detail_view, name='movie_detail_view'),
     path('rate/<str:imdb_id>/', views.rate_movie_view, name='rate_movie_view'),
     path('register/', views.register_view, name='register_view'),
+    path('for-you/', views.personal_recommendation_view, name='personal_recommendation_view'),
+    path('for-you/hybrid/', views.hybrid_recommendation_view, name='hybrid_recommendation_view'),
     path('my-ratings/', views.my_ratings_view, name='my_ratings_view'),
     path('login/', auth_views.LoginView.as_view(template_name='recommendations/login.html'), name='login'),
     path('logout/', auth_views.LogoutView.as_view(next_page='/'), name='logout'),
     path('autocomplete/', views.autocomplete_view, name='autocomplete_view'),
+    path('health/', views.health_view, name='health_view'),
+    path('metrics/', views.metrics_view, name='metrics_view'),
+    path('api/recommendations/', views.recommendation_api_view, name='recommendation_api_view'),
+    path('api/movies/<str:imdb_id>/', views.movie_detail_api_view, name='movie_detail_api_view'),
+    path('api/autocomplete/', views.autocomplete_api_view, name='autocomplete_api_view'),
 ]
@@ -0,0 +1,121 @@
+import json
+import os
+from datetime import datetime
+import numpy as np
+from .artifacts import save_array
+
+
+class UserRecommendationTable:
+    """
+    Precomputed personalized recommendations of every user, built offline with
+    `manage.py precompute_user_recommendations`.
+
+    The lists are stored as fixed-width arrays, one row per user, and memory-mapped when loaded;
+    a user's row is found through a hash index, so a lookup is O(1).
+
+    Attributes:
+        user_ids (numpy array): The user ID of every row.
+        positions (numpy array): A U x N int32 array with the catalog positions of each user's
+            recommendations, best first, padded with -1.
+        scores (numpy array): A U x N float32 array with the matching predicted ratings.
+        model_version (str): The version of the model the lists were computed with.
+        computed_at (datetime): When the computation started; ratings changed later are not reflected.
+    """
+
+    def __init__(self, user_ids, positions, scores, model_version, computed_at):
+        self.user_ids = user_ids
+        self.positions = positions
+        self.scores = scores
+        self.model_version = model_version
+        self.computed_at = computed_at
+        self._rows = {user_id: row for row, user_id in enumerate(np.asarray(user_ids).tolist())}
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def __contains__(self, user_id):
+        return user_id in self._rows
+
+    @property
+    def n(self):
+        """The number of recommendations stored per user."""
+        return self.positions.shape[1]
+
+    def get(self, user_id):
+        """
+        Returns the precomputed recommendations of a user.
+
+        Parameters:
+            user_id (int): The user's ID.
+
+        Returns:
+            tuple of (numpy array, numpy array) or None: The catalog positions and predicted ratings,
+            best first, or None if the user has no precomputed list.
+        """
+        row = self._rows.get(user_id)
+        if row is None:
+            return None
+        positions = self.positions[row]
+        count = int(np.count_nonzero(positions >= 0))
+        return positions[:count], self.scores[row][:count]
+
+    def merge(self, other):
+        """
+        Returns a table with the rows of both tables, the rows of `other` replacing those of the same users.
+
+        Parameters:
+            other (UserRecommendationTable): The newer table, e.g. from an incremental run.
+
+        Returns:
+            UserRecommendationTable: The merged table, with the version and computation time of `other`.
+        """
+        keep = np.array([user_id not in other for user_id in np.asarray(self.user_ids).tolist()], dtype=bool)
+        n = max(self.n, other.n)
+        return UserRecommendationTable(
+            np.concatenate([np.asarray(self.user_ids)[keep], other.user_ids]),
+            np.concatenate([_pad(self.positions[keep], n, -1), _pad(other.positions, n, -1)]),
+            np.concatenate([_pad(self.scores[keep], n, -np.inf), _pad(other.scores, n, -np.inf)]),
+            other.model_version,
+            other.computed_at,
+        )
+
+    def save(self, directory):
+        """Writes the table as raw .npy files plus a meta.json, each file atomically."""
+        os.makedirs(directory, exist_ok=True)
+        save_array(os.path.join(directory, 'user_ids.npy'), np.asarray(self.user_ids, dtype=np.int64))
+        save_array(os.path.join(directory, 'positions.npy'), np.asarray(self.positions, dtype=np.int32))
+        save_array(os.path.join(directory, 'scores.npy'), np.asarray(self.scores, dtype=np.float32))
+        meta_path = os.path.join(directory, 'meta.json')
+        with open(meta_path + '.tmp', 'w') as f:
+            json.dump({'model_version': self.model_version, 'computed_at': self.computed_at.isoformat()}, f)
+        os.replace(meta_path + '.tmp', meta_path)
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        """
+        Loads a table written by `save`, memory-mapping the arrays.
+
+        Parameters:
+            directory (str): The directory holding the table.
+            mmap_mode (str): The numpy memory-map mode (None loads the arrays into memory).
+
+        Returns:
+            UserRecommendationTable: The loaded table.
+        """
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+        return cls(
+            np.load(os.path.join(directory, 'user_ids.npy')),
+            np.load(os.path.join(directory, 'positions.npy'), mmap_mode=mmap_mode),
+            np.load(os.path.join(directory, 'scores.npy'), mmap_mode=mmap_mode),
+            meta['model_version'],
+            datetime.fromisoformat(meta['computed_at']),
+        )
+
+
+def _pad(array, width, fill):
+    if array.shape[1] >= width:
+        return array
+    padded = np.full((array.shape[0], width), fill, dtype=array.dtype)
+    padded[:, :array.shape[1]] = array
+    return padded
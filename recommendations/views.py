@@ -1,28 +1,39 @@
+from django.conf import settings
 from django.shortcuts import render, redirect
-import difflib
-from .cosine_recommender import CosineRecommender
-from .movie import Movie
-from .movie_display import MovieDisplay
+from .provider import (
+    get_recommender, get_svd_recommender, get_user_recommendations, recommender_provider, svd_provider,
+)
+from .result_cache import recommendation_cache
+from .movie_display import card_cache
+from .executor import cpu_executor
+from .fold_in import fold_in_worker, rating_version
+from .hybrid_recommender import HybridRecommender
+from .timing import stage, stage_histograms, timing_enabled
 from .models import Rating
-import os
-from django.http import JsonResponse
-import pandas as pd
+from .movie import Recommendation
+import json
+import math
+import random
+from django.http import Http404, HttpResponse, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 
 from django.contrib.auth import login
 from .forms import RegistrationForm
 from .forms import RatingForm
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.db.models import Max, Q
+from django.utils.dateparse import parse_datetime
 
-APP_DIR = os.path.dirname(os.path.abspath(__file__))
+# The number of ratings shown per page of my_ratings_view.
+RATINGS_PAGE_SIZE = 50
 
-PROJECT_ROOT = os.path.abspath(os.path.join(APP_DIR, '..'))
-
-MOVIES_CSV_PATH = os.path.join(PROJECT_ROOT, 'data', 'movies_filter.pkl')
-
-SIMILARITY_PATH = os.path.join(APP_DIR, 'ml_models', 'cosine_matrix')
-
-cosine_recommender = CosineRecommender(MOVIES_CSV_PATH, SIMILARITY_PATH)
+# The most seed queries seed_recommendations_view answers per call, the most recommendations per query,
+# and the most liked plus disliked movies per query.
+MAX_SEED_QUERIES = 100
+MAX_SEED_RECOMMENDATIONS = 100
+MAX_SEEDS_PER_QUERY = 50
 
 
 def recommendation_view(request):
@@ -38,6 +49,7 @@ def recommendation_view(request):
     Returns:
         HttpResponse: Rendered template with recommended movies.
     """
+    cosine_recommender = get_recommender()
     movie_input = request.GET.get('movie_input')
     movie_id = request.GET.get('movie_id')
     try:
@@ -45,69 +57,248 @@ def recommendation_view(request):
     except ValueError:
         num_recs = 10
 
-    final_title = ""
-    recommended_titles = []
     if not movie_input and not movie_id:
         rendered_html = "<p>Please type a movie to get recommendations.</p>"
         return render(request, 'recommendations/recommendations.html', {'rendered_html': rendered_html})
 
-    if movie_id:
+    final_title, recommendations = _recommend_for_request(cosine_recommender, movie_input, movie_id, num_recs)
+
+    if not recommendations:
+        rendered_html = "<p>No similar movies found. Please try another movie.</p>"
+    else:
+        # Results carry their catalog row, so the cards are found without looking the titles up again.
+        with stage('cards'):
+            rendered_html = card_cache.render_html(
+                cosine_recommender.model_version,
+                cosine_recommender.catalog,
+                [result.position for result in recommendations],
+            )
+
+    context = {
+        'rendered_html': rendered_html,
+        'movie_input': final_title,  # Use the full, matched title for display in the header.
+        'recommendations': recommendations,  # Positions, IMDb IDs and scores, e.g. for debugging.
+    }
+    with stage('render'):
+        return render(request, 'recommendations/recommendations.html', context)
 
-        recommended_titles = cosine_recommender.get_recommendations_by_id(movie_id, number_of_recommendations=num_recs)
 
-        row = cosine_recommender.movies_tmdb[
-            cosine_recommender.movies_tmdb['imdb_id'].astype(str).str.strip() == movie_id.strip()
-            ]
-        if not row.empty:
-            final_title = row.iloc[0]['title']
+def _recommend_for_request(cosine_recommender, movie_input, movie_id, num_recs):
+    """
+    Resolves the seed movie of a recommendation request and recommends for it, through the result cache.
+
+    Returns:
+        tuple of (str, list of Recommendation): The title to show in the header and the recommendations,
+        empty if no movie matches.
+    """
+    if movie_id:
+
+        position = cosine_recommender.get_position(movie_id)
+        if position is not None:
+            final_title = cosine_recommender.catalog.value('title', position)
         else:
             final_title = movie_input or ""
-    elif movie_input:
+    else:
 
-        list_of_all_titles = [t.strip() for t in cosine_recommender.movies_tmdb['title'].tolist()]
-        find_close_match = difflib.get_close_matches(movie_input.strip(), list_of_all_titles)
-        if find_close_match:
-            final_title = find_close_match[0]
+        # One fuzzy lookup gives both the title shown in the header and the row to recommend from.
+        match = cosine_recommender.find_movie(movie_input)
+        if match:
+            final_title, position = match
+            final_title = final_title.strip()
         else:
+            position = None
             final_title = movie_input.strip()
-        recommended_titles = cosine_recommender.get_recommendations(movie_input, number_of_recommendations=num_recs)
-    else:
-        recommended_titles = []
 
-    if not recommended_titles:
-        rendered_html = "<p>No similar movies found. Please try another movie.</p>"
+    if position is None:
+        return final_title, []
+    return final_title, recommendation_cache.get_or_compute(
+        cosine_recommender.model_version,
+        cosine_recommender.catalog.value('imdb_id', position),
+        num_recs,
+        lambda: cosine_recommender.recommend_by_index(position, number_of_recommendations=num_recs),
+    )
+
+
+def _precomputed_recommendations(user, cosine_recommender, number_of_recommendations):
+    """
+    Returns the user's recommendations from the precomputed table, or None when the table is missing or
+    was computed for another model, has no (long enough) list for the user, or the user's ratings changed
+    since it was computed.
+    """
+    try:
+        table = get_user_recommendations()
+        svd_recommender = get_svd_recommender()
+    except FileNotFoundError:
+        return None
+    if table.model_version != svd_recommender.model_version:
+        return None
+    entry = table.get(user.pk)
+    if entry is None or len(entry[0]) < min(number_of_recommendations, table.n):
+        return None
+    with stage('rating_query'):
+        last_rated = Rating.objects.filter(user=user).aggregate(last_rated=Max('updated_at'))['last_rated']
+    if last_rated is not None and last_rated > table.computed_at:
+        return None
+
+    catalog = cosine_recommender.catalog
+    positions, scores = entry
+    return [
+        Recommendation(position, catalog.value('imdb_id', position), catalog.value('title', position), score)
+        for position, score in zip(positions[:number_of_recommendations].tolist(),
+                                   scores[:number_of_recommendations].tolist())
+    ]
+
+
+@login_required
+def personal_recommendation_view(request):
+    """
+    Recommends movies for the logged-in user with the SVD collaborative-filtering model,
+    leaving out the movies the user already rated. Lists precomputed offline are served when they
+    are up to date; otherwise the user is scored on the fly, with factors folded in from their
+    ratings in the background whenever a rating changes.
+
+    Parameters:
+        request (HttpRequest): The HTTP request containing query parameters.
+            - num_recs (int, optional): Number of recommendations to generate. Default is 10.
+
+    Returns:
+        HttpResponse: Rendered template with the recommended movies.
+    """
+    try:
+        num_recs = int(request.GET.get('num_recs', 10))
+    except ValueError:
+        num_recs = 10
+
+    cosine_recommender = get_recommender()
+    recommendations = _precomputed_recommendations(request.user, cosine_recommender, num_recs)
+    if recommendations is None:
+        try:
+            svd_recommender = get_svd_recommender()
+        except FileNotFoundError:
+            rendered_html = "<p>Personalized recommendations are not available yet.</p>"
+            return render(request, 'recommendations/recommendations.html', {
+                'rendered_html': rendered_html,
+                'heading': "Recommended for You",
+            })
+
+        with stage('rating_query'):
+            ratings = list(Rating.objects.filter(user=request.user).values_list('movie_id', 'updated_at'))
+        rated_positions = [
+            position for position in cosine_recommender.get_positions(movie_id for movie_id, _ in ratings)
+            if position is not None
+        ]
+        if not svd_recommender.is_user_current(request.user.pk, rating_version([updated for _, updated in ratings])):
+            # Factors are folded in in the background; until then the user gets the baseline ranking
+            # (or the factors of their previous ratings).
+            fold_in_worker.schedule(request.user.pk)
+
+        with stage('scoring'):
+            recommendations = svd_recommender.recommend_for_user(
+                request.user.pk, exclude=rated_positions, number_of_recommendations=num_recs
+            )
+    if not recommendations:
+        rendered_html = "<p>No recommendations found. Rate a few more movies and try again.</p>"
     else:
-        movies = []
-        for title in recommended_titles:
-            row = cosine_recommender.movies_tmdb[
-                cosine_recommender.movies_tmdb['title'].str.strip().str.lower() == title.strip().lower()
-                ]
-            if row.empty:
-                continue
-            row = row.iloc[0]
-            poster_path = row.get('poster_path', '')
-            poster_url = (
-                "https://image.tmdb.org/t/p/w500" + str(poster_path)
-                if poster_path and not pd.isnull(poster_path)
-                else "/static/images/default.jpg"
+        with stage('cards'):
+            rendered_html = card_cache.render_html(
+                cosine_recommender.model_version,
+                cosine_recommender.catalog,
+                [result.position for result in recommendations],
             )
-            movie_obj = Movie(
-                title=row.get('title', 'N/A'),
-                poster_url=poster_url,
-                overview=row.get('overview', 'No overview available.'),
-                vote_average=row.get('imdb_rating', 'N/A'),
-                release_date=row.get('release_date', 'N/A'),
-                movie_id=row.get('imdb_id', 'N/A')
+
+    context = {
+        'rendered_html': rendered_html,
+        'heading': "Recommended for You",
+        'recommendations': recommendations,  # Positions, IMDb IDs and predicted ratings, e.g. for debugging.
+    }
+    with stage('render'):
+        return render(request, 'recommendations/recommendations.html', context)
+
+
+def _weight_param(request, name, default):
+    """Reads a non-negative blend weight from the query string, falling back to the default."""
+    try:
+        weight = float(request.GET.get(name, default))
+    except ValueError:
+        return default
+    return weight if 0 <= weight < float('inf') else default
+
+
+@login_required
+def hybrid_recommendation_view(request):
+    """
+    Recommends movies for the logged-in user by blending the SVD model's predicted ratings with
+    content similarity to the movies the user rated highly (see HybridRecommender).
+
+    Parameters:
+        request (HttpRequest): The HTTP request containing query parameters.
+            - num_recs (int, optional): Number of recommendations to generate. Default is 10.
+            - cf_weight (float, optional): Weight of the predicted rating. Default from HYBRID_RECOMMENDER.
+            - content_weight (float, optional): Weight of the content similarity. Default from HYBRID_RECOMMENDER.
+
+    Returns:
+        HttpResponse: Rendered template with the recommended movies.
+    """
+    try:
+        num_recs = int(request.GET.get('num_recs', 10))
+    except ValueError:
+        num_recs = 10
+    options = getattr(settings, 'HYBRID_RECOMMENDER', {})
+    cf_weight = _weight_param(request, 'cf_weight', options.get('CF_WEIGHT', 0.5))
+    content_weight = _weight_param(request, 'content_weight', options.get('CONTENT_WEIGHT', 0.5))
+
+    cosine_recommender = get_recommender()
+    try:
+        svd_recommender = get_svd_recommender()
+    except FileNotFoundError:
+        # Without the SVD model the blend is ranked by content alone.
+        svd_recommender = None
+
+    with stage('rating_query'):
+        ratings = list(Rating.objects.filter(user=request.user).values_list('movie_id', 'rating', 'updated_at'))
+    positions = cosine_recommender.get_positions(movie_id for movie_id, _, _ in ratings)
+    rated = [(position, rating) for position, (_, rating, _) in zip(positions, ratings) if position is not None]
+    user_factors, user_bias = None, 0.0
+    if svd_recommender is not None:
+        user = svd_recommender.get_user(request.user.pk)
+        if user is not None:
+            user_factors, user_bias = user
+        if not svd_recommender.is_user_current(request.user.pk, rating_version([updated for _, _, updated in ratings])):
+            fold_in_worker.schedule(request.user.pk)
+
+    hybrid_recommender = HybridRecommender(
+        cosine_recommender,
+        svd_recommender,
+        candidate_count=options.get('CANDIDATES', 200),
+        liked_rating=options.get('LIKED_RATING', 7),
+    )
+    with stage('scoring'):
+        recommendations = hybrid_recommender.recommend(
+            user_factors,
+            user_bias,
+            [position for position, _ in rated],
+            [rating for _, rating in rated],
+            cf_weight=cf_weight,
+            content_weight=content_weight,
+            number_of_recommendations=num_recs,
+        )
+    if not recommendations:
+        rendered_html = "<p>No recommendations found. Rate a few more movies and try again.</p>"
+    else:
+        with stage('cards'):
+            rendered_html = card_cache.render_html(
+                cosine_recommender.model_version,
+                cosine_recommender.catalog,
+                [result.position for result in recommendations],
             )
-            movies.append(movie_obj)
-        display = MovieDisplay(movies)
-        rendered_html = display.render_html()
 
     context = {
         'rendered_html': rendered_html,
-        'movie_input': final_title,  # Use the full, matched title for display in the header.
+        'heading': "Recommended for You",
+        'recommendations': recommendations,  # Positions, IMDb IDs and blended scores, e.g. for debugging.
     }
-    return render(request, 'recommendations/recommendations.html', context)
+    with stage('render'):
+        return render(request, 'recommendations/recommendations.html', context)
 
 
 def movie_detail_view(request, imdb_id):
@@ -122,60 +313,58 @@ def movie_detail_view(request, imdb_id):
         HttpResponse: Rendered template with movie details or an error message if the movie is not found.
     """
 
-    movie_row = cosine_recommender.movies_tmdb[
-        cosine_recommender.movies_tmdb['imdb_id'] == imdb_id
-    ]
-    if movie_row.empty:
+    cosine_recommender = get_recommender()
+    position = cosine_recommender.get_position(imdb_id)
+    if position is None:
         return render(request, 'recommendations/movie_detail.html', {'error': 'Movie not found.'})
 
-    movie = movie_row.iloc[0]
-    poster_path = movie.get('poster_path', '')
-    poster_url = ("https://image.tmdb.org/t/p/w500" + str(poster_path)
-                  if poster_path and not pd.isnull(poster_path)
-                  else "/static/images/default.jpg")
+    user_rating = None
+    if request.user.is_authenticated:
+        try:
+            with stage('rating_query'):
+                user_rating = Rating.objects.get(user=request.user, movie_id=imdb_id).rating
+        except Rating.DoesNotExist:
+            user_rating = None
+
+    context = _movie_details(cosine_recommender.catalog, position)
+    context['movie_id'] = imdb_id  # Pass the movie ID for links
+    context['user_rating'] = user_rating  # This will be None if not rated
+
+    with stage('render'):
+        return render(request, 'recommendations/movie_detail.html', context)
+
 
+def _movie_details(catalog, position):
+    """Returns the details of the movie at a catalog position, as shown on its detail page."""
     try:
-        imdb_votes = int(float(movie.get('imdb_votes', 'N/A')))
+        imdb_votes = int(float(catalog.value('imdb_votes', position)))
     except (ValueError, TypeError):
         imdb_votes = 'N/A'
     try:
-        runtime = int(float(movie.get('runtime', 'N/A')))
+        runtime = int(float(catalog.value('runtime', position)))
     except (ValueError, TypeError):
         runtime = 'N/A'
 
-    spoken_languages = movie.get('spoken_languages', 'N/A')
-    if isinstance(spoken_languages, list):
-        spoken_languages = ", ".join(spoken_languages)
-    elif isinstance(spoken_languages, str):
+    # The catalog stores list columns as their comma-separated display string.
+    spoken_languages = catalog.value('spoken_languages', position)
+    if isinstance(spoken_languages, str):
         spoken_languages = spoken_languages.strip("[]").replace("'", "")
 
-    user_rating = None
-    if request.user.is_authenticated:
-        try:
-            from .models import Rating  # ensure Rating is imported
-            user_rating = Rating.objects.get(user=request.user, movie_id=imdb_id).rating
-        except Rating.DoesNotExist:
-            user_rating = None
-
-    context = {
-        'title': movie.get('title', 'N/A'),
-        'overview': movie.get('overview', 'N/A'),
-        'release_date': movie.get('release_date', 'N/A'),
+    return {
+        'title': catalog.value('title', position),
+        'overview': catalog.value('overview', position),
+        'release_date': catalog.value('release_date', position) or 'N/A',
         'runtime': runtime,
-        'genres': movie.get('genres', 'N/A'),
+        'genres': catalog.value('genres', position),
         'spoken_languages': spoken_languages,
-        'cast': movie.get('cast', 'N/A'),
-        'director': movie.get('director', 'N/A'),
-        'writers': movie.get('writers', 'N/A'),
-        'imdb_rating': movie.get('imdb_rating', 'N/A'),
+        'cast': catalog.value('cast', position),
+        'director': catalog.value('director', position),
+        'writers': catalog.value('writers', position),
+        'imdb_rating': catalog.value('imdb_rating', position),
         'imdb_votes': imdb_votes,
-        'poster_url': poster_url,
-        'movie_id': imdb_id,  # Pass the movie ID for links
-        'user_rating': user_rating,  # This will be None if not rated
+        'poster_url': catalog.poster_url(position),
     }
 
-    return render(request, 'recommendations/movie_detail.html', context)
-
 
 def index_view(request):
     """
@@ -188,49 +377,34 @@ def index_view(request):
     Returns:
         HttpResponse: Rendered template with popular movies.
     """
-    # Get the top 100 popular movies (assuming higher 'popularity' means more popular)
-    top_popular = cosine_recommender.movies_tmdb.sort_values(by='popularity', ascending=False).head(100)
+    cosine_recommender = get_recommender()
+    # The top 100 popular movies and their HTML cards are computed once when the model is loaded.
+    popular_cards = cosine_recommender.popular_cards
     # Randomly sample 5 movies from the top 100
-    sample_popular = top_popular.sample(n=5)
-
-    popular_movies = []
-    for _, row in sample_popular.iterrows():
-        poster_path = row.get('poster_path', '')
-        if poster_path:
-            poster_url = "https://image.tmdb.org/t/p/w500" + poster_path
-        else:
-            poster_url = "/static/images/default.jpg"
-
-        # Create a Movie object with key details
-        movie_obj = Movie(
-            title=row.get('title', 'N/A'),
-            poster_url=poster_url,
-            overview=row.get('overview', 'No overview available.'),
-            vote_average=row.get('imdb_rating', 'N/A'),
-            release_date=row.get('release_date', 'N/A'),
-            movie_id=row.get('imdb_id', 'N/A')
-        )
-        popular_movies.append(movie_obj)
+    sample_popular = random.sample(range(len(popular_cards)), min(5, len(popular_cards)))
 
-    display = MovieDisplay(popular_movies)
-    rendered_html = display.render_html()
+    rendered_html = "".join(popular_cards[i] for i in sample_popular)
 
     context = {
         'rendered_html': rendered_html,
     }
-    return render(request, 'recommendations/index.html', context)
+    with stage('render'):
+        return render(request, 'recommendations/index.html', context)
 
 
 def autocomplete_view(request):
     """
         Provides autocomplete suggestions for movie titles based on a user's input.
 
+        Suggestions come from the recommender's prefix index: movies with a title word starting
+        with the search term, most popular first.
+
         Parameters:
             request (HttpRequest): The HTTP request containing query parameters.
                 - term (str, optional): The search term entered by the user.
 
         Returns:
-            JsonResponse: A JSON list of matching movie titles, each containing:
+            JsonResponse: A JSON list of up to 10 matching movie titles, each containing:
                 - label (str): Movie title with release year.
                 - value (str): IMDb ID of the movie.
                 - poster_url (str): URL of the movie's poster.
@@ -238,34 +412,77 @@ def autocomplete_view(request):
     query = request.GET.get('term', '')
     suggestions = []
     if query:
-        matches = cosine_recommender.movies_tmdb[
-            cosine_recommender.movies_tmdb['title'].str.contains(query, case=False, na=False)
-        ].head(10)
-        for _, row in matches.iterrows():
-            title = row['title'].strip()
-            release_date = row.get('release_date', '')
-            # Check if release_date is a Timestamp or datetime-like object:
-            if isinstance(release_date, pd.Timestamp):
-                year = str(release_date.year)
-            elif isinstance(release_date, str) and release_date:
-                year = release_date.split("-")[0]
-            else:
-                year = ""
-            imdb_id = str(row.get('imdb_id', '')).strip()
-            poster_path = row.get('poster_path', '')
-            if poster_path and not pd.isnull(poster_path):
-                poster_url = "https://image.tmdb.org/t/p/w500" + str(poster_path)
-            else:
-                poster_url = "/static/images/default.jpg"
-            label = f"{title} ({year})" if year else title
-            suggestions.append({
-                'label': label,
-                'value': imdb_id,
-                'poster_url': poster_url,
-            })
+        with stage('autocomplete'):
+            suggestions = get_recommender().autocomplete_index.suggest(query)
     return JsonResponse(suggestions, safe=False)
 
 
+def _seed_query_result(cosine_recommender, query):
+    """Answers one query of seed_recommendations_view; raises ValueError when the query is malformed."""
+    if not isinstance(query, dict):
+        raise ValueError("Each query must be an object.")
+    liked_ids = query.get('liked', [])
+    disliked_ids = query.get('disliked', [])
+    if not isinstance(liked_ids, list) or not isinstance(disliked_ids, list):
+        raise ValueError("'liked' and 'disliked' must be lists of IMDb IDs.")
+    if len(liked_ids) + len(disliked_ids) > MAX_SEEDS_PER_QUERY:
+        raise ValueError(f"At most {MAX_SEEDS_PER_QUERY} liked and disliked movies are accepted per query.")
+    num_recs = min(max(int(query.get('num_recs', 10)), 0), MAX_SEED_RECOMMENDATIONS)
+    disliked_weight = float(query.get('disliked_weight', 1.0))
+    if not 0 <= disliked_weight < float('inf'):
+        raise ValueError("'disliked_weight' must be a non-negative number.")
+
+    liked = cosine_recommender.get_positions(liked_ids)
+    disliked = cosine_recommender.get_positions(disliked_ids)
+    recommendations = cosine_recommender.recommend_for_seeds(
+        [position for position in liked if position is not None],
+        [position for position in disliked if position is not None],
+        number_of_recommendations=num_recs,
+        disliked_weight=disliked_weight,
+    )
+    return {
+        'recommendations': [
+            {'imdb_id': result.imdb_id, 'title': result.title, 'score': result.score}
+            for result in recommendations
+        ],
+        'unknown_ids': [
+            str(movie_id) for movie_id, position in zip(liked_ids + disliked_ids, liked + disliked) if position is None
+        ],
+    }
+
+
+@csrf_exempt
+@require_POST
+def seed_recommendations_view(request):
+    """
+    Recommends movies for sets of liked (and optionally disliked) movies, as JSON.
+
+    The request body is one query, or many independent queries under "queries":
+        {"liked": ["tt1", ...], "disliked": ["tt2", ...], "num_recs": 10, "disliked_weight": 1.0}
+        {"queries": [{"liked": [...]}, {"liked": [...], "disliked": [...]}]}
+
+    Parameters:
+        request (HttpRequest): The HTTP POST request with a JSON body.
+
+    Returns:
+        JsonResponse: {"results": [...]} with, for every query in order, its recommendations
+        (imdb_id, title, score) and the IMDb IDs that are not in the catalog; 400 for a malformed body.
+    """
+    try:
+        payload = json.loads(request.body)
+        queries = payload.get('queries', [payload]) if isinstance(payload, dict) else None
+        if not isinstance(queries, list):
+            raise ValueError("The body must be a query object or {\"queries\": [...]}.")
+        if len(queries) > MAX_SEED_QUERIES:
+            raise ValueError(f"At most {MAX_SEED_QUERIES} queries are answered per call.")
+        cosine_recommender = get_recommender()
+        with stage('scoring'):
+            results = [_seed_query_result(cosine_recommender, query) for query in queries]
+    except (ValueError, TypeError, OverflowError) as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    return JsonResponse({'results': results})
+
+
 def register_view(request):
     """
     Handles user registration by displaying a registration form and processing submissions.
@@ -337,46 +554,206 @@ def rate_movie_view(request, imdb_id):
     return render(request, 'recommendations/rate_movie.html', context)
 
 
+def _format_ratings_cursor(rating):
+    """Encodes the keyset position of a rating (its update time and id) for the 'before' query parameter."""
+    return f"{rating.updated_at.isoformat()}_{rating.pk}"
+
+
+def _parse_ratings_cursor(cursor):
+    """Decodes a cursor made by _format_ratings_cursor, returning (updated_at, id) or None if it is invalid."""
+    updated_at, _, pk = (cursor or "").rpartition("_")
+    try:
+        updated_at = parse_datetime(updated_at)
+        pk = int(pk)
+    except ValueError:
+        return None
+    if updated_at is None:
+        return None
+    return updated_at, pk
+
+
 @login_required
 def my_ratings_view(request):
     """
-      Displays all ratings submitted by the logged-in user along with movie details.
+      Displays the ratings submitted by the logged-in user along with movie details, newest first,
+      one page at a time.
+
+      Pages use keyset pagination on (updated_at, id), so every page costs the same however many
+      ratings the user has, and the movies of a page are resolved in one batched catalog lookup.
 
       Parameters:
-          request (HttpRequest): The HTTP request.
+          request (HttpRequest): The HTTP request containing query parameters.
+              - before (str, optional): The cursor of the last rating of the previous page.
 
       Returns:
           HttpResponse: Rendered template displaying the user's rated movies.
     """
 
-    user_ratings = Rating.objects.filter(user=request.user).order_by('-updated_at')
+    cosine_recommender = get_recommender()
+    user_ratings = Rating.objects.filter(user=request.user)
 
-    rated_movies = []
-    for rating in user_ratings:
-        movie_id = str(rating.movie_id).strip()
-        movie_row = cosine_recommender.movies_tmdb[
-            cosine_recommender.movies_tmdb['imdb_id'].astype(str).str.strip() == movie_id
-            ]
-        if movie_row.empty:
-            continue
-        movie = movie_row.iloc[0]
-        poster_path = movie.get('poster_path', '')
-        poster_url = (
-            "https://image.tmdb.org/t/p/w500" + str(poster_path)
-            if poster_path and not pd.isnull(poster_path)
-            else "/static/images/default.jpg"
+    cursor = _parse_ratings_cursor(request.GET.get('before'))
+    if cursor is not None:
+        updated_at, pk = cursor
+        user_ratings = user_ratings.filter(Q(updated_at__lt=updated_at) | Q(updated_at=updated_at, pk__lt=pk))
+
+    # One extra row tells whether there is a next page.
+    with stage('rating_query'):
+        page = list(
+            user_ratings.order_by('-updated_at', '-id').only('movie_id', 'rating', 'updated_at')[:RATINGS_PAGE_SIZE + 1]
         )
+    next_cursor = _format_ratings_cursor(page[RATINGS_PAGE_SIZE - 1]) if len(page) > RATINGS_PAGE_SIZE else None
+    page = page[:RATINGS_PAGE_SIZE]
+
+    catalog = cosine_recommender.catalog
+    positions = cosine_recommender.get_positions(rating.movie_id for rating in page)
 
+    rated_movies = []
+    for rating, position in zip(page, positions):
+        if position is None:
+            continue
         rated_movies.append({
-            'title': movie.get('title', 'N/A'),
-            'poster_url': poster_url,
+            'title': catalog.value('title', position),
+            'poster_url': catalog.poster_url(position),
             'rating': rating.rating,
 
             'date': rating.updated_at,
-            'movie_id': movie_id,
+            'movie_id': str(rating.movie_id).strip(),
         })
 
     context = {
         'rated_movies': rated_movies,
+        'next_cursor': next_cursor,
+        'is_first_page': cursor is None,
     }
-    return render(request, 'recommendations/my_ratings.html', context)
+    with stage('render'):
+        return render(request, 'recommendations/my_ratings.html', context)
+
+
+def health_view(request):
+    """
+    Reports whether the recommender is loaded, so orchestrators only route traffic to ready workers.
+
+    Parameters:
+        request (HttpRequest): The HTTP request.
+
+    Returns:
+        JsonResponse: The load state ('not_loaded', 'loading', 'ready' or 'failed'), the load duration
+        in seconds, the last load error, the recommendation cache hit/miss counters and the load state of
+        the personalized recommender. The status code is 200 when the content recommender is ready, 503 otherwise.
+    """
+    status = 200 if recommender_provider.is_ready() else 503
+    data = recommender_provider.status()
+    data['recommendation_cache'] = recommendation_cache.stats()
+    data['personalized'] = svd_provider.status()
+    return JsonResponse(data, status=status)
+
+
+def metrics_view(request):
+    """
+    Serves the stage duration histograms recorded by ServerTimingMiddleware, for Prometheus to scrape.
+
+    Parameters:
+        request (HttpRequest): The HTTP request.
+
+    Returns:
+        HttpResponse: The histograms in the Prometheus text exposition format; 404 when stage timing is disabled.
+    """
+    if not timing_enabled():
+        raise Http404("Stage timing is disabled.")
+    return HttpResponse(stage_histograms.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+# Async JSON API. These views run natively under ASGI: the CPU-bound work runs on the bounded
+# cpu_executor pool and the Rating queries are awaited, so the event loop keeps serving other clients.
+
+def _recommendations_json(recommendations):
+    return [
+        {'imdb_id': result.imdb_id, 'title': result.title, 'score': result.score}
+        for result in recommendations
+    ]
+
+
+def _json_value(value):
+    """Makes a catalog value JSON-safe: missing numbers become null."""
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+async def recommendation_api_view(request):
+    """
+    Recommends movies similar to a movie, as JSON.
+
+    Parameters:
+        request (HttpRequest): The HTTP request containing query parameters.
+            - movie_input (str, optional): Movie title entered by the user.
+            - movie_id (str, optional): IMDb ID of a movie.
+            - num_recs (int, optional): Number of recommendations to generate. Default is 10.
+
+    Returns:
+        JsonResponse: The matched title and the recommendations (imdb_id, title, score), most similar
+        first; 400 without movie_input or movie_id.
+    """
+    movie_input = request.GET.get('movie_input')
+    movie_id = request.GET.get('movie_id')
+    try:
+        num_recs = int(request.GET.get('num_recs', 10))
+    except ValueError:
+        num_recs = 10
+    if not movie_input and not movie_id:
+        return JsonResponse({'error': "movie_input or movie_id is required."}, status=400)
+
+    def recommend():
+        return _recommend_for_request(get_recommender(), movie_input, movie_id, num_recs)
+
+    title, recommendations = await cpu_executor.run(recommend)
+    return JsonResponse({'title': title, 'recommendations': _recommendations_json(recommendations)})
+
+
+async def movie_detail_api_view(request, imdb_id):
+    """
+    Returns the details of a movie, and the logged-in user's rating of it, as JSON.
+
+    Parameters:
+        request (HttpRequest): The HTTP request.
+        imdb_id (str): The IMDb ID of the movie.
+
+    Returns:
+        JsonResponse: The movie's details, 404 if the movie is not found.
+    """
+    cosine_recommender = await cpu_executor.run(get_recommender)
+    position = cosine_recommender.get_position(imdb_id)
+    if position is None:
+        return JsonResponse({'error': "Movie not found."}, status=404)
+
+    details = {
+        name: _json_value(value) for name, value in _movie_details(cosine_recommender.catalog, position).items()
+    }
+    details['movie_id'] = imdb_id
+    details['user_rating'] = None
+    user = await request.auser()
+    if user.is_authenticated:
+        with stage('rating_query'):
+            details['user_rating'] = await Rating.objects.filter(
+                user=user, movie_id=imdb_id
+            ).values_list('rating', flat=True).afirst()
+    return JsonResponse(details)
+
+
+async def autocomplete_api_view(request):
+    """
+    Provides autocomplete suggestions for movie titles, as autocomplete_view does.
+
+    Parameters:
+        request (HttpRequest): The HTTP request containing query parameters.
+            - term (str, optional): The search term entered by the user.
+
+    Returns:
+        JsonResponse: A JSON list of up to 10 suggestions (label, value, poster_url).
+    """
+    query = request.GET.get('term', '')
+    suggestions = []
+    if query:
+        suggestions = await cpu_executor.run(lambda: get_recommender().autocomplete_index.suggest(query))
+    return JsonResponse(suggestions, safe=False)